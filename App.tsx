@@ -22,6 +22,8 @@ const App: React.FC = () => {
   const { isAuthenticated, user, role, login, logout } = useAuth();
   const [activeTab, setActiveTab] = useState<'chat' | 'quiz' | 'progress' | 'live' | 'profile' | 'resources' | 'transcribe' | 'visualStudio'>('chat'); // Add 'visualStudio' to activeTab state
   const [isSidebarCollapsed, setIsSidebarCollapsed] = useState(false);
+  // Topic of the last tutor reply a follow-up (mindmap or quiz) was opened for
+  const [studyTopic, setStudyTopic] = useState<string | undefined>(undefined);
   
   // Theme State
   const [theme, setTheme] = useState<'light' | 'dark'>('light');
@@ -38,9 +40,15 @@ const App: React.FC = () => {
   }, [isAuthenticated, role]);
 
   const handleCommandNavigation = (tab: string) => {
+    setStudyTopic(undefined);
     setActiveTab(tab as any);
   };
 
+  const handleStudyTopic = (tab: 'visualStudio' | 'quiz', topic: string) => {
+    setStudyTopic(topic);
+    setActiveTab(tab);
+  };
+
   // Handler to go back to Home (Chat for students, Dashboard for teachers)
   const handleBack = () => {
     if (role === UserRole.STUDENT) {
@@ -67,7 +75,7 @@ const App: React.FC = () => {
       {/* Animated Sidebar */}
       <AnimatedSidebar 
         activeTab={activeTab} 
-        setActiveTab={setActiveTab} 
+        setActiveTab={handleCommandNavigation} 
         role={role} 
         user={user} 
         onLogout={logout}
@@ -121,14 +129,14 @@ const App: React.FC = () => {
             )}
 
             <div className="flex-1 min-h-0 overflow-y-auto pb-10 custom-scrollbar pr-2">
-               {activeTab === 'chat' && <StudentChat />}
+               {activeTab === 'chat' && <StudentChat onStudyTopic={handleStudyTopic} />}
                {activeTab === 'live' && <LiveTutor onBack={handleBack} user={user} />}
-               {activeTab === 'quiz' && <StudentQuiz onBack={handleBack} />}
+               {activeTab === 'quiz' && <StudentQuiz onBack={handleBack} initialTopic={studyTopic} />}
                {activeTab === 'resources' && <StudyMaterial onBack={handleBack} />}
                {activeTab === 'transcribe' && <AudioTranscriber />}
                {activeTab === 'progress' && <StudentProgress />}
                {activeTab === 'profile' && <ProfileSection role={UserRole.STUDENT} userData={user} onBack={handleBack} />}
-               {activeTab === 'visualStudio' && <VisualStudio />} 
+               {activeTab === 'visualStudio' && <VisualStudio initialPrompt={studyTopic} />} 
             </div>
           </div>
         ) : (
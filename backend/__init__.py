@@ -1,22 +1,105 @@
-from flask import Flask, send_from_directory
+from flask import Flask
 from flask_cors import CORS
-from .extensions import db, migrate, jwt, bcrypt
+from .extensions import db, migrate, jwt, password_hasher
+from .static_assets import StaticAssets
+from .responses import ResponsePipeline
+from .identity_cache import identity_cache
+from .query_plans import check_query_plans_command
+from .db_routing import db_router
+from .ai_log import ai_log
+from .metrics import metrics
+from .profiling import request_profiler
+from .admission import admission
+from .upstream import upstream
+from .jobs import job_queue
+from .prefetch import prefetcher
+from .retrieval import study_store
+from .resource_catalog import resource_catalog
+from .answer_reuse import answer_reuse
 from . import models
-import os
 
 def create_app():
-    app = Flask(__name__, static_folder='../dist', static_url_path='/')
+    # dist/ is served by StaticAssets rather than Flask's built-in static route.
+    app = Flask(__name__, static_folder=None)
     app.config.from_object('backend.config.Config')
 
     CORS(app, origins="*")
 
     db.init_app(app)
+    db_router.init_app(app)
     migrate.init_app(app, db)
     jwt.init_app(app)
-    bcrypt.init_app(app)
+    password_hasher.init_app(app)
+    identity_cache.init_app(app)
+    admission.init_app(app)
+    upstream.init_app(app)
+    job_queue.init_app(app)
+    prefetcher.init_app(app)
+    study_store.init_app(app)
+    resource_catalog.init_app(app)
+    answer_reuse.init_app(app)
+    ai_log.init_app(app)
+    # Registered first so a profile covers the other hooks, compression included.
+    request_profiler.init_app(app)
+    app.cli.add_command(check_query_plans_command)
+    # Registered before ResponsePipeline so response sizes are measured after compression.
+    metrics.init_app(app)
+    metrics.add_collector('ai_decision_log_written_total', 'counter', 'AI decision log rows written.',
+                          lambda: ai_log.written)
+    metrics.add_collector('ai_decision_log_dropped_total', 'counter', 'AI decision log records dropped.',
+                          lambda: ai_log.dropped)
+    metrics.add_collector('identity_cache_hits_total', 'counter', 'JWT identity cache hits.',
+                          lambda: identity_cache.hits)
+    metrics.add_collector('identity_cache_misses_total', 'counter', 'JWT identity cache misses.',
+                          lambda: identity_cache.misses)
+    metrics.add_collector('admission_rejected_total', 'counter', 'AI requests shed by admission control.',
+                          lambda: admission.rejected)
+    metrics.add_collector('admission_interactive_queued', 'gauge', 'Interactive AI requests waiting for a slot.',
+                          lambda: admission.gate.depth('interactive'))
+    metrics.add_collector('admission_bulk_queued', 'gauge', 'Bulk AI requests waiting for a slot.',
+                          lambda: admission.gate.depth('bulk'))
+    metrics.add_collector('upstream_open_circuit_breakers', 'gauge', 'Upstream models currently failing fast.',
+                          upstream.open_breakers)
+    metrics.add_collector('jobs_completed_total', 'counter', 'Background generation jobs that succeeded.',
+                          lambda: job_queue.completed)
+    metrics.add_collector('jobs_failed_total', 'counter', 'Background generation jobs that failed for good.',
+                          lambda: job_queue.failed)
+    metrics.add_collector('jobs_retried_total', 'counter', 'Background generation job attempts scheduled for retry.',
+                          lambda: job_queue.retried)
+    metrics.add_collector('prefetch_hits_total', 'counter', 'Requests answered from a speculative prefetch.',
+                          lambda: prefetcher.hits)
+    metrics.add_collector('prefetch_misses_total', 'counter', 'Prefetchable requests that found nothing prefetched.',
+                          lambda: prefetcher.misses)
+    metrics.add_collector('prefetch_hit_ratio', 'gauge', 'Share of prefetchable requests answered from a prefetch.',
+                          prefetcher.hit_ratio)
+    metrics.add_collector('prefetch_generated_total', 'counter', 'Speculative prefetches generated.',
+                          lambda: prefetcher.generated)
+    metrics.add_collector('prefetch_skipped_total', 'counter', 'Speculative prefetches dropped for lack of budget.',
+                          lambda: prefetcher.skipped)
+    metrics.add_collector('prefetch_expired_unused_total', 'counter', 'Speculative prefetches that expired unused.',
+                          lambda: prefetcher.expired_unused)
+    metrics.add_collector('retrieval_documents_ingested_total', 'counter', 'Study documents indexed.',
+                          lambda: study_store.ingested)
+    metrics.add_collector('retrieval_grounded_generations_total', 'counter',
+                          'Generations built from retrieved note chunks.', lambda: study_store.queries)
+    metrics.add_collector('resource_search_cache_hits_total', 'counter',
+                          'Resource searches answered from the worker cache.', lambda: resource_catalog.cache_hits)
+    metrics.add_collector('resource_search_catalog_hits_total', 'counter',
+                          'Resource searches answered from the shared catalog.', lambda: resource_catalog.catalog_hits)
+    metrics.add_collector('resource_search_misses_total', 'counter',
+                          'Resource searches that ran a grounded generation.', lambda: resource_catalog.misses)
+    metrics.add_collector('answer_reuse_hits_total', 'counter',
+                          'Opening chat questions answered from a near-duplicate question.', lambda: answer_reuse.hits)
+    metrics.add_collector('answer_reuse_misses_total', 'counter',
+                          'Opening chat questions with no near-duplicate to reuse.', lambda: answer_reuse.misses)
+    metrics.add_collector('answer_reuse_hit_ratio', 'gauge', 'Share of opening chat questions answered by reuse.',
+                          answer_reuse.hit_ratio)
+    metrics.add_collector('answer_reuse_entries', 'gauge', 'Answered questions in the near-duplicate index.',
+                          answer_reuse.size)
+    ResponsePipeline(app)
 
     with app.app_context():
-        from .routes import auth, ai, students, mindmap, infographic, library
+        from .routes import auth, ai, students, mindmap, infographic, library, jobs, study_pack, documents, search
         
         app.register_blueprint(auth.bp, url_prefix='/auth')
         app.register_blueprint(ai.bp, url_prefix='/ai')
@@ -24,13 +107,11 @@ def create_app():
         app.register_blueprint(mindmap.bp, url_prefix='/mindmap')
         app.register_blueprint(infographic.bp, url_prefix='/infographic')
         app.register_blueprint(library.bp, url_prefix='/library')
+        app.register_blueprint(jobs.bp, url_prefix='/jobs')
+        app.register_blueprint(study_pack.bp, url_prefix='/study-pack')
+        app.register_blueprint(documents.bp, url_prefix='/documents')
+        app.register_blueprint(search.bp, url_prefix='/search')
 
-        @app.route('/', defaults={'path': ''})
-        @app.route('/<path:path>')
-        def serve(path):
-            if path != "" and os.path.exists(app.static_folder + '/' + path):
-                return send_from_directory(app.static_folder, path)
-            else:
-                return send_from_directory(app.static_folder, 'index.html')
+        StaticAssets(app)
 
         return app
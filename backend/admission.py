@@ -0,0 +1,254 @@
+import collections
+import contextlib
+import contextvars
+import math
+import threading
+import time
+from functools import wraps
+
+from flask import jsonify
+
+from .db_routing import requester_key
+
+# Lanes in scheduling order: a free upstream slot always goes to the oldest
+# waiter in the first non-empty lane.
+INTERACTIVE = 'interactive'
+BULK = 'bulk'
+LANES = (INTERACTIVE, BULK)
+
+# True inside a slot() block, so nested fan-out can tell it already holds one.
+_holding = contextvars.ContextVar('admission_holding', default=False)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed; rendered as 429/503 with Retry-After."""
+
+    def __init__(self, status, retry_after, message):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = max(int(math.ceil(retry_after)), 1)
+        self.message = message
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, floor=0.0):
+        """Takes one token, keeping at least `floor` in the bucket.
+
+        Returns 0 on success, otherwise the seconds until a token is available.
+        Callers hold the controller lock.
+        """
+        self._refill(time.monotonic())
+        if self.tokens - 1 >= floor:
+            self.tokens -= 1
+            return 0.0
+        return (floor + 1 - self.tokens) / self.rate if self.rate > 0 else 60.0
+
+    def refund(self):
+        self.tokens = min(self.burst, self.tokens + 1)
+
+    def full(self, now):
+        self._refill(now)
+        return self.tokens >= self.burst
+
+
+class PriorityGate:
+    """Caps concurrent upstream work and hands free slots out by lane priority."""
+
+    def __init__(self, slots, max_queue):
+        self.slots = slots
+        self.max_queue = max_queue
+        self.in_use = 0
+        self.waiting = {lane: collections.deque() for lane in LANES}
+        # Smoothed slot hold time, used to turn queue depth into Retry-After.
+        self.hold_seconds = 1.0
+        self._cond = threading.Condition()
+
+    def _next(self):
+        for lane in LANES:
+            if self.waiting[lane]:
+                return self.waiting[lane][0]
+        return None
+
+    def retry_after(self, lane):
+        ahead = sum(len(self.waiting[l]) for l in LANES[:LANES.index(lane) + 1])
+        return self.hold_seconds * (ahead + 1) / self.slots
+
+    def acquire(self, lane, timeout):
+        with self._cond:
+            if len(self.waiting[lane]) >= self.max_queue[lane]:
+                raise AdmissionRejected(503, self.retry_after(lane), 'The AI service is busy, please retry')
+            ticket = object()
+            self.waiting[lane].append(ticket)
+            deadline = time.monotonic() + timeout
+            while not (self.in_use < self.slots and self._next() is ticket):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.waiting[lane].remove(ticket)
+                    self._cond.notify_all()
+                    raise AdmissionRejected(503, self.retry_after(lane), 'The AI service is busy, please retry')
+                self._cond.wait(remaining)
+            self.waiting[lane].popleft()
+            self.in_use += 1
+            # The next waiter may also fit if more than one slot is free.
+            self._cond.notify_all()
+
+    def try_acquire(self, headroom=0):
+        """Takes a slot only if nobody is waiting and `headroom` slots stay free.
+
+        For optional background work, which must never delay a request.
+        """
+        with self._cond:
+            if self._next() is not None or self.in_use + headroom >= self.slots:
+                return False
+            self.in_use += 1
+            return True
+
+    def release(self, held):
+        with self._cond:
+            self.in_use -= 1
+            self.hold_seconds = 0.8 * self.hold_seconds + 0.2 * held
+            self._cond.notify_all()
+
+    def depth(self, lane):
+        return len(self.waiting[lane])
+
+
+class AdmissionControl:
+    """Rate limits and prioritises requests that call the model.
+
+    Each request first takes a token from its requester's bucket (JWT
+    identity, else client address) and from the global bucket. Bulk requests
+    may not take the last ADMISSION_INTERACTIVE_RESERVE share of the global
+    bucket, which is kept for interactive ones. It then waits for one of
+    ADMISSION_MAX_CONCURRENT upstream slots, interactive lane first. Requests
+    that cannot be admitted are shed immediately with Retry-After rather
+    than piling up on worker threads. Limits are per worker process.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self.buckets = {}
+        self.rejected = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config['ADMISSION_ENABLED']
+        self.user_rate = app.config['ADMISSION_USER_RATE']
+        self.user_burst = app.config['ADMISSION_USER_BURST']
+        self.global_bucket = TokenBucket(app.config['ADMISSION_GLOBAL_RATE'], app.config['ADMISSION_GLOBAL_BURST'])
+        self.interactive_reserve = app.config['ADMISSION_INTERACTIVE_RESERVE'] * self.global_bucket.burst
+        self.max_buckets = app.config['ADMISSION_MAX_TRACKED_USERS']
+        self.queue_timeout = app.config['ADMISSION_QUEUE_TIMEOUT']
+        self.gate = PriorityGate(app.config['ADMISSION_MAX_CONCURRENT'], {
+            INTERACTIVE: app.config['ADMISSION_INTERACTIVE_QUEUE'],
+            BULK: app.config['ADMISSION_BULK_QUEUE'],
+        })
+        bulk_threads = app.config['ADMISSION_MAX_CONCURRENT'] + app.config['ADMISSION_BULK_QUEUE']
+        if self.enabled and bulk_threads > app.config['GUNICORN_THREADS'] - app.config['ADMISSION_RESERVED_THREADS']:
+            print(f"Warning: bulk requests can hold {bulk_threads} of {app.config['GUNICORN_THREADS']} "
+                  f"worker threads; chat requests may not reach the admission gate")
+        app.register_error_handler(AdmissionRejected, self.handle_rejected)
+
+    def handle_rejected(self, e):
+        with self._lock:
+            self.rejected += 1
+        return jsonify({'error': e.message}), e.status, {'Retry-After': str(e.retry_after)}
+
+    def _user_bucket(self, key):
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            if len(self.buckets) >= self.max_buckets:
+                # Full buckets carry no state worth keeping.
+                now = time.monotonic()
+                self.buckets = {k: b for k, b in self.buckets.items() if not b.full(now)}
+            bucket = self.buckets[key] = TokenBucket(self.user_rate, self.user_burst)
+        return bucket
+
+    def check_rate(self, key, lane, cost=1):
+        """Takes `cost` tokens from the requester's and the global bucket, or none at all."""
+        with self._lock:
+            user_bucket = self._user_bucket(key)
+            floor = self.interactive_reserve if lane == BULK else 0.0
+            for taken in range(cost):
+                wait = user_bucket.take()
+                if wait:
+                    self._refund(user_bucket, taken, taken)
+                    raise AdmissionRejected(429, wait, 'Too many AI requests, please slow down')
+                wait = self.global_bucket.take(floor)
+                if wait:
+                    self._refund(user_bucket, taken + 1, taken)
+                    raise AdmissionRejected(503, wait, 'The AI service is busy, please retry')
+
+    def _refund(self, user_bucket, user_tokens, global_tokens):
+        for _ in range(user_tokens):
+            user_bucket.refund()
+        for _ in range(global_tokens):
+            self.global_bucket.refund()
+
+    @contextlib.contextmanager
+    def slot(self, lane):
+        """Holds one upstream slot for the duration of the block.
+
+        For model calls made off the request thread, whose rate tokens the
+        request has already taken with check_rate.
+        """
+        if not self.enabled:
+            yield
+            return
+        self.gate.acquire(lane, self.queue_timeout)
+        started = time.monotonic()
+        token = _holding.set(True)
+        try:
+            yield
+        finally:
+            _holding.reset(token)
+            self.gate.release(time.monotonic() - started)
+
+    @contextlib.contextmanager
+    def spare_slot(self):
+        """Holds a slot for the block only if one is free right now; yields whether it got one.
+
+        For optional extra parallelism, which must never queue for a slot.
+        """
+        if not self.enabled:
+            yield True
+            return
+        if not self.gate.try_acquire():
+            yield False
+            return
+        started = time.monotonic()
+        token = _holding.set(True)
+        try:
+            yield True
+        finally:
+            _holding.reset(token)
+            self.gate.release(time.monotonic() - started)
+
+    def holding(self):
+        """Whether the current context is inside slot() or spare_slot()."""
+        return _holding.get()
+
+    def admit(self, lane):
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return view(*args, **kwargs)
+                self.check_rate(requester_key(), lane)
+                with self.slot(lane):
+                    return view(*args, **kwargs)
+            return wrapper
+        return decorator
+
+admission = AdmissionControl()
@@ -0,0 +1,193 @@
+import atexit
+import datetime
+import queue
+import random
+import threading
+import time
+import uuid
+
+import sqlalchemy as sa
+from flask import g, has_app_context, has_request_context
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+
+from .extensions import db
+from .models.feedback import AIDecisionLog
+from .models.student import Student
+
+
+def current_student_id():
+    """JWT identity of the caller if they sent a valid token, else None.
+
+    Outside a request (a backend.jobs worker) it is the student the job was
+    submitted by, if the worker set one on `g`.
+    """
+    if not has_request_context():
+        return g.get('student_id') if has_app_context() else None
+    try:
+        verify_jwt_in_request(optional=True)
+        return get_jwt_identity()
+    except Exception:
+        return None
+
+
+def usage_counts(response):
+    usage = getattr(response, 'usage_metadata', None)
+    if usage is None:
+        return None, None
+    return getattr(usage, 'prompt_token_count', None), getattr(usage, 'candidates_token_count', None)
+
+
+class AIDecisionLogger:
+    """Write-behind audit log of AI calls into ai_decision_logs.
+
+    Handlers call record(), which only samples and enqueues. A background
+    thread drains the queue and batch-inserts rows, so request latency never
+    waits on logging I/O. When the bounded queue is full the record is
+    dropped and counted instead of blocking the request.
+    """
+
+    def __init__(self, app=None):
+        self.dropped = 0
+        self.written = 0
+        self._thread = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.sample_rate = app.config['AI_LOG_SAMPLE_RATE']
+        self.batch_size = app.config['AI_LOG_BATCH_SIZE']
+        self.flush_interval = app.config['AI_LOG_FLUSH_SECONDS']
+        self._queue = queue.Queue(maxsize=app.config['AI_LOG_QUEUE_SIZE'])
+
+    def record(self, endpoint, student_input, response, latency, reasoning=''):
+        if not self._sampled():
+            return
+        input_tokens, output_tokens = usage_counts(response)
+        try:
+            output = response.text
+        except Exception:
+            # Blocked or empty candidates raise on .text
+            output = ''
+        self._enqueue(endpoint, student_input, output, reasoning, int(latency * 1000), input_tokens, output_tokens)
+
+    def record_reused(self, endpoint, student_input, output, reasoning=''):
+        """Logs an answer served from backend.answer_reuse instead of a model call.
+
+        The row's endpoint gets a ":reused" suffix and it has no latency or
+        token counts, so it is never mistaken for a call that was made.
+        """
+        if not self._sampled():
+            return
+        self._enqueue(f'{endpoint}:reused', student_input, output, reasoning, None, None, None)
+
+    def _sampled(self):
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _enqueue(self, endpoint, student_input, output, reasoning, latency_ms, input_tokens, output_tokens):
+        entry = {
+            'id': str(uuid.uuid4()),
+            'student_id': current_student_id(),
+            'endpoint': endpoint,
+            'student_input': student_input or '',
+            'ai_output': output or '',
+            'reasoning': reasoning or '',
+            'latency_ms': latency_ms,
+            'input_tokens': input_tokens,
+            'output_tokens': output_tokens,
+            'timestamp': datetime.datetime.now(),
+        }
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def _ensure_writer(self):
+        # Started lazily so it lives in the serving process, not a pre-fork parent.
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='ai-decision-log', daemon=True)
+                    self._thread.start()
+                    atexit.register(self.flush)
+
+    def _take_batch(self, timeout, limit):
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=timeout))
+            while len(batch) < limit:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _only_students(self, batch):
+        # student_id references students.id, but any JWT identity (a teacher,
+        # say) is recorded; one lookup per batch keeps the others attributed.
+        ids = {row['student_id'] for row in batch if row['student_id'] is not None}
+        if not ids:
+            return
+        students = set(db.session.scalars(sa.select(Student.id).where(Student.id.in_(ids))))
+        for row in batch:
+            if row['student_id'] not in students:
+                row['student_id'] = None
+
+    def _write(self, batch):
+        with self.app.app_context():
+            try:
+                self._only_students(batch)
+                db.session.execute(sa.insert(AIDecisionLog), batch)
+                db.session.commit()
+                with self._lock:
+                    self.written += len(batch)
+            except sa.exc.IntegrityError as e:
+                # One bad row (a student deleted since the lookup) must not cost the batch.
+                db.session.rollback()
+                print(f"An error occurred writing AI decision logs, retrying row by row: {e}")
+                self._write_rows(batch)
+            except Exception as e:
+                db.session.rollback()
+                with self._lock:
+                    self.dropped += len(batch)
+                print(f"An error occurred writing AI decision logs: {e}")
+            finally:
+                db.session.remove()
+
+    def _write_rows(self, batch):
+        for row in batch:
+            try:
+                db.session.execute(sa.insert(AIDecisionLog), [row])
+                db.session.commit()
+                with self._lock:
+                    self.written += 1
+            except Exception:
+                db.session.rollback()
+                with self._lock:
+                    self.dropped += 1
+
+    def _run(self):
+        while True:
+            deadline = time.monotonic() + self.flush_interval
+            batch = self._take_batch(self.flush_interval, self.batch_size)
+            # Keep filling until the batch is full or the interval has passed.
+            while batch and len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                batch.extend(self._take_batch(remaining, self.batch_size - len(batch)))
+            if batch:
+                self._write(batch)
+
+    def flush(self):
+        """Write everything still queued; used at interpreter exit."""
+        while True:
+            batch = self._take_batch(0, self.batch_size)
+            if not batch:
+                return
+            self._write(batch)
+
+
+ai_log = AIDecisionLogger()
@@ -0,0 +1,166 @@
+import collections
+import hashlib
+import re
+import threading
+import time
+
+TOKEN = re.compile(r'\w+', re.UNICODE)
+# Words that change the wording of a question but not what is asked.
+FILLER = frozenset('''
+a an and are can could do does explain i im is it me of please tell the to us what whats would you
+'''.split())
+
+# MinHash signature length and LSH banding: 16 bands of 4 rows make two
+# questions with token Jaccard similarity 0.8 share a band with
+# probability 1 - (1 - 0.8^4)^16 > 0.99, while unrelated questions rarely do.
+NUM_HASHES = 64
+BANDS = 16
+ROWS = NUM_HASHES // BANDS
+MERSENNE_PRIME = (1 << 61) - 1
+
+
+def _permutations():
+    # Fixed (a, b) pairs so signatures are stable across processes and restarts.
+    pairs = []
+    for n in range(NUM_HASHES):
+        digest = hashlib.blake2b(f'minhash-{n}'.encode(), digest_size=16).digest()
+        a = int.from_bytes(digest[:8], 'big') % (MERSENNE_PRIME - 1) + 1
+        b = int.from_bytes(digest[8:], 'big') % MERSENNE_PRIME
+        pairs.append((a, b))
+    return pairs
+
+
+PERMUTATIONS = _permutations()
+
+
+def question_words(text):
+    """The words that identify a question, in order: lower-cased, without filler words or lone letters."""
+    return [token for token in TOKEN.findall(text.lower())
+            if (len(token) > 1 or token.isdigit()) and token not in FILLER]
+
+
+def word_bigrams(words):
+    """Adjacent word pairs, with the first and last word marked, so that word order counts."""
+    padded = ['^'] + words + ['$']
+    return frozenset(zip(padded, padded[1:]))
+
+
+def signature(terms):
+    hashes = [int.from_bytes(hashlib.blake2b(term.encode(), digest_size=8).digest(), 'big') for term in terms]
+    return tuple(min((a * h + b) % MERSENNE_PRIME for h in hashes) for a, b in PERMUTATIONS)
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+Match = collections.namedtuple('Match', 'answer text similarity')
+
+
+class AnswerReuseIndex:
+    """Near-duplicate index of first-turn tutor questions and their answers.
+
+    Many students open a conversation with the same question in different
+    words. Each answered first turn (no history, no attachment, so nothing
+    in the answer depends on who asked) is indexed by the MinHash signature
+    of its question's words, per language. LSH buckets narrow a lookup to a
+    handful of candidates, which are then compared on ordered word pairs: a
+    word set alone cannot tell "Celsius to Fahrenheit" from "Fahrenheit to
+    Celsius". A new first turn whose closest indexed question has a word
+    pair Jaccard similarity of at least ANSWER_REUSE_THRESHOLD, and the same
+    numbers, gets that answer instead of a generation.
+    Entries live for ANSWER_REUSE_TTL seconds; the index is per worker.
+    """
+
+    def __init__(self, app=None):
+        self._entries = collections.OrderedDict()
+        self._buckets = collections.defaultdict(set)
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config['ANSWER_REUSE_ENABLED']
+        self.threshold = app.config['ANSWER_REUSE_THRESHOLD']
+        self.ttl = app.config['ANSWER_REUSE_TTL']
+        self.max_entries = app.config['ANSWER_REUSE_MAX_ENTRIES']
+        self.max_question_chars = app.config['ANSWER_REUSE_MAX_QUESTION_CHARS']
+
+    def hit_ratio(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def size(self):
+        return len(self._entries)
+
+    def _band_keys(self, language, sig):
+        return [(language, band, sig[band * ROWS:(band + 1) * ROWS]) for band in range(BANDS)]
+
+    def _words(self, question):
+        if not self.enabled or len(question) > self.max_question_chars:
+            return None
+        return question_words(question) or None
+
+    def lookup(self, question, language):
+        """The best indexed answer to a near-duplicate of question in this language, as a Match, or None."""
+        words = self._words(question)
+        if words is None:
+            return None
+        terms = frozenset(words)
+        bigrams = word_bigrams(words)
+        numbers = {term for term in terms if term.isdigit()}
+        keys = self._band_keys(language, signature(terms))
+        now = time.monotonic()
+        best = None
+        with self._lock:
+            candidates = set().union(*(self._buckets.get(key, ()) for key in keys))
+            for entry_id in candidates:
+                entry_terms, entry_bigrams, _, answer, text, expires = self._entries[entry_id]
+                if expires <= now:
+                    continue
+                # "x^2" and "x^3" differ in one word; a different number is a different question.
+                if {term for term in entry_terms if term.isdigit()} != numbers:
+                    continue
+                similarity = jaccard(bigrams, entry_bigrams)
+                if similarity >= self.threshold and (best is None or similarity > best.similarity):
+                    best = Match(answer, text, similarity)
+            if best is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return best
+
+    def remember(self, question, language, answer, text):
+        """Indexes a validated first-turn answer: `answer` is the parsed reply, `text` the raw model output."""
+        words = self._words(question)
+        if words is None:
+            return
+        terms = frozenset(words)
+        keys = self._band_keys(language, signature(terms))
+        now = time.monotonic()
+        with self._lock:
+            # Entries share one TTL, so the oldest are the first to expire.
+            while self._entries:
+                oldest = next(iter(self._entries))
+                if len(self._entries) < self.max_entries and self._entries[oldest][5] > now:
+                    break
+                self._drop(oldest)
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (terms, word_bigrams(words), keys, answer, text, now + self.ttl)
+            for key in keys:
+                self._buckets[key].add(entry_id)
+
+    def _drop(self, entry_id):
+        _, _, keys, _, _, _ = self._entries.pop(entry_id)
+        for key in keys:
+            bucket = self._buckets[key]
+            bucket.discard(entry_id)
+            if not bucket:
+                del self._buckets[key]
+
+
+answer_reuse = AnswerReuseIndex()
@@ -6,9 +6,241 @@ dotenv_path = os.path.join(os.path.dirname(__file__), '..', '.env')
 # Load the .env file
 load_dotenv(dotenv_path=dotenv_path)
 
+def engine_options(uri):
+    """Connection pool settings for an engine, tuned per database backend."""
+    options = {
+        'pool_pre_ping': True,
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+    }
+    if uri.startswith('sqlite'):
+        # WAL mode and busy_timeout are set per connection by backend.db_routing.
+        return options
+
+    options.update({
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+    })
+    if uri.startswith('postgres'):
+        statement_timeout = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 15000))
+        options['connect_args'] = {'options': f'-c statement_timeout={statement_timeout}'}
+    return options
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY')
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///' + os.path.join(os.path.abspath(os.path.dirname(__file__)), 'app.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+
+    # Optional read replica. GET routes marked with @use_replica read from it
+    # unless the caller wrote something in the last READ_YOUR_WRITES_SECONDS.
+    SQLALCHEMY_REPLICA_URI = os.environ.get('DATABASE_REPLICA_URL')
+    SQLALCHEMY_BINDS = {
+        'replica': {'url': SQLALCHEMY_REPLICA_URI, **engine_options(SQLALCHEMY_REPLICA_URI)},
+    } if SQLALCHEMY_REPLICA_URI else {}
+    READ_YOUR_WRITES_SECONDS = float(os.environ.get('READ_YOUR_WRITES_SECONDS', 5))
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
     GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
+
+    # Built frontend served by backend.static_assets
+    STATIC_DIST_DIR = os.environ.get('STATIC_DIST_DIR') or \
+        os.path.join(os.path.abspath(os.path.dirname(__file__)), '..', 'dist')
+    STATIC_IMMUTABLE_MAX_AGE = 31536000
+    STATIC_INDEX_MAX_AGE = int(os.environ.get('STATIC_INDEX_MAX_AGE', 60))
+    STATIC_DEFAULT_MAX_AGE = 3600
+
+    # API response compression (backend.responses)
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+    COMPRESS_GZIP_LEVEL = 6
+    COMPRESS_BROTLI_QUALITY = 5
+
+    # Password hashing (backend.passwords). Raising the cost upgrades stored
+    # hashes the next time each user logs in.
+    BCRYPT_LOG_ROUNDS = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 32))
+    PASSWORD_HASH_TIMEOUT = 10
+
+    # Per-worker cache of the JWT user projection (backend.identity_cache)
+    IDENTITY_CACHE_TTL = int(os.environ.get('IDENTITY_CACHE_TTL', 300))
+    IDENTITY_CACHE_MAX_ENTRIES = 10000
+
+    # Live tutoring WebSocket gateway (backend.live_gateway)
+    LIVE_GATEWAY_HOST = os.environ.get('LIVE_GATEWAY_HOST', '0.0.0.0')
+    LIVE_GATEWAY_PORT = int(os.environ.get('LIVE_GATEWAY_PORT', 8765))
+    LIVE_TRANSCRIPT_BATCH_SIZE = int(os.environ.get('LIVE_TRANSCRIPT_BATCH_SIZE', 20))
+    LIVE_TRANSCRIPT_FLUSH_SECONDS = float(os.environ.get('LIVE_TRANSCRIPT_FLUSH_SECONDS', 2.0))
+
+    # Write-behind AI decision log (backend.ai_log)
+    AI_LOG_SAMPLE_RATE = float(os.environ.get('AI_LOG_SAMPLE_RATE', 1.0))
+    AI_LOG_QUEUE_SIZE = int(os.environ.get('AI_LOG_QUEUE_SIZE', 1000))
+    AI_LOG_BATCH_SIZE = 50
+    AI_LOG_FLUSH_SECONDS = 2.0
+
+    # Bearer token required to scrape /metrics (backend.metrics); open when unset.
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+    # Admission control for model-backed routes (backend.admission). Rates are
+    # requests per second, per worker process.
+    #
+    # A request waiting for a slot still holds a web worker thread, so the
+    # slot and bulk queue defaults come from GUNICORN_THREADS (the run.sh
+    # setting). Bulk requests can hold at most ADMISSION_MAX_CONCURRENT +
+    # ADMISSION_BULK_QUEUE threads; ADMISSION_RESERVED_THREADS stay free so
+    # chat and other requests always reach the gate and their lane.
+    GUNICORN_THREADS = int(os.environ.get('GUNICORN_THREADS', 8))
+    ADMISSION_RESERVED_THREADS = int(os.environ.get('ADMISSION_RESERVED_THREADS', max(2, GUNICORN_THREADS // 4)))
+    ADMISSION_ENABLED = os.environ.get('ADMISSION_ENABLED', '1') == '1'
+    ADMISSION_USER_RATE = float(os.environ.get('ADMISSION_USER_RATE', 0.5))
+    ADMISSION_USER_BURST = int(os.environ.get('ADMISSION_USER_BURST', 10))
+    ADMISSION_GLOBAL_RATE = float(os.environ.get('ADMISSION_GLOBAL_RATE', 20))
+    ADMISSION_GLOBAL_BURST = int(os.environ.get('ADMISSION_GLOBAL_BURST', 40))
+    ADMISSION_INTERACTIVE_RESERVE = float(os.environ.get('ADMISSION_INTERACTIVE_RESERVE', 0.25))
+    ADMISSION_MAX_CONCURRENT = int(os.environ.get(
+        'ADMISSION_MAX_CONCURRENT', max(1, (GUNICORN_THREADS - ADMISSION_RESERVED_THREADS) * 2 // 3)))
+    ADMISSION_INTERACTIVE_QUEUE = int(os.environ.get('ADMISSION_INTERACTIVE_QUEUE', 32))
+    ADMISSION_BULK_QUEUE = int(os.environ.get(
+        'ADMISSION_BULK_QUEUE', max(0, GUNICORN_THREADS - ADMISSION_RESERVED_THREADS - ADMISSION_MAX_CONCURRENT)))
+    ADMISSION_QUEUE_TIMEOUT = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', 10))
+    ADMISSION_MAX_TRACKED_USERS = 10000
+
+    # Resilience policy for upstream model calls (backend.upstream). Deadlines
+    # are seconds per endpoint, covering retries and hedges.
+    UPSTREAM_DEFAULT_DEADLINE = float(os.environ.get('UPSTREAM_DEFAULT_DEADLINE', 45))
+    UPSTREAM_DEADLINES = {
+        'socratic-chat': 30,
+        'text-to-speech': 15,
+        'transcribe-audio': 30,
+        'search-resources': 30,
+        'expand-topic': 30,
+        'expand-node': 20,
+        'visualize-text': 30,
+        'generate-mindmap': 60,
+        'generate-infographic': 60,
+    }
+    UPSTREAM_MAX_RETRIES = int(os.environ.get('UPSTREAM_MAX_RETRIES', 2))
+    UPSTREAM_BACKOFF_BASE = 0.25
+    UPSTREAM_BACKOFF_CAP = 4.0
+    # Hedging costs a duplicate request for the slowest calls, so it is opt-in.
+    UPSTREAM_HEDGE_ENABLED = os.environ.get('UPSTREAM_HEDGE_ENABLED', '0') == '1'
+    UPSTREAM_HEDGE_PERCENTILE = float(os.environ.get('UPSTREAM_HEDGE_PERCENTILE', 0.95))
+    UPSTREAM_HEDGE_MIN_DELAY = 1.0
+    UPSTREAM_BREAKER_FAILURES = int(os.environ.get('UPSTREAM_BREAKER_FAILURES', 5))
+    UPSTREAM_BREAKER_COOLDOWN = float(os.environ.get('UPSTREAM_BREAKER_COOLDOWN', 30))
+    UPSTREAM_MAX_THREADS = int(os.environ.get('UPSTREAM_MAX_THREADS', 32))
+
+    # Generation settings per endpoint (backend.gemini). "json" turns on the
+    # model's JSON output mode. "light" overrides apply when the input is
+    # short text only (under GENERATION_LIGHT_INPUT_CHARS, no attachments).
+    # gemini-2.5-flash spends output tokens on thinking, so its
+    # max_output_tokens leave room for that on top of the answer.
+    GENERATION_LIGHT_INPUT_CHARS = int(os.environ.get('GENERATION_LIGHT_INPUT_CHARS', 280))
+    GENERATION_PROFILES = {
+        'default': {'model': 'gemini-2.5-flash', 'max_output_tokens': 8192, 'temperature': 0.7},
+        'socratic-chat': {'model': 'gemini-2.5-flash', 'max_output_tokens': 4096, 'temperature': 0.6, 'json': True,
+                          'light': {'model': 'gemini-2.5-flash-lite', 'max_output_tokens': 1536}},
+        'generate-quiz': {'model': 'gemini-2.5-flash', 'max_output_tokens': 4096, 'temperature': 0.8, 'json': True},
+        'analyze-exam-trends': {'model': 'gemini-2.5-flash', 'max_output_tokens': 4096, 'temperature': 0.5,
+                                'json': True},
+        'analyze-code': {'model': 'gemini-2.5-flash', 'max_output_tokens': 4096, 'temperature': 0.2, 'json': True},
+        'expand-topic': {'model': 'gemini-2.5-flash', 'max_output_tokens': 3072, 'temperature': 0.4, 'json': True,
+                         'light': {'model': 'gemini-2.5-flash-lite', 'max_output_tokens': 1536}},
+        # One level of children for a saved mindmap node: always a small call.
+        'expand-node': {'model': 'gemini-2.5-flash-lite', 'max_output_tokens': 512, 'temperature': 0.4, 'json': True},
+        'visualize-text': {'model': 'gemini-2.5-flash', 'max_output_tokens': 4096, 'temperature': 0.4, 'json': True,
+                           'light': {'model': 'gemini-2.5-flash-lite', 'max_output_tokens': 2048}},
+        'generate-mindmap': {'model': 'gemini-2.5-flash', 'max_output_tokens': 8192, 'temperature': 0.4, 'json': True,
+                             'light': {'model': 'gemini-2.5-flash-lite', 'max_output_tokens': 4096}},
+        'generate-infographic': {'model': 'gemini-2.5-flash', 'max_output_tokens': 8192, 'temperature': 0.4,
+                                 'json': True},
+        'transcribe-audio': {'model': 'gemini-2.5-flash', 'max_output_tokens': 8192, 'temperature': 0.0},
+        # JSON mode cannot be combined with the google_search tool.
+        'search-resources': {'model': 'gemini-2.5-flash', 'max_output_tokens': 4096, 'temperature': 0.3},
+    }
+
+    # On-demand request profiling (backend.profiling). Requests sending
+    # X-Profile-Token: <PROFILER_TOKEN> are profiled, plus a random
+    # PROFILER_SAMPLE_RATE fraction of all requests; both off by default.
+    # A profiled request's stack is sampled every PROFILER_INTERVAL_MS.
+    PROFILER_TOKEN = os.environ.get('PROFILER_TOKEN')
+    PROFILER_SAMPLE_RATE = float(os.environ.get('PROFILER_SAMPLE_RATE', 0))
+    PROFILER_DIR = os.environ.get('PROFILER_DIR') or \
+        os.path.join(os.path.abspath(os.path.dirname(__file__)), 'profiles')
+    PROFILER_MAX_FILES = int(os.environ.get('PROFILER_MAX_FILES', 200))
+    PROFILER_INTERVAL_MS = float(os.environ.get('PROFILER_INTERVAL_MS', 5))
+
+    # Background generation jobs (backend.jobs). JOB_WORKERS threads start in
+    # each web process; set it to 0 and run `flask jobs-worker` to keep
+    # generations out of the web tier.
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+    JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+    JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', 300))
+    JOB_POLL_SECONDS = float(os.environ.get('JOB_POLL_SECONDS', 1.0))
+    JOB_RETRY_BACKOFF = float(os.environ.get('JOB_RETRY_BACKOFF', 5))
+    JOB_RESULT_TTL = int(os.environ.get('JOB_RESULT_TTL', 3600))
+    # Each open /jobs/<id>/events stream holds a web worker thread, so at most
+    # JOB_SSE_MAX_STREAMS stream at once, each for JOB_SSE_MAX_SECONDS before
+    # the browser reconnects; past the cap a request gets the current status
+    # and is told to reconnect, which degrades it to polling.
+    JOB_SSE_POLL_SECONDS = 0.5
+    JOB_SSE_MAX_SECONDS = int(os.environ.get('JOB_SSE_MAX_SECONDS', 15))
+    JOB_SSE_MAX_STREAMS = int(os.environ.get('JOB_SSE_MAX_STREAMS', max(1, GUNICORN_THREADS // 4)))
+    JOB_SSE_RETRY_MS = 2000
+
+    # Speculative prefetch of a mindmap and quiz for the topic of each chat
+    # turn (backend.prefetch). Off by default. Prefetches only run while the
+    # admission gate keeps PREFETCH_GATE_HEADROOM slots free, at most
+    # PREFETCH_RATE per second per worker.
+    PREFETCH_ENABLED = os.environ.get('PREFETCH_ENABLED', '0') == '1'
+    PREFETCH_TTL = int(os.environ.get('PREFETCH_TTL', 300))
+    PREFETCH_RATE = float(os.environ.get('PREFETCH_RATE', 0.2))
+    PREFETCH_BURST = int(os.environ.get('PREFETCH_BURST', 4))
+    PREFETCH_GATE_HEADROOM = int(os.environ.get('PREFETCH_GATE_HEADROOM', 2))
+    PREFETCH_WORKERS = 1
+    PREFETCH_MAX_PENDING = 16
+    PREFETCH_MAX_ENTRIES = 2000
+    PREFETCH_MAX_TOPIC_CHARS = 120
+
+    # Study pack (routes/study_pack.py): parts are generated concurrently and
+    # any part still running after STUDY_PACK_PART_TIMEOUT seconds is
+    # reported as timed out.
+    STUDY_PACK_PART_TIMEOUT = float(os.environ.get('STUDY_PACK_PART_TIMEOUT', 60))
+    STUDY_PACK_MAX_THREADS = int(os.environ.get('STUDY_PACK_MAX_THREADS', 16))
+
+    # Map-reduce generation for long mindmap/infographic inputs
+    # (backend.mapreduce): text over MAPREDUCE_CHUNK_CHARS is split into
+    # section-aware chunks, generated in parallel and merged. Each chunk
+    # costs one admission token and holds a BULK slot; up to
+    # MAPREDUCE_MAX_PARALLEL run at once while slots are free.
+    MAPREDUCE_CHUNK_CHARS = int(os.environ.get('MAPREDUCE_CHUNK_CHARS', 12000))
+    MAPREDUCE_MAX_PARALLEL = int(os.environ.get('MAPREDUCE_MAX_PARALLEL', 8))
+
+    # Per-student notes index for grounded generations (backend.retrieval).
+    # Generations given a documentId send only the RETRIEVAL_TOP_K most
+    # relevant chunks of the notes to the model.
+    RETRIEVAL_DIR = os.environ.get('RETRIEVAL_DIR') or \
+        os.path.join(os.path.abspath(os.path.dirname(__file__)), 'retrieval')
+    RETRIEVAL_CHUNK_CHARS = int(os.environ.get('RETRIEVAL_CHUNK_CHARS', 1200))
+    RETRIEVAL_TOP_K = int(os.environ.get('RETRIEVAL_TOP_K', 6))
+    RETRIEVAL_MMAP_BYTES = int(os.environ.get('RETRIEVAL_MMAP_BYTES', 64 * 1024 * 1024))
+    RETRIEVAL_MAX_DOCUMENT_CHARS = 2_000_000
+
+    # Grounded resource search (backend.resource_catalog). Results are cached
+    # per worker by normalized query for RESOURCE_SEARCH_CACHE_TTL seconds;
+    # searches persisted in the shared catalog are reused by every worker for
+    # RESOURCE_CATALOG_TTL seconds before the web is searched again.
+    RESOURCE_SEARCH_CACHE_TTL = int(os.environ.get('RESOURCE_SEARCH_CACHE_TTL', 3600))
+    RESOURCE_SEARCH_CACHE_MAX_ENTRIES = 1000
+    RESOURCE_CATALOG_TTL = int(os.environ.get('RESOURCE_CATALOG_TTL', 7 * 24 * 3600))
+
+    # Reuse of tutor answers for near-duplicate opening questions
+    # (backend.answer_reuse). A first chat turn without history or attachment
+    # whose question matches an answered one in the same language with word
+    # order similarity of at least ANSWER_REUSE_THRESHOLD (0-1) gets that
+    # answer. Off unless ANSWER_REUSE_ENABLED=1.
+    ANSWER_REUSE_ENABLED = os.environ.get('ANSWER_REUSE_ENABLED', '0') == '1'
+    ANSWER_REUSE_THRESHOLD = float(os.environ.get('ANSWER_REUSE_THRESHOLD', 0.9))
+    ANSWER_REUSE_TTL = int(os.environ.get('ANSWER_REUSE_TTL', 24 * 3600))
+    ANSWER_REUSE_MAX_ENTRIES = int(os.environ.get('ANSWER_REUSE_MAX_ENTRIES', 5000))
+    ANSWER_REUSE_MAX_QUESTION_CHARS = 500
@@ -0,0 +1,103 @@
+import threading
+import time
+from functools import wraps
+
+from flask import g, has_request_context, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+REPLICA_BIND = 'replica'
+
+
+class RoutingSession(Session):
+    """Sends reads from @use_replica views to the replica engine.
+
+    Everything else, and any flush, goes to the primary as before. Without a
+    configured replica this behaves exactly like the default session.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_request_context() and g.get('use_replica'):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class DatabaseRouter:
+    """Tracks recent writers so their reads stay on the primary.
+
+    The write log is per worker; with a single gunicorn worker (run.sh) that
+    covers every request a client makes.
+    """
+
+    def __init__(self, app=None):
+        self._last_write = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        from .extensions import db
+
+        self.window = app.config['READ_YOUR_WRITES_SECONDS']
+        self.busy_timeout = app.config['SQLITE_BUSY_TIMEOUT_MS']
+
+        with app.app_context():
+            for engine in db.engines.values():
+                if engine.dialect.name == 'sqlite':
+                    event.listen(engine, 'connect', self._sqlite_pragmas)
+
+        if not event.contains(RoutingSession, 'after_flush', self._on_flush):
+            event.listen(RoutingSession, 'after_flush', self._on_flush)
+        app.after_request(self._record_write)
+
+    def _sqlite_pragmas(self, dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # WAL lets readers proceed while a writer holds the lock; busy_timeout
+        # makes writers wait for the lock instead of failing immediately.
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute(f'PRAGMA busy_timeout={self.busy_timeout}')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.close()
+
+    @staticmethod
+    def _on_flush(session, flush_context):
+        if has_request_context():
+            g.db_wrote = True
+
+    def _record_write(self, response):
+        if g.get('db_wrote'):
+            with self._lock:
+                self._last_write[requester_key()] = time.monotonic()
+        return response
+
+    def wrote_recently(self, key):
+        with self._lock:
+            last = self._last_write.get(key)
+            if last is not None and time.monotonic() - last >= self.window:
+                del self._last_write[key]
+                last = None
+        return last is not None
+
+
+def requester_key():
+    try:
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+    except Exception:
+        identity = None
+    return identity or request.remote_addr
+
+
+db_router = DatabaseRouter()
+
+
+def use_replica(view):
+    """Serve a read-only view from the replica when one is configured."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.use_replica = not db_router.wrote_recently(requester_key())
+        return view(*args, **kwargs)
+    return wrapper
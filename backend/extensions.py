@@ -1,9 +1,10 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
-from flask_bcrypt import Bcrypt
+from .passwords import PasswordHasher
+from .db_routing import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 jwt = JWTManager()
-bcrypt = Bcrypt()
+password_hasher = PasswordHasher()
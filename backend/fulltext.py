@@ -0,0 +1,241 @@
+import datetime
+import html
+import re
+
+from sqlalchemy import event, text
+
+from .extensions import db
+
+KINDS = ('message', 'conversation', 'visual')
+TOKEN = re.compile(r'\w+', re.UNICODE)
+
+# Snippet highlight markers; replaced by <mark> tags once the rest of the
+# snippet has been HTML-escaped, so stored text can never inject markup.
+START, STOP = '\x02', '\x03'
+
+# SQLite: one FTS5 index over a shadow table of searchable rows, maintained
+# by triggers on the source tables. Visual data contributes its JSON string
+# values other than ids and layout hints.
+SQLITE_DDL = [
+    '''CREATE TABLE IF NOT EXISTS search_documents (
+        id INTEGER PRIMARY KEY,
+        kind TEXT NOT NULL,
+        ref_id TEXT NOT NULL,
+        student_id TEXT NOT NULL,
+        conversation_id TEXT,
+        title TEXT NOT NULL DEFAULT '',
+        body TEXT NOT NULL DEFAULT '',
+        updated_at TEXT,
+        UNIQUE (kind, ref_id)
+    )''',
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        student_id, title, body,
+        content='search_documents', content_rowid='id', tokenize='porter unicode61'
+    )''',
+    '''CREATE TRIGGER IF NOT EXISTS search_documents_ai AFTER INSERT ON search_documents BEGIN
+        INSERT INTO search_index (rowid, student_id, title, body)
+        VALUES (new.id, new.student_id, new.title, new.body);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS search_documents_ad AFTER DELETE ON search_documents BEGIN
+        INSERT INTO search_index (search_index, rowid, student_id, title, body)
+        VALUES ('delete', old.id, old.student_id, old.title, old.body);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS search_documents_au AFTER UPDATE ON search_documents BEGIN
+        INSERT INTO search_index (search_index, rowid, student_id, title, body)
+        VALUES ('delete', old.id, old.student_id, old.title, old.body);
+        INSERT INTO search_index (rowid, student_id, title, body)
+        VALUES (new.id, new.student_id, new.title, new.body);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS messages_search_ai AFTER INSERT ON messages BEGIN
+        INSERT INTO search_documents (kind, ref_id, student_id, conversation_id, body, updated_at)
+        SELECT 'message', new.id, c.student_id, new.conversation_id, new.content, new.timestamp
+        FROM chat_conversations c WHERE c.id = new.conversation_id;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS messages_search_au AFTER UPDATE OF content, timestamp ON messages BEGIN
+        UPDATE search_documents SET body = new.content, updated_at = new.timestamp
+        WHERE kind = 'message' AND ref_id = old.id;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS messages_search_ad AFTER DELETE ON messages BEGIN
+        DELETE FROM search_documents WHERE kind = 'message' AND ref_id = old.id;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS chat_conversations_search_ai AFTER INSERT ON chat_conversations BEGIN
+        INSERT INTO search_documents (kind, ref_id, student_id, conversation_id, title, body, updated_at)
+        VALUES ('conversation', new.id, new.student_id, new.id, new.title, coalesce(new.summary, ''),
+                new.updated_at);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS chat_conversations_search_au
+        AFTER UPDATE OF title, summary, updated_at ON chat_conversations BEGIN
+        UPDATE search_documents SET title = new.title, body = coalesce(new.summary, ''), updated_at = new.updated_at
+        WHERE kind = 'conversation' AND ref_id = old.id;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS chat_conversations_search_ad AFTER DELETE ON chat_conversations BEGIN
+        DELETE FROM search_documents WHERE kind = 'conversation' AND ref_id = old.id;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS visuals_search_ai AFTER INSERT ON visuals BEGIN
+        INSERT INTO search_documents (kind, ref_id, student_id, title, body, updated_at)
+        VALUES ('visual', new.id, new.student_id, new.title, (
+            SELECT coalesce(group_concat(value, ' '), '')
+            FROM json_tree(CASE WHEN json_valid(new.data) THEN new.data ELSE '{}' END)
+            WHERE type = 'text' AND coalesce(key, '') NOT IN ('id', 'parentId', 'theme', 'content_type', 'visual_hint')
+        ), new.updated_at);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS visuals_search_au AFTER UPDATE OF title, data, updated_at ON visuals BEGIN
+        UPDATE search_documents SET title = new.title, updated_at = new.updated_at, body = (
+            SELECT coalesce(group_concat(value, ' '), '')
+            FROM json_tree(CASE WHEN json_valid(new.data) THEN new.data ELSE '{}' END)
+            WHERE type = 'text' AND coalesce(key, '') NOT IN ('id', 'parentId', 'theme', 'content_type', 'visual_hint')
+        )
+        WHERE kind = 'visual' AND ref_id = old.id;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS visuals_search_ad AFTER DELETE ON visuals BEGIN
+        DELETE FROM search_documents WHERE kind = 'visual' AND ref_id = old.id;
+    END''',
+]
+
+# Postgres: a generated tsvector column per source table, so every write
+# keeps it current, with a GIN index over it.
+POSTGRES_DDL = [
+    '''ALTER TABLE messages ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (to_tsvector('english', content)) STORED''',
+    '''ALTER TABLE chat_conversations ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (setweight(to_tsvector('english', title), 'A')
+                             || setweight(to_tsvector('english', coalesce(summary, '')), 'B')) STORED''',
+    '''ALTER TABLE visuals ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (setweight(to_tsvector('english', title), 'A')
+                             || setweight(json_to_tsvector('english', data, '["string"]'), 'B')) STORED''',
+    'CREATE INDEX IF NOT EXISTS ix_messages_search_vector ON messages USING gin (search_vector)',
+    'CREATE INDEX IF NOT EXISTS ix_chat_conversations_search_vector ON chat_conversations USING gin (search_vector)',
+    'CREATE INDEX IF NOT EXISTS ix_visuals_search_vector ON visuals USING gin (search_vector)',
+]
+
+
+def install(connection):
+    """Creates the full-text index for the connection's dialect, if it supports one."""
+    statements = {'sqlite': SQLITE_DDL, 'postgresql': POSTGRES_DDL}.get(connection.dialect.name, [])
+    for statement in statements:
+        connection.exec_driver_sql(statement)
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _install_after_create(target, connection, **kw):
+    # Databases built with create_all (benchmarks, scratch databases) get the
+    # index too; migrated databases get it from their migration.
+    install(connection)
+
+
+def _phrase(value):
+    return '"' + value.replace('"', '""') + '"'
+
+
+def _fts5_query(query):
+    """An FTS5 expression matching every word of query in a title or body, the last as a prefix."""
+    words = TOKEN.findall(query)
+    if not words:
+        return None
+    terms = [_phrase(word) for word in words[:-1]] + [_phrase(words[-1]) + '*']
+    return '{title body}: (' + ' '.join(terms) + ')'
+
+
+def _sqlite_search(student_id, query, kinds, limit, offset):
+    match = _fts5_query(query)
+    if match is None:
+        return []
+    kind_marks = ', '.join(f':kind{n}' for n in range(len(kinds)))
+    sql = f'''
+        SELECT d.kind, d.ref_id AS id, d.conversation_id,
+               CASE WHEN d.kind = 'message' THEN c.title ELSE d.title END AS title,
+               snippet(search_index, 2, :start, :stop, '…', 16) AS body_snippet,
+               snippet(search_index, 1, :start, :stop, '…', 16) AS title_snippet,
+               d.updated_at, -bm25(search_index, 0.0, 4.0, 1.0) AS score
+        FROM search_index
+        JOIN search_documents d ON d.id = search_index.rowid
+        LEFT JOIN chat_conversations c ON d.kind = 'message' AND c.id = d.conversation_id
+        WHERE search_index MATCH :match AND d.student_id = :student_id AND d.kind IN ({kind_marks})
+        ORDER BY score DESC, d.updated_at DESC
+        LIMIT :limit OFFSET :offset
+    '''
+    params = {
+        # The student_id column filter lets the index narrow to the
+        # student's rows; the join re-checks the exact id.
+        'match': f'student_id: {_phrase(student_id)} AND {match}',
+        'student_id': student_id, 'start': START, 'stop': STOP, 'limit': limit, 'offset': offset,
+        **{f'kind{n}': kind for n, kind in enumerate(kinds)},
+    }
+    results = []
+    for row in db.session.execute(text(sql), params).mappings():
+        snippet = row['body_snippet'] if START in (row['body_snippet'] or '') else row['title_snippet']
+        results.append(dict(row, snippet=snippet))
+    return results
+
+
+POSTGRES_BRANCHES = {
+    'message': '''
+        SELECT 'message' AS kind, m.id, m.conversation_id, c.title, m.content AS body,
+               m.timestamp AS updated_at, ts_rank_cd(m.search_vector, q.query) AS score
+        FROM messages m JOIN chat_conversations c ON c.id = m.conversation_id, q
+        WHERE c.student_id = :student_id AND m.search_vector @@ q.query''',
+    'conversation': '''
+        SELECT 'conversation', c.id, c.id, c.title, coalesce(c.summary, ''),
+               c.updated_at, ts_rank_cd(c.search_vector, q.query)
+        FROM chat_conversations c, q
+        WHERE c.student_id = :student_id AND c.search_vector @@ q.query''',
+    'visual': '''
+        SELECT 'visual', v.id, NULL, v.title, v.data::text,
+               v.updated_at, ts_rank_cd(v.search_vector, q.query)
+        FROM visuals v, q
+        WHERE v.student_id = :student_id AND v.search_vector @@ q.query''',
+}
+
+
+def _postgres_search(student_id, query, kinds, limit, offset):
+    branches = ' UNION ALL '.join(POSTGRES_BRANCHES[kind] for kind in kinds)
+    # Headlines are the expensive part, so they are built for the page only.
+    sql = f'''
+        WITH q AS (SELECT websearch_to_tsquery('english', :query) AS query),
+        hits AS ({branches})
+        SELECT page.kind, page.id, page.conversation_id, page.title, page.updated_at, page.score,
+               ts_headline('english', page.body, q.query, :options) AS snippet
+        FROM (SELECT * FROM hits ORDER BY score DESC, updated_at DESC LIMIT :limit OFFSET :offset) page, q
+        ORDER BY page.score DESC, page.updated_at DESC
+    '''
+    params = {
+        'query': query, 'student_id': student_id, 'limit': limit, 'offset': offset,
+        'options': f'StartSel={START}, StopSel={STOP}, MaxFragments=1, MinWords=8, MaxWords=24',
+    }
+    return [dict(row) for row in db.session.execute(text(sql), params).mappings()]
+
+
+def highlight(snippet):
+    """The snippet as HTML: escaped, with matched terms in <mark> tags."""
+    return html.escape(snippet or '').replace(START, '<mark>').replace(STOP, '</mark>')
+
+
+def to_datetime(value):
+    # SQLite hands back the shadow table's timestamps as text.
+    if isinstance(value, str):
+        return datetime.datetime.fromisoformat(value)
+    return value
+
+
+def search(student_id, query, kinds=KINDS, limit=20, offset=0):
+    """A page of the student's messages, conversations and visuals matching query, best first.
+
+    Each result is a dict with kind, id, conversation_id, title, snippet
+    (HTML), updated_at and score. Scores only compare within one search.
+    """
+    kinds = [kind for kind in KINDS if kind in kinds]
+    if not kinds or not query.strip():
+        return []
+    if db.session.get_bind().dialect.name == 'postgresql':
+        rows = _postgres_search(student_id, query, kinds, limit, offset)
+    else:
+        rows = _sqlite_search(student_id, query, kinds, limit, offset)
+    return [{
+        'kind': row['kind'],
+        'id': row['id'],
+        'conversation_id': row['conversation_id'],
+        'title': row['title'],
+        'snippet': highlight(row['snippet']),
+        'updated_at': to_datetime(row['updated_at']),
+        'score': float(row['score']),
+    } for row in rows]
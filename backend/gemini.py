@@ -0,0 +1,99 @@
+import threading
+import time
+
+from flask import current_app
+
+from .ai_log import usage_counts
+from .metrics import metrics
+from .upstream import upstream
+
+_genai = None
+_genai_lock = threading.Lock()
+
+
+def sdk():
+    """google.generativeai, imported and configured on first use.
+
+    The SDK (and protobuf/grpc under it) takes most of a second to import,
+    which app startup and CLI commands such as `flask db upgrade` should not
+    pay for.
+    """
+    global _genai
+    if _genai is None:
+        with _genai_lock:
+            if _genai is None:
+                import google.generativeai as genai
+                genai.configure(api_key=current_app.config['GEMINI_API_KEY'])
+                _genai = genai
+    return _genai
+
+
+def is_light_input(contents, max_chars):
+    """True for short, text-only contents (no images, audio or files)."""
+    total = 0
+    stack = [contents]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            total += len(item)
+        elif isinstance(item, dict):
+            if 'data' in item or 'mime_type' in item:
+                return False
+            stack.extend(item.get('parts', []))
+        elif isinstance(item, (list, tuple)):
+            stack.extend(item)
+        if total > max_chars:
+            return False
+    return True
+
+
+def choose_profile(endpoint, user_input):
+    """Returns (profile_name, settings) for this endpoint and input."""
+    profiles = current_app.config['GENERATION_PROFILES']
+    settings = dict(profiles.get(endpoint, profiles['default']))
+    light = settings.pop('light', None)
+    if light and is_light_input(user_input, current_app.config['GENERATION_LIGHT_INPUT_CHARS']):
+        settings.update(light)
+        return 'light', settings
+    return 'standard', settings
+
+
+def generate(endpoint, contents, model_name=None, idempotent=True, user_input=None, **model_kwargs):
+    """Single entry point for Gemini generations from the routes.
+
+    The model and generation config come from the endpoint's profile in
+    GENERATION_PROFILES (see choose_profile); `model_name` overrides the
+    model. Pass the student's own text as `user_input` when `contents` wraps
+    it in a long prompt template, so the light profile is judged on what
+    they asked. Returns (response, latency_seconds) and records the call's
+    duration, token counts and chosen profile under `endpoint` in
+    backend.metrics. The call runs under the endpoint's deadline, retry,
+    hedging and circuit-breaker policy (backend.upstream); pass
+    idempotent=False for calls that must not be repeated.
+    """
+    profile, settings = choose_profile(endpoint, contents if user_input is None else user_input)
+    model_name = model_name or settings['model']
+    generation_config = {
+        'max_output_tokens': settings.get('max_output_tokens'),
+        'temperature': settings.get('temperature'),
+    }
+    if settings.get('json'):
+        generation_config['response_mime_type'] = 'application/json'
+    metrics.generation_profile(endpoint, profile, model_name)
+
+    model = sdk().GenerativeModel(model_name=model_name, generation_config=generation_config, **model_kwargs)
+    started = time.perf_counter()
+    try:
+        response = upstream.call(
+            model_name, endpoint,
+            lambda timeout: model.generate_content(contents, request_options={'timeout': timeout}),
+            idempotent=idempotent
+        )
+    except Exception as e:
+        metrics.upstream_error(model_name, endpoint, e.__cause__ or e)
+        raise
+    latency = time.perf_counter() - started
+
+    input_tokens, output_tokens = usage_counts(response)
+    metrics.observe_upstream(model_name, endpoint, latency, input_tokens, output_tokens)
+    return response, latency
@@ -0,0 +1,88 @@
+import threading
+import time
+
+from flask import current_app, jsonify
+from sqlalchemy import event
+
+from .extensions import db, jwt
+from .models.user import User
+
+
+class IdentityCache:
+    """Per-worker TTL cache of the small user projection used by auth'd routes.
+
+    Holds {id, name, email, role} keyed by user id so identity-dependent
+    routes skip the polymorphic User load. Entries expire after
+    IDENTITY_CACHE_TTL seconds and are dropped as soon as a User row is
+    updated or deleted through the ORM in this worker.
+    """
+
+    def __init__(self, app=None):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = app.config['IDENTITY_CACHE_TTL']
+        self.max_entries = app.config['IDENTITY_CACHE_MAX_ENTRIES']
+        # propagate=True also covers the Student/Teacher subclasses.
+        for identifier in ('after_update', 'after_delete'):
+            if not event.contains(User, identifier, self._on_change):
+                event.listen(User, identifier, self._on_change, propagate=True)
+
+        # Makes flask_jwt_extended.current_user resolve through the cache on
+        # every @jwt_required() route.
+        jwt.user_lookup_loader(self._lookup)
+        jwt.user_lookup_error_loader(self._lookup_error)
+
+    def _lookup(self, jwt_header, jwt_data):
+        return self.get(jwt_data[current_app.config['JWT_IDENTITY_CLAIM']])
+
+    @staticmethod
+    def _lookup_error(jwt_header, jwt_data):
+        return jsonify({"message": "User not found"}), 404
+
+    def _on_change(self, mapper, connection, target):
+        self.invalidate(target.id)
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        # Plain column query: no polymorphic join to students/teachers.
+        row = db.session.query(User.id, User.name, User.email, User.role).filter(User.id == user_id).first()
+        if row is None:
+            return None
+        identity = {"id": row.id, "name": row.name, "email": row.email, "role": row.role}
+
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._evict(now)
+            self._entries[user_id] = (now + self.ttl, identity)
+        return identity
+
+    def _evict(self, now):
+        expired = [key for key, (expires, _) in self._entries.items() if expires <= now]
+        for key in expired:
+            del self._entries[key]
+        if len(self._entries) >= self.max_entries:
+            # Still full of live entries: drop the oldest-inserted one.
+            del self._entries[next(iter(self._entries))]
+
+    def invalidate(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+
+identity_cache = IdentityCache()
@@ -0,0 +1,216 @@
+import datetime
+import random
+import threading
+import time
+import uuid
+
+import click
+import sqlalchemy as sa
+from flask import g
+from sqlalchemy.exc import IntegrityError
+
+from .extensions import db
+from .models.generation_job import GenerationJob
+
+TERMINAL = ('succeeded', 'failed')
+
+
+class JobInputError(ValueError):
+    """The job's payload can never succeed; it fails without retrying."""
+
+
+class JobHandler:
+    def __init__(self, kind, run, requires_any):
+        self.kind = kind
+        self.run = run
+        self.requires_any = requires_any
+
+    def input_error(self, payload):
+        if not isinstance(payload, dict):
+            return 'input must be an object'
+        if self.requires_any and not any(payload.get(field) for field in self.requires_any):
+            return f"input needs one of: {', '.join(self.requires_any)}"
+        return None
+
+
+class JobQueue:
+    """Durable queue for long-running generations, backed by generation_jobs.
+
+    submit() stores a job and returns at once; worker threads claim queued
+    rows with a conditional UPDATE, so any number of processes can share the
+    table. A claimed job holds a lease; if its worker dies the lease runs out
+    and another worker picks it up. Failures are retried with jittered
+    backoff up to JOB_MAX_ATTEMPTS, and finished jobs keep their result for
+    JOB_RESULT_TTL seconds before they are purged.
+
+    Workers start with the first request a process serves (JOB_WORKERS per
+    process, 0 to disable), or run standalone with `flask jobs-worker`.
+    """
+
+    def __init__(self, app=None):
+        self.handlers = {}
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+        self._threads = []
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.workers = app.config['JOB_WORKERS']
+        self.max_attempts = app.config['JOB_MAX_ATTEMPTS']
+        self.lease = datetime.timedelta(seconds=app.config['JOB_LEASE_SECONDS'])
+        self.poll_interval = app.config['JOB_POLL_SECONDS']
+        self.retry_backoff = app.config['JOB_RETRY_BACKOFF']
+        self.result_ttl = datetime.timedelta(seconds=app.config['JOB_RESULT_TTL'])
+        app.before_request(self._ensure_workers)
+        app.cli.add_command(jobs_worker_command)
+
+    def handler(self, kind, requires_any=()):
+        """Registers the decorated function(payload) -> result as a job kind."""
+        def decorator(run):
+            self.handlers[kind] = JobHandler(kind, run, requires_any)
+            return run
+        return decorator
+
+    def submit(self, kind, payload, owner, student_id=None, idempotency_key=None):
+        """Queues a job and returns (job, created).
+
+        With an idempotency key, a repeat submission by the same owner
+        returns the existing job instead of queueing another.
+        """
+        if idempotency_key:
+            existing = GenerationJob.query.filter_by(owner=owner, idempotency_key=idempotency_key).first()
+            if existing is not None:
+                return existing, False
+
+        job = GenerationJob(id=str(uuid.uuid4()), kind=kind, owner=owner, student_id=student_id,
+                            idempotency_key=idempotency_key, payload=payload, status='queued', attempts=0)
+        db.session.add(job)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # A concurrent submission with the same key won the race.
+            db.session.rollback()
+            return GenerationJob.query.filter_by(owner=owner, idempotency_key=idempotency_key).one(), False
+        self._wake.set()
+        return job, True
+
+    def _ensure_workers(self):
+        # Started lazily so the threads live in the serving process, not a
+        # pre-fork parent or a CLI command.
+        if len(self._threads) < self.workers:
+            with self._lock:
+                while len(self._threads) < self.workers:
+                    thread = threading.Thread(target=self.run_worker, name=f'job-worker-{len(self._threads)}',
+                                              daemon=True)
+                    self._threads.append(thread)
+                    thread.start()
+
+    def run_worker(self, stop=None):
+        worker_id = f'{threading.current_thread().name}-{uuid.uuid4().hex[:8]}'
+        while stop is None or not stop.is_set():
+            try:
+                with self.app.app_context():
+                    self._purge_expired()
+                    job = self._claim()
+                    if job is not None:
+                        self._execute(job)
+                        continue
+            except Exception as e:
+                print(f"An error occurred in job worker {worker_id}: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def _claimable(self, now):
+        return sa.or_(
+            sa.and_(GenerationJob.status == 'queued', GenerationJob.run_after <= now),
+            sa.and_(GenerationJob.status == 'running', GenerationJob.lease_expires_at < now),
+        )
+
+    def _claim(self):
+        now = datetime.datetime.now()
+        candidates = db.session.execute(
+            sa.select(GenerationJob.id).where(self._claimable(now))
+            .order_by(GenerationJob.run_after).limit(5)
+        ).scalars().all()
+        for job_id in candidates:
+            # Only one worker's UPDATE can match while the row is still claimable.
+            claimed = db.session.execute(
+                sa.update(GenerationJob)
+                .where(GenerationJob.id == job_id, self._claimable(now))
+                .values(status='running', attempts=GenerationJob.attempts + 1,
+                        lease_expires_at=now + self.lease, updated_at=now)
+            ).rowcount
+            db.session.commit()
+            if claimed:
+                return db.session.get(GenerationJob, job_id)
+        db.session.commit()
+        return None
+
+    def _execute(self, job):
+        handler = self.handlers.get(job.kind)
+        # Lets ai_log attribute the model calls to the job's student.
+        g.student_id = job.student_id
+        g.job_kind = job.kind
+        try:
+            if handler is None:
+                raise JobInputError(f'Unknown job kind: {job.kind}')
+            result = handler.run(job.payload)
+        except Exception as e:
+            db.session.rollback()
+            retry = not isinstance(e, JobInputError) and job.attempts < self.max_attempts
+            print(f"An error occurred running {job.kind} job {job.id} (attempt {job.attempts}): {e}")
+            if retry:
+                delay = random.uniform(0.5, 1.5) * self.retry_backoff * 2 ** (job.attempts - 1)
+                self._finish(job, status='queued', error=str(e),
+                             run_after=datetime.datetime.now() + datetime.timedelta(seconds=delay))
+                self._count('retried')
+            else:
+                self._finish(job, status='failed', error=str(e) or type(e).__name__)
+                self._count('failed')
+            return
+        self._finish(job, status='succeeded', result=result, error=None)
+        self._count('completed')
+
+    def _count(self, outcome):
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def _finish(self, job, **values):
+        now = datetime.datetime.now()
+        if values['status'] in TERMINAL:
+            values.update(finished_at=now, expires_at=now + self.result_ttl)
+        values.update(lease_expires_at=None, updated_at=now)
+        db.session.execute(sa.update(GenerationJob).where(GenerationJob.id == job.id).values(**values))
+        db.session.commit()
+
+    def _purge_expired(self):
+        if time.monotonic() - self._last_purge < 60:
+            return
+        self._last_purge = time.monotonic()
+        db.session.execute(sa.delete(GenerationJob).where(GenerationJob.expires_at < datetime.datetime.now()))
+        db.session.commit()
+
+
+@click.command('jobs-worker')
+@click.option('--threads', default=2, show_default=True, help='Worker threads in this process.')
+def jobs_worker_command(threads):
+    """Run background generation workers in the foreground."""
+    stop = threading.Event()
+    workers = [threading.Thread(target=job_queue.run_worker, args=(stop,), daemon=True) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    print(f"Running {threads} job workers; Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        stop.set()
+
+
+job_queue = JobQueue()
@@ -0,0 +1,224 @@
+"""WebSocket gateway for live tutoring sessions.
+
+Runs as its own process next to the web worker:
+
+    python -m backend.live_gateway
+
+A client connects to ws://<host>:<LIVE_GATEWAY_PORT>/live/<session_id>?token=<jwt>
+and streams transcript fragments as JSON:
+
+    {"type": "transcript", "role": "user", "text": "...", "timestamp": <ms>}
+    {"type": "ping"}
+    {"type": "end"}
+
+Fragments are buffered and written to transcript_items with one multi-row
+INSERT and one commit per batch, when LIVE_TRANSCRIPT_BATCH_SIZE fragments
+are pending or LIVE_TRANSCRIPT_FLUSH_SECONDS have passed. The server pushes
+"ready", "flushed", "pong", "error" and "ended" events on the same socket.
+"""
+import datetime
+import json
+import time
+from urllib.parse import parse_qs, urlparse
+
+import sqlalchemy as sa
+from flask_jwt_extended import decode_token
+from websockets.exceptions import ConnectionClosed
+from websockets.sync.server import serve
+
+from . import create_app
+from .extensions import db
+from .models.live_session import LiveSession
+from .models.transcript_item import TranscriptItem
+
+# Application-defined close codes (4000-4999 are reserved for applications).
+CLOSE_UNAUTHORIZED = 4401
+CLOSE_FORBIDDEN = 4403
+CLOSE_BAD_PATH = 4404
+
+MAX_FRAGMENT_CHARS = 10000
+MAX_ROLE_CHARS = 50
+
+
+class TranscriptBuffer:
+    """Collects transcript fragments for one session and writes them in batches."""
+
+    def __init__(self, session_id, batch_size, flush_interval):
+        self.session_id = session_id
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pending = []
+        self.last_flush = time.monotonic()
+
+    def add(self, role, text, timestamp):
+        self.pending.append({
+            'role': role,
+            'text': text,
+            'timestamp': timestamp,
+            'live_session_id': self.session_id,
+        })
+
+    def due(self):
+        return len(self.pending) >= self.batch_size or \
+            (self.pending and self.seconds_until_due() <= 0)
+
+    def seconds_until_due(self):
+        return self.flush_interval - (time.monotonic() - self.last_flush)
+
+    def flush(self):
+        rows, self.pending = self.pending, []
+        self.last_flush = time.monotonic()
+        if not rows:
+            return 0
+        try:
+            db.session.execute(sa.insert(TranscriptItem).values(rows))
+            db.session.execute(
+                sa.update(LiveSession).where(LiveSession.id == self.session_id)
+                .values(end_time=max(row['timestamp'] for row in rows))
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            # Put the batch back so the next flush retries it.
+            self.pending = rows + self.pending
+            raise
+        return len(rows)
+
+
+def parse_timestamp(value):
+    """A fragment's timestamp in epoch milliseconds as a datetime, now if absent.
+
+    Raises ValueError for anything but a number in the datetime range.
+    """
+    if value is None:
+        return datetime.datetime.now()
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError('timestamp must be a number')
+    try:
+        return datetime.datetime.fromtimestamp(value / 1000.0)
+    except (OverflowError, OSError, ValueError) as e:
+        raise ValueError('timestamp is out of range') from e
+
+
+class LiveGateway:
+    def __init__(self, app):
+        self.app = app
+        self.batch_size = app.config['LIVE_TRANSCRIPT_BATCH_SIZE']
+        self.flush_interval = app.config['LIVE_TRANSCRIPT_FLUSH_SECONDS']
+
+    def authenticate(self, websocket):
+        """Returns (student_id, session_id) or closes the socket and returns None."""
+        url = urlparse(websocket.request.path)
+        parts = url.path.strip('/').split('/')
+        if len(parts) != 2 or parts[0] != 'live' or not parts[1]:
+            websocket.close(CLOSE_BAD_PATH, 'Expected /live/<session_id>')
+            return None
+
+        token = parse_qs(url.query).get('token', [None])[0]
+        try:
+            student_id = decode_token(token)[self.app.config['JWT_IDENTITY_CLAIM']]
+        except Exception:
+            websocket.close(CLOSE_UNAUTHORIZED, 'Invalid or missing token')
+            return None
+        return student_id, parts[1]
+
+    def open_session(self, student_id, session_id):
+        live_session = db.session.get(LiveSession, session_id)
+        if live_session is None:
+            now = datetime.datetime.now()
+            live_session = LiveSession(id=session_id, start_time=now, end_time=now, student_id=student_id)
+            db.session.add(live_session)
+            db.session.commit()
+        return live_session.student_id == student_id
+
+    def send(self, websocket, event_type, **payload):
+        websocket.send(json.dumps({'type': event_type, **payload}))
+
+    def handle(self, websocket):
+        with self.app.app_context():
+            auth = self.authenticate(websocket)
+            if auth is None:
+                return
+            student_id, session_id = auth
+            if not self.open_session(student_id, session_id):
+                websocket.close(CLOSE_FORBIDDEN, 'Session belongs to another student')
+                return
+
+            buffer = TranscriptBuffer(session_id, self.batch_size, self.flush_interval)
+            self.send(websocket, 'ready', sessionId=session_id)
+            try:
+                self.receive_loop(websocket, buffer)
+            except ConnectionClosed:
+                pass
+            finally:
+                try:
+                    buffer.flush()
+                except Exception as e:
+                    print(f"An error occurred flushing transcript for session {session_id}: {e}")
+                db.session.remove()
+
+    def receive_loop(self, websocket, buffer):
+        while True:
+            timeout = max(buffer.seconds_until_due(), 0) if buffer.pending else None
+            try:
+                raw = websocket.recv(timeout=timeout)
+            except TimeoutError:
+                raw = None
+
+            if raw is not None:
+                try:
+                    message = json.loads(raw)
+                except (TypeError, ValueError):
+                    message = None
+                if not isinstance(message, dict):
+                    self.send(websocket, 'error', message='Messages must be JSON objects')
+                    continue
+
+                message_type = message.get('type')
+                if message_type == 'transcript':
+                    text = message.get('text')
+                    role = message.get('role', 'user')
+                    if not isinstance(text, str) or not text or len(text) > MAX_FRAGMENT_CHARS:
+                        self.send(websocket, 'error', message='Transcript text is missing or too long')
+                        continue
+                    if not isinstance(role, str) or not role or len(role) > MAX_ROLE_CHARS:
+                        self.send(websocket, 'error', message='Transcript role is missing or too long')
+                        continue
+                    try:
+                        timestamp = parse_timestamp(message.get('timestamp'))
+                    except ValueError as e:
+                        self.send(websocket, 'error', message=f'Invalid transcript timestamp: {e}')
+                        continue
+                    buffer.add(role, text, timestamp)
+                elif message_type == 'ping':
+                    self.send(websocket, 'pong')
+                elif message_type == 'end':
+                    count = buffer.flush()
+                    self.send(websocket, 'ended', flushed=count)
+                    websocket.close()
+                    return
+                else:
+                    self.send(websocket, 'error', message=f'Unknown message type: {message_type}')
+
+            if buffer.due():
+                try:
+                    count = buffer.flush()
+                except Exception as e:
+                    print(f"An error occurred writing transcript batch: {e}")
+                    self.send(websocket, 'error', message='Failed to store transcript, will retry')
+                    continue
+                self.send(websocket, 'flushed', count=count)
+
+
+def main():
+    app = create_app()
+    gateway = LiveGateway(app)
+    host = app.config['LIVE_GATEWAY_HOST']
+    port = app.config['LIVE_GATEWAY_PORT']
+    with serve(gateway.handle, host, port) as server:
+        print(f"Live gateway listening on ws://{host}:{port}/live/<session_id>")
+        server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,282 @@
+import collections
+import contextvars
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from flask import current_app, has_request_context
+
+from .admission import admission, BULK
+from .db_routing import requester_key
+
+# A markdown heading, or a short line ending in a colon, starts a section.
+HEADING = re.compile(r'^(#{1,6}\s+\S.*|[^\n]{1,80}:)$')
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def executor():
+    # Own pool: a chunk blocks on its upstream call, so sharing the upstream
+    # or study-pack pools could starve them.
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=current_app.config['MAPREDUCE_MAX_PARALLEL'],
+                                               thread_name_prefix='mapreduce')
+    return _executor
+
+
+def needs_chunking(text):
+    return len(text) > current_app.config['MAPREDUCE_CHUNK_CHARS']
+
+
+def _sections(text):
+    """Splits text into sections, each starting at a heading, as lists of paragraphs."""
+    sections = [[]]
+    for paragraph in re.split(r'\n\s*\n', text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if HEADING.match(paragraph.split('\n', 1)[0]) and sections[-1]:
+            sections.append([])
+        sections[-1].append(paragraph)
+    return [section for section in sections if section]
+
+
+def _pieces(paragraph, max_chars):
+    """A paragraph cut at sentence ends (or hard, for run-on text) into pieces of at most max_chars."""
+    if len(paragraph) <= max_chars:
+        return [paragraph]
+    pieces, current = [], ''
+    for sentence in SENTENCE_END.split(paragraph):
+        while len(sentence) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ''
+            pieces.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            pieces.append(current)
+            current = ''
+        current = f'{current} {sentence}' if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_text(text, max_chars):
+    """Splits text into chunks of at most max_chars, keeping sections together where they fit.
+
+    Whole sections are packed into a chunk while they fit; a section that
+    is too large on its own is split between paragraphs, and a paragraph
+    that is too large between sentences.
+    """
+    chunks, current = [], ''
+
+    def add(block):
+        nonlocal current
+        if current and len(current) + 2 + len(block) > max_chars:
+            chunks.append(current)
+            current = ''
+        current = f'{current}\n\n{block}' if current else block
+
+    for section in _sections(text):
+        block = '\n\n'.join(section)
+        if len(block) <= max_chars:
+            add(block)
+            continue
+        for paragraph in section:
+            for piece in _pieces(paragraph, max_chars):
+                add(piece)
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def map_chunks(fn, text):
+    """Runs fn(chunk) over the chunks of text concurrently; results are in document order.
+
+    Every chunk's model call holds a BULK admission slot. The caller works
+    through the chunks on its own slot (the one its request was admitted
+    with, or one it waits for, as a backend.jobs worker), and up to
+    MAPREDUCE_MAX_PARALLEL - 1 helpers join in while spare slots are free.
+    A request that already holds a slot never waits for another, so
+    concurrent long inputs cannot deadlock on each other's slots. A request
+    is charged one rate token per chunk up front. After a chunk fails no
+    further chunk starts, and the first failure in document order is
+    re-raised, as a single call would have.
+    """
+    chunks = split_text(text, current_app.config['MAPREDUCE_CHUNK_CHARS'])
+    holding = admission.holding()
+    # An admitted request has already paid for the slot it holds.
+    cost = len(chunks) - 1 if holding else len(chunks)
+    if admission.enabled and has_request_context() and cost:
+        admission.check_rate(requester_key(), BULK, cost=cost)
+
+    results = [None] * len(chunks)
+    errors = {}
+    pending = collections.deque(enumerate(chunks))
+    lock = threading.Lock()
+
+    def work():
+        while True:
+            with lock:
+                if errors or not pending:
+                    return
+                index, chunk = pending.popleft()
+            try:
+                results[index] = fn(chunk)
+            except Exception as e:
+                with lock:
+                    errors[index] = e
+                return
+
+    def help_out():
+        with admission.spare_slot() as got_slot:
+            if got_slot:
+                work()
+
+    def run():
+        # Each helper runs in a copy of the caller's context, so the app and
+        # request contexts stay available to gemini.generate and ai_log.
+        helpers = [executor().submit(contextvars.copy_context().run, help_out)
+                   for _ in range(min(current_app.config['MAPREDUCE_MAX_PARALLEL'], len(chunks)) - 1)]
+        try:
+            work()
+        finally:
+            # Helpers that have not started yet are dropped; running ones stop
+            # after their current chunk, since `errors` or an empty queue ends work().
+            for future in helpers:
+                future.cancel()
+            wait(helpers)
+
+    if holding:
+        run()
+    else:
+        with admission.slot(BULK):
+            run()
+    if errors:
+        raise errors[min(errors)]
+    return results
+
+
+def label_key(label):
+    return ' '.join(str(label or '').lower().split())
+
+
+class _Node:
+    def __init__(self, label, theme=None):
+        self.label = label
+        self.theme = theme
+        self.children = []
+        self._by_label = {}
+
+    def child(self, label, theme=None):
+        """The child with this label, created if missing; duplicate labels merge into one node."""
+        key = label_key(label)
+        node = self._by_label.get(key)
+        if node is None:
+            node = self._by_label[key] = _Node(label, theme)
+            self.children.append(node)
+        elif node.theme is None:
+            node.theme = theme
+        return node
+
+
+def _graft(target, children, node_id):
+    """Copies the subtree under node_id beneath target; `children` maps a partial's ids to child nodes."""
+    stack = [(target, node_id)]
+    seen = {node_id}
+    while stack:
+        parent, current = stack.pop()
+        for node in children.get(current, []):
+            if node['id'] in seen:
+                continue
+            seen.add(node['id'])
+            stack.append((parent.child(node.get('label', ''), node.get('theme')), node['id']))
+
+
+def merge_mindmaps(partials):
+    """Merges partial mindmaps from consecutive chunks into one tree.
+
+    The first chunk's title names the result. Each partial's root becomes
+    a main branch, or merges into the root if it has the same label.
+    Siblings with the same label (ignoring case and spacing) merge,
+    children included. Ids are reassigned in document order
+    ("root", "node-1", "node-1.2", ...), so the same partials always give
+    the same mindmap.
+    """
+    title = next((p.get('title') for p in partials if p.get('title')), 'Mindmap')
+    root = _Node(title)
+
+    for partial in partials:
+        nodes = [n for n in partial.get('nodes', []) if isinstance(n, dict) and n.get('id') is not None]
+        ids = {n['id'] for n in nodes}
+        children = {}
+        partial_roots = []
+        for node in nodes:
+            parent = node.get('parentId')
+            if parent is None or parent not in ids or parent == node['id']:
+                partial_roots.append(node)
+            else:
+                children.setdefault(parent, []).append(node)
+        for partial_root in partial_roots:
+            if label_key(partial_root.get('label')) == label_key(title):
+                target = root
+            else:
+                target = root.child(partial_root.get('label', ''), partial_root.get('theme'))
+            _graft(target, children, partial_root['id'])
+
+    merged = [{'id': 'root', 'label': root.label}]
+
+    def emit(node, node_id):
+        for position, child in enumerate(node.children, start=1):
+            child_id = f'node-{position}' if node is root else f'{node_id}.{position}'
+            entry = {'id': child_id, 'label': child.label, 'parentId': node_id}
+            if child.theme:
+                entry['theme'] = child.theme
+            merged.append(entry)
+            emit(child, child_id)
+
+    emit(root, 'root')
+    return {'title': title, 'nodes': merged}
+
+
+def merge_infographics(partials, max_insights=3):
+    """Merges partial infographics from consecutive chunks.
+
+    Sections with the same heading merge, keeping the first one's
+    content_type and visual_hint and each distinct item once, in document
+    order. Highlight insights are de-duplicated and capped at max_insights.
+    """
+    title = next((p.get('title') for p in partials if p.get('title')), 'Infographic')
+    insights, seen_insights = [], set()
+    sections, by_heading, seen_items = [], {}, {}
+
+    for partial in partials:
+        for insight in partial.get('highlight_insights', []) or []:
+            if label_key(insight) not in seen_insights:
+                seen_insights.add(label_key(insight))
+                insights.append(insight)
+        for section in partial.get('sections', []) or []:
+            if not isinstance(section, dict):
+                continue
+            key = label_key(section.get('heading'))
+            if key not in by_heading:
+                by_heading[key] = {
+                    'heading': section.get('heading', ''),
+                    'content_type': section.get('content_type', 'list'),
+                    'visual_hint': section.get('visual_hint', 'list'),
+                    'items': [],
+                }
+                seen_items[key] = set()
+                sections.append(by_heading[key])
+            for item in section.get('items', []) or []:
+                if label_key(item) not in seen_items[key]:
+                    seen_items[key].add(label_key(item))
+                    by_heading[key]['items'].append(item)
+
+    return {'title': title, 'highlight_insights': insights[:max_insights], 'sections': sections}
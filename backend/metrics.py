@@ -0,0 +1,196 @@
+import threading
+import time
+
+from flask import Response, current_app, g, has_request_context, request
+from sqlalchemy import event
+
+from .extensions import db
+
+# Seconds. Chosen to cover both fast DB routes and multi-second generations.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+TOKEN_BUCKETS = (16, 64, 256, 1024, 4096, 16384, 65536)
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{escape_label(v)}"' for k, v in labels) + '}'
+
+
+class Histogram:
+    def __init__(self, name, help, buckets):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = [[0] * len(self.buckets), 0.0, 0]
+        counts = series[0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for key, (counts, total, count) in sorted(self.series.items()):
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{format_labels(key + (("le", bound),))} {bucket_count}')
+            lines.append(f'{self.name}_bucket{format_labels(key + (("le", "+Inf"),))} {count}')
+            lines.append(f'{self.name}_sum{format_labels(key)} {total}')
+            lines.append(f'{self.name}_count{format_labels(key)} {count}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.series = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        self.series[key] = self.series.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        for key, value in sorted(self.series.items()):
+            lines.append(f'{self.name}{format_labels(key)} {value}')
+        return lines
+
+
+class Metrics:
+    """In-process request, upstream and database metrics for this worker.
+
+    Every request is timed per Flask endpoint (one per blueprint route) along
+    with its response size and the number and total time of the SQL
+    statements it ran. Upstream model calls report through
+    observe_upstream(). Everything is exposed at /metrics in the Prometheus
+    text format.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self.request_duration = Histogram(
+            'http_request_duration_seconds', 'Request duration by route.', LATENCY_BUCKETS)
+        self.response_size = Histogram(
+            'http_response_size_bytes', 'Response body size by route.', SIZE_BUCKETS)
+        self.db_queries = Histogram(
+            'db_queries_per_request', 'SQL statements executed per request.', COUNT_BUCKETS)
+        self.db_duration = Histogram(
+            'db_query_duration_seconds_per_request', 'Total SQL time per request.', LATENCY_BUCKETS)
+        self.upstream_duration = Histogram(
+            'upstream_call_duration_seconds', 'Upstream model call duration.', LATENCY_BUCKETS)
+        self.upstream_tokens = Histogram(
+            'upstream_tokens', 'Tokens per upstream call by direction (input/output).', TOKEN_BUCKETS)
+        self.upstream_errors = Counter(
+            'upstream_call_errors_total', 'Upstream model calls that raised.')
+        self.generation_profiles = Counter(
+            'generation_profile_choices_total', 'Generation profile (standard/light) and model chosen per call.')
+        self.upstream_events = Counter(
+            'upstream_call_events_total', 'Retries, hedges, deadlines and short circuits of upstream calls.')
+        self.families = [
+            self.request_duration, self.response_size, self.db_queries, self.db_duration,
+            self.upstream_duration, self.upstream_tokens, self.upstream_errors, self.upstream_events,
+            self.generation_profiles,
+        ]
+        # (name, type, help, fn) for values owned by other components.
+        self.collectors = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self._start_request)
+        app.after_request(self._end_request)
+        app.add_url_rule('/metrics', 'metrics', self.render_view)
+
+        with app.app_context():
+            for engine in db.engines.values():
+                event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+                event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    @staticmethod
+    def _start_request():
+        g.metrics_started = time.perf_counter()
+        g.db_queries = 0
+        g.db_seconds = 0.0
+
+    def _end_request(self, response):
+        started = g.get('metrics_started')
+        if started is None:
+            return response
+        endpoint = request.endpoint or 'unmatched'
+        if endpoint == 'metrics':
+            return response
+        with self._lock:
+            self.request_duration.observe(
+                time.perf_counter() - started,
+                endpoint=endpoint, method=request.method, status=response.status_code)
+            if not response.is_streamed:
+                self.response_size.observe(response.calculate_content_length() or 0, endpoint=endpoint)
+            self.db_queries.observe(g.db_queries, endpoint=endpoint)
+            self.db_duration.observe(g.db_seconds, endpoint=endpoint)
+        return response
+
+    @staticmethod
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context():
+            g.db_query_started = time.perf_counter()
+
+    @staticmethod
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and 'db_queries' in g:
+            g.db_queries += 1
+            g.db_seconds += time.perf_counter() - g.pop('db_query_started', time.perf_counter())
+
+    def observe_upstream(self, model, endpoint, duration, input_tokens=None, output_tokens=None):
+        with self._lock:
+            self.upstream_duration.observe(duration, model=model, endpoint=endpoint)
+            if input_tokens is not None:
+                self.upstream_tokens.observe(input_tokens, model=model, endpoint=endpoint, direction='input')
+            if output_tokens is not None:
+                self.upstream_tokens.observe(output_tokens, model=model, endpoint=endpoint, direction='output')
+
+    def upstream_error(self, model, endpoint, error):
+        with self._lock:
+            self.upstream_errors.inc(model=model, endpoint=endpoint, error=type(error).__name__)
+
+    def upstream_event(self, model, endpoint, event):
+        with self._lock:
+            self.upstream_events.inc(model=model, endpoint=endpoint, event=event)
+
+    def generation_profile(self, endpoint, profile, model):
+        with self._lock:
+            self.generation_profiles.inc(endpoint=endpoint, profile=profile, model=model)
+
+    def add_collector(self, name, metric_type, help, fn):
+        self.collectors.append((name, metric_type, help, fn))
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for family in self.families:
+                lines.extend(family.render())
+        for name, metric_type, help, fn in self.collectors:
+            lines.extend([f'# HELP {name} {help}', f'# TYPE {name} {metric_type}', f'{name} {fn()}'])
+        return '\n'.join(lines) + '\n'
+
+    def render_view(self):
+        token = current_app.config['METRICS_TOKEN']
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
+
+
+metrics = Metrics()
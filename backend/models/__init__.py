@@ -11,3 +11,5 @@ from .quiz_attempt import QuizAttempt
 from .quiz_question import QuizQuestion
 from .feedback import InterventionFlag, AIDecisionLog, TeacherMessage
 from .visual import Visual
+from .generation_job import GenerationJob
+from .catalog_resource import CatalogResource, ResourceSearch
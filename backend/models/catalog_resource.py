@@ -0,0 +1,30 @@
+from ..extensions import db
+import datetime
+
+class CatalogResource(db.Model):
+    """A study resource found by a grounded search, shared by every student."""
+    __tablename__ = 'catalog_resources'
+
+    id = db.Column(db.String(80), primary_key=True)
+    uri = db.Column(db.String(2048), nullable=False, unique=True)
+    title = db.Column(db.String(255), nullable=False)
+    source = db.Column(db.String(255))
+    type = db.Column(db.String(20))
+    first_seen_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.now)
+    last_seen_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.now)
+    # Number of distinct searches whose grounding cited this resource.
+    times_seen = db.Column(db.Integer, nullable=False, default=1)
+
+
+class ResourceSearch(db.Model):
+    """The outcome of one grounded search, keyed by its normalized query."""
+    __tablename__ = 'resource_searches'
+
+    id = db.Column(db.String(80), primary_key=True)
+    query_key = db.Column(db.String(255), nullable=False, unique=True)
+    query_text = db.Column(db.Text, nullable=False)
+    summary = db.Column(db.Text, nullable=False)
+    # CatalogResource ids in the order the search returned them.
+    resource_ids = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.now)
+    hits = db.Column(db.Integer, nullable=False, default=0)
@@ -10,3 +10,7 @@ class ChatConversation(db.Model):
     updated_at = db.Column(db.DateTime, nullable=False)
     student_id = db.Column(db.String(80), db.ForeignKey('students.id'), nullable=False)
     messages = db.relationship('Message', backref='conversation', lazy=True)
+
+    __table_args__ = (
+        db.Index('ix_chat_conversations_student_id_updated_at', 'student_id', 'updated_at'),
+    )
@@ -12,16 +12,29 @@ class InterventionFlag(db.Model):
     severity = db.Column(db.String(20), nullable=False)
     timestamp = db.Column(db.DateTime, nullable=False)
 
+    __table_args__ = (
+        db.Index('ix_intervention_flags_student_id_timestamp', 'student_id', 'timestamp'),
+    )
+
 class AIDecisionLog(db.Model):
     __tablename__ = 'ai_decision_logs'
 
     id = db.Column(db.String(80), primary_key=True)
-    student_id = db.Column(db.String(80), db.ForeignKey('students.id'), nullable=False)
+    # Null for AI calls made without a JWT or by someone who is not a student.
+    student_id = db.Column(db.String(80), db.ForeignKey('students.id'), nullable=True)
+    endpoint = db.Column(db.String(80))
     student_input = db.Column(db.Text, nullable=False)
     ai_output = db.Column(db.Text, nullable=False)
     reasoning = db.Column(db.Text, nullable=False)
+    latency_ms = db.Column(db.Integer)
+    input_tokens = db.Column(db.Integer)
+    output_tokens = db.Column(db.Integer)
     timestamp = db.Column(db.DateTime, nullable=False)
 
+    __table_args__ = (
+        db.Index('ix_ai_decision_logs_student_id_timestamp', 'student_id', 'timestamp'),
+    )
+
 class TeacherMessage(db.Model):
     __tablename__ = 'teacher_messages'
 
@@ -31,3 +44,7 @@ class TeacherMessage(db.Model):
     content = db.Column(db.Text, nullable=False)
     timestamp = db.Column(db.DateTime, nullable=False)
     read = db.Column(db.Boolean, default=False)
+
+    __table_args__ = (
+        db.Index('ix_teacher_messages_student_id_read', 'student_id', 'read'),
+    )
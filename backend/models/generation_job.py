@@ -0,0 +1,33 @@
+from ..extensions import db
+import datetime
+
+class GenerationJob(db.Model):
+    """A long-running generation queued for backend.jobs workers."""
+    __tablename__ = 'generation_jobs'
+
+    id = db.Column(db.String(80), primary_key=True)
+    kind = db.Column(db.String(40), nullable=False)
+    # requester_key() of the submitter (JWT identity or client address);
+    # scopes idempotency keys.
+    owner = db.Column(db.String(120), nullable=False)
+    student_id = db.Column(db.String(80), db.ForeignKey('students.id'), nullable=True)
+    idempotency_key = db.Column(db.String(120), nullable=True)
+    payload = db.Column(db.JSON, nullable=False)
+    # queued -> running -> succeeded | failed; running jobs go back to queued on retry.
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    result = db.Column(db.JSON)
+    error = db.Column(db.Text)
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.datetime.now)
+    # A running job whose lease has passed belongs to a dead worker and is reclaimed.
+    lease_expires_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.now)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.now, onupdate=datetime.datetime.now)
+    finished_at = db.Column(db.DateTime)
+    expires_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.UniqueConstraint('owner', 'idempotency_key', name='uq_generation_jobs_owner_idempotency_key'),
+        db.Index('ix_generation_jobs_status_run_after', 'status', 'run_after'),
+        db.Index('ix_generation_jobs_expires_at', 'expires_at'),
+    )
@@ -8,3 +8,7 @@ class LiveSession(db.Model):
     end_time = db.Column(db.DateTime, nullable=False)
     student_id = db.Column(db.String(80), db.ForeignKey('students.id'), nullable=False)
     transcript = db.relationship('TranscriptItem', backref='live_session', lazy=True)
+
+    __table_args__ = (
+        db.Index('ix_live_sessions_student_id_start_time', 'student_id', 'start_time'),
+    )
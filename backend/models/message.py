@@ -11,3 +11,7 @@ class Message(db.Model):
     timestamp = db.Column(db.DateTime, nullable=False)
     attachment = db.Column(db.JSON)
     conversation_id = db.Column(db.String(80), db.ForeignKey('chat_conversations.id'), nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_messages_conversation_id_timestamp', 'conversation_id', 'timestamp'),
+    )
@@ -9,3 +9,7 @@ class ModuleStats(db.Model):
     time_spent = db.Column(db.Integer, default=0)
     status = db.Column(db.String(20), nullable=False)
     student_id = db.Column(db.String(80), db.ForeignKey('students.id'), nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_module_stats_student_id', 'student_id'),
+    )
@@ -9,3 +9,8 @@ class QuizAttempt(db.Model):
     score = db.Column(db.Integer, nullable=False)
     max_score = db.Column(db.Integer, nullable=False)
     student_id = db.Column(db.String(80), db.ForeignKey('students.id'), nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_quiz_attempts_student_id_date', 'student_id', 'date'),
+        db.Index('ix_quiz_attempts_module_id', 'module_id'),
+    )
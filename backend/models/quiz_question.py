@@ -10,3 +10,7 @@ class QuizQuestion(db.Model):
     correct_answer = db.Column(db.Integer, nullable=False)
     topic = db.Column(db.String(120), nullable=False)
     module_id = db.Column(db.String(80), db.ForeignKey('module_stats.id'), nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_quiz_questions_module_id', 'module_id'),
+    )
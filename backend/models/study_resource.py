@@ -10,3 +10,7 @@ class StudyResource(db.Model):
     type = db.Column(db.String(20))
     date_saved = db.Column(db.DateTime)
     student_id = db.Column(db.String(80), db.ForeignKey('students.id'), nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_study_resources_student_id_date_saved', 'student_id', 'date_saved'),
+    )
@@ -9,3 +9,7 @@ class TranscriptItem(db.Model):
     text = db.Column(db.Text, nullable=False)
     timestamp = db.Column(db.DateTime, nullable=False)
     live_session_id = db.Column(db.String(80), db.ForeignKey('live_sessions.id'), nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_transcript_items_live_session_id_timestamp', 'live_session_id', 'timestamp'),
+    )
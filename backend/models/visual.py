@@ -1,4 +1,5 @@
 from ..extensions import db
+import datetime
 
 class Visual(db.Model):
     __tablename__ = 'visuals'
@@ -8,4 +9,11 @@ class Visual(db.Model):
     title = db.Column(db.String(120), nullable=False)
     data = db.Column(db.JSON, nullable=False)
     created_at = db.Column(db.DateTime, nullable=False)
+    # Change cursor for /library/sync; bumped on every insert or update.
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.now, onupdate=datetime.datetime.now)
     student_id = db.Column(db.String(80), db.ForeignKey('students.id'), nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_visuals_student_id_updated_at', 'student_id', 'updated_at'),
+        db.Index('ix_visuals_student_id_created_at', 'student_id', 'created_at'),
+    )
@@ -0,0 +1,87 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+import bcrypt
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many hash/verify jobs are already waiting, or one took too long."""
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _verify(pw_hash, password):
+    return bcrypt.checkpw(password.encode('utf-8'), pw_hash.encode('utf-8'))
+
+
+def hash_rounds(pw_hash):
+    # bcrypt hashes look like $2b$12$<salt+digest>; the third field is the cost.
+    try:
+        return int(pw_hash.split('$')[2])
+    except (IndexError, ValueError):
+        return None
+
+
+class PasswordHasher:
+    """Runs bcrypt off the request threads on a small process pool.
+
+    bcrypt is deliberately CPU-heavy, so a burst of logins at the start of a
+    class would otherwise monopolise the single gthread worker. Jobs are
+    admitted through a bounded semaphore; when the pool is saturated callers
+    get PasswordHasherBusy instead of queueing without limit.
+    """
+
+    def __init__(self, app=None):
+        self._executor = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.rounds = app.config['BCRYPT_LOG_ROUNDS']
+        self.workers = app.config['PASSWORD_HASH_WORKERS']
+        self.timeout = app.config['PASSWORD_HASH_TIMEOUT']
+        self._slots = threading.BoundedSemaphore(app.config['PASSWORD_HASH_MAX_PENDING'])
+
+    def _get_executor(self):
+        # Created on first use so the pool is started inside the serving
+        # worker, not in a parent process that later forks.
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context('spawn')
+                    )
+        return self._executor
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PasswordHasherBusy()
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # The slot is held until the job is done, not just until we stop
+        # waiting, so a timed-out job still counts against the pending limit.
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise PasswordHasherBusy() from None
+
+    def generate_password_hash(self, password):
+        return self._run(_hash, password, self.rounds)
+
+    def check_password_hash(self, pw_hash, password):
+        return self._run(_verify, pw_hash, password)
+
+    def needs_rehash(self, pw_hash):
+        return hash_rounds(pw_hash) != self.rounds
@@ -0,0 +1,172 @@
+import collections
+import threading
+import time
+
+from flask import g
+
+from .admission import admission, TokenBucket
+from .db_routing import requester_key
+
+
+def normalize_topic(text):
+    return ' '.join(text.lower().split()).strip(' ?!.')
+
+
+class SpeculativePrefetcher:
+    """Generates the artifacts a student is likely to ask for next.
+
+    After a chat turn, the topic named by the tutor's reply (its "topic"
+    field, a short noun phrase such as "Photosynthesis") is queued for each
+    registered kind (a mindmap and a quiz). A later /mindmap/generate-mindmap
+    prompt or /ai/generate-quiz topic that matches it, ignoring case,
+    spacing and trailing punctuation, is a hit. Generations run on background
+    threads only while the admission gate has PREFETCH_GATE_HEADROOM slots
+    free and no request waiting, and no faster than PREFETCH_RATE, so they
+    never delay real traffic; anything over budget is dropped. Results are
+    kept per requester for PREFETCH_TTL seconds, and the matching route
+    answers from them on a hit. Off unless PREFETCH_ENABLED; the cache is
+    per worker process.
+    """
+
+    def __init__(self, app=None):
+        self.builders = {}
+        self._cache = {}
+        self._pending = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._threads = []
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self.skipped = 0
+        self.expired_unused = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config['PREFETCH_ENABLED']
+        self.ttl = app.config['PREFETCH_TTL']
+        self.max_entries = app.config['PREFETCH_MAX_ENTRIES']
+        self.max_pending = app.config['PREFETCH_MAX_PENDING']
+        self.max_topic_chars = app.config['PREFETCH_MAX_TOPIC_CHARS']
+        self.headroom = app.config['PREFETCH_GATE_HEADROOM']
+        self.workers = app.config['PREFETCH_WORKERS']
+        self.budget = TokenBucket(app.config['PREFETCH_RATE'], app.config['PREFETCH_BURST'])
+
+    def register(self, kind, build):
+        """Registers build(topic) -> result as something to prefetch after a chat turn."""
+        self.builders[kind] = build
+
+    def hit_ratio(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def after_chat(self, topic, student_id=None):
+        """Queues prefetches for the topic of a chat turn. Call from the request."""
+        if not self.enabled or not self.builders or not isinstance(topic, str):
+            return
+        display = topic.strip()
+        topic = normalize_topic(topic)
+        if not topic or len(topic) > self.max_topic_chars:
+            # Not a topic anyone asks a mindmap of.
+            return
+        owner = requester_key()
+        now = time.monotonic()
+        with self._lock:
+            for kind in self.builders:
+                key = (owner, kind, topic)
+                entry = self._cache.get(key)
+                if key in self._pending or (entry is not None and entry[0] > now):
+                    continue
+                if len(self._pending) >= self.max_pending:
+                    # Oldest first: the student has most likely moved on from it.
+                    self._pending.popitem(last=False)
+                    self.skipped += 1
+                self._pending[key] = (display, student_id)
+        self._ensure_workers()
+        self._wake.set()
+
+    def take(self, kind, topic):
+        """The prefetched result for this requester and topic, or None."""
+        if not self.enabled:
+            return None
+        key = (requester_key(), kind, normalize_topic(topic))
+        with self._lock:
+            entry = self._cache.pop(key, None)
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                self.expired_unused += 1
+            self.misses += 1
+            return None
+
+    def _ensure_workers(self):
+        if len(self._threads) < self.workers:
+            with self._lock:
+                while len(self._threads) < self.workers:
+                    thread = threading.Thread(target=self._run, name=f'prefetch-{len(self._threads)}', daemon=True)
+                    self._threads.append(thread)
+                    thread.start()
+
+    def _next(self):
+        with self._lock:
+            if not self._pending:
+                return None
+            if self.budget.take():
+                self.skipped += len(self._pending)
+                self._pending.clear()
+                return None
+            # Newest first: the topic the student is on right now.
+            return self._pending.popitem(last=True)
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            while True:
+                item = self._next()
+                if item is None:
+                    break
+                if not admission.gate.try_acquire(self.headroom):
+                    with self._lock:
+                        self.skipped += 1 + len(self._pending)
+                        self._pending.clear()
+                    break
+                started = time.monotonic()
+                try:
+                    self._generate(*item)
+                finally:
+                    admission.gate.release(time.monotonic() - started)
+
+    def _generate(self, key, value):
+        owner, kind, topic = key
+        display, student_id = value
+        try:
+            with self.app.app_context():
+                # Attributes the model call to the student, as for backend.jobs.
+                g.student_id = student_id
+                g.job_kind = kind
+                result = self.builders[kind](display)
+        except Exception as e:
+            print(f"An error occurred prefetching {kind} for {topic!r}: {e}")
+            return
+        now = time.monotonic()
+        with self._lock:
+            self.generated += 1
+            if len(self._cache) >= self.max_entries:
+                self._evict(now)
+            self._cache[key] = (now + self.ttl, result)
+
+    def _evict(self, now):
+        expired = [key for key, (expires, _) in self._cache.items() if expires <= now]
+        for key in expired:
+            del self._cache[key]
+        self.expired_unused += len(expired)
+        if len(self._cache) >= self.max_entries:
+            del self._cache[next(iter(self._cache))]
+            self.expired_unused += 1
+
+
+prefetcher = SpeculativePrefetcher()
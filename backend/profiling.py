@@ -0,0 +1,195 @@
+import collections
+import datetime
+import hmac
+import os
+import random
+import re
+import sys
+import threading
+import time
+
+from flask import Blueprint, abort, current_app, g, jsonify, request, send_from_directory
+
+PROFILE_HEADER = 'X-Profile-Token'
+# .prof files are pstats output from before the sampler; they rotate out.
+PROFILE_NAME_RE = re.compile(r'^[\w.-]+\.(prof|collapsed)$')
+
+bp = Blueprint('profiling', __name__)
+
+
+def folded_stack(frame):
+    """A frame's call stack as `outer;...;inner`, each entry `function (file:first line)`."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+def collapsed_stacks(samples):
+    """Render sample counts per folded stack for flamegraph.pl / speedscope."""
+    return ''.join(f'{stack} {count}\n' for stack, count in samples.most_common())
+
+
+class StackSampler:
+    """Samples the stacks of registered threads from one background thread.
+
+    Unlike a tracing profiler, nothing runs on the profiled thread: every
+    `interval` seconds the sampler reads its current frame through
+    sys._current_frames() and counts the folded stack, so the cost to the
+    request is a brief share of the GIL, not a hook on every call.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._active = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self, thread_id):
+        with self._lock:
+            self._active[thread_id] = collections.Counter()
+            if self._thread is None:
+                # Started lazily so it lives in the serving process, not a pre-fork parent.
+                self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+                self._thread.start()
+            self._wake.set()
+
+    def stop(self, thread_id):
+        """Stops sampling the thread and returns its Counter of folded stacks."""
+        with self._lock:
+            return self._active.pop(thread_id, collections.Counter())
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            with self._lock:
+                if not self._active:
+                    self._wake.clear()
+                    continue
+                thread_ids = list(self._active)
+            frames = sys._current_frames()
+            stacks = {tid: folded_stack(frames[tid]) for tid in thread_ids if tid in frames}
+            del frames
+            with self._lock:
+                for tid, stack in stacks.items():
+                    samples = self._active.get(tid)
+                    if samples is not None:
+                        samples[stack] += 1
+            time.sleep(self.interval)
+
+
+class RequestProfiler:
+    """Profiles selected requests without redeploying.
+
+    A request is profiled when it carries PROFILE_HEADER matching
+    PROFILER_TOKEN, or when it is picked by PROFILER_SAMPLE_RATE. Its thread's
+    stack is sampled every PROFILER_INTERVAL_MS by a StackSampler, and the
+    counts are written to PROFILER_DIR as a .collapsed (flamegraph) file; the
+    directory is trimmed to PROFILER_MAX_FILES. When neither trigger is
+    configured the hooks return after a single check.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.token = app.config['PROFILER_TOKEN']
+        self.sample_rate = app.config['PROFILER_SAMPLE_RATE']
+        self.directory = app.config['PROFILER_DIR']
+        self.max_files = app.config['PROFILER_MAX_FILES']
+        self.sampler = StackSampler(app.config['PROFILER_INTERVAL_MS'] / 1000.0)
+        self.enabled = bool(self.token) or self.sample_rate > 0
+        app.extensions['profiler'] = self
+        app.register_blueprint(bp, url_prefix='/admin/profiles')
+        if self.enabled:
+            app.before_request(self._start)
+            app.after_request(self._stop)
+            app.teardown_request(self._discard)
+
+    def authorized(self):
+        supplied = request.headers.get(PROFILE_HEADER)
+        return bool(self.token and supplied and hmac.compare_digest(supplied, self.token))
+
+    def _start(self):
+        if request.blueprint == 'profiling':
+            return
+        if not self.authorized() and not (self.sample_rate > 0 and random.random() < self.sample_rate):
+            return
+        # Only this request's thread is sampled, so concurrent requests on
+        # other gthread threads are unaffected.
+        g.profiled_thread = threading.get_ident()
+        self.sampler.start(g.profiled_thread)
+
+    def _stop(self, response):
+        thread_id = g.pop('profiled_thread', None)
+        if thread_id is None:
+            return response
+        samples = self.sampler.stop(thread_id)
+        try:
+            self._save(samples)
+        except OSError as e:
+            print(f"An error occurred saving a request profile: {e}")
+        return response
+
+    def _discard(self, exc):
+        # after_request is skipped on unhandled errors; never leave a thread sampled.
+        thread_id = g.pop('profiled_thread', None)
+        if thread_id is not None:
+            self.sampler.stop(thread_id)
+
+    def _save(self, samples):
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.datetime.now().strftime('%Y%m%dT%H%M%S%f')
+        endpoint = (request.endpoint or 'unmatched').replace('.', '-')
+        base = os.path.join(self.directory, f'{stamp}_{request.method}_{endpoint}')
+        with open(base + '.collapsed', 'w') as f:
+            f.write(collapsed_stacks(samples))
+        self._rotate()
+
+    def _rotate(self):
+        with self._lock:
+            files = sorted(
+                (os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                 if PROFILE_NAME_RE.match(name)),
+                key=os.path.getmtime
+            )
+            for path in files[:max(len(files) - self.max_files, 0)]:
+                os.remove(path)
+
+    def list_profiles(self):
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for name in sorted(os.listdir(self.directory), reverse=True):
+            if PROFILE_NAME_RE.match(name):
+                path = os.path.join(self.directory, name)
+                profiles.append({'name': name, 'size': os.path.getsize(path), 'modified': os.path.getmtime(path) * 1000})
+        return profiles
+
+
+def require_admin():
+    profiler = current_app.extensions['profiler']
+    if not profiler.authorized():
+        abort(404)
+    return profiler
+
+
+@bp.route('/', methods=['GET'])
+def list_profiles():
+    return jsonify(require_admin().list_profiles())
+
+
+@bp.route('/<string:name>', methods=['GET'])
+def download_profile(name):
+    profiler = require_admin()
+    if not PROFILE_NAME_RE.match(name):
+        abort(404)
+    return send_from_directory(os.path.abspath(profiler.directory), name, as_attachment=True)
+
+
+request_profiler = RequestProfiler()
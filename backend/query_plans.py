@@ -0,0 +1,157 @@
+"""Query-plan regression check for the routes' database access paths.
+
+`flask check-query-plans` seeds a scratch SQLite database with a
+school-sized dataset, runs EXPLAIN QUERY PLAN on every query the routes
+issue, and exits non-zero if any of them falls back to a full table scan.
+The schema comes from the models, which declare the same indexes as the
+migrations.
+"""
+import datetime
+import os
+import random
+import tempfile
+
+import click
+import sqlalchemy as sa
+
+from .extensions import db
+from .models import (
+    AIDecisionLog, ChatConversation, InterventionFlag, LiveSession, Message,
+    ModuleStats, QuizAttempt, QuizQuestion, Student, StudyResource,
+    TeacherMessage, TranscriptItem, User, Visual,
+)
+
+# Queries that are meant to read a whole table, with the reason why.
+FULL_SCAN_ALLOWED = {
+    'students.get_students': 'lists every student for the teacher dashboard',
+}
+
+
+def route_queries():
+    """(name, statement) pairs mirroring what the routes execute.
+
+    Bind values are irrelevant to the plan, so they are passed as NULL.
+    """
+    return [
+        ('auth.login', sa.select(User).where(User.email == 'x')),
+        ('auth.identity', sa.select(User.id, User.name, User.email, User.role).where(User.id == 'x')),
+        ('students.get_students', sa.select(Student)),
+        ('students.get_student', sa.select(Student).where(Student.id == 'x')),
+        ('students.get_student.modules', sa.select(ModuleStats).where(ModuleStats.student_id == 'x')),
+        ('library.get_visuals', sa.select(Visual).where(Visual.student_id == 'x').order_by(Visual.created_at.desc())),
+        ('library.sync_visuals', sa.select(Visual).where(Visual.student_id == 'x', Visual.updated_at > 'x')
+            .order_by(Visual.updated_at)),
+        ('conversations.list', sa.select(ChatConversation).where(ChatConversation.student_id == 'x')
+            .order_by(ChatConversation.updated_at.desc())),
+        ('conversations.messages', sa.select(Message).where(Message.conversation_id == 'x').order_by(Message.timestamp)),
+        ('live_sessions.list', sa.select(LiveSession).where(LiveSession.student_id == 'x')
+            .order_by(LiveSession.start_time.desc())),
+        ('live_sessions.transcript', sa.select(TranscriptItem).where(TranscriptItem.live_session_id == 'x')
+            .order_by(TranscriptItem.timestamp)),
+        ('quiz_attempts.history', sa.select(QuizAttempt).where(QuizAttempt.student_id == 'x')
+            .order_by(QuizAttempt.date.desc())),
+        ('quiz_attempts.by_module', sa.select(QuizAttempt).where(QuizAttempt.module_id == 'x')),
+        ('quiz_questions.by_module', sa.select(QuizQuestion).where(QuizQuestion.module_id == 'x')),
+        ('teacher_messages.unread', sa.select(TeacherMessage).where(TeacherMessage.student_id == 'x',
+                                                                   TeacherMessage.read.is_(False))),
+        ('study_resources.list', sa.select(StudyResource).where(StudyResource.student_id == 'x')
+            .order_by(StudyResource.date_saved.desc())),
+        ('intervention_flags.list', sa.select(InterventionFlag).where(InterventionFlag.student_id == 'x')
+            .order_by(InterventionFlag.timestamp.desc())),
+        ('ai_decision_logs.list', sa.select(AIDecisionLog).where(AIDecisionLog.student_id == 'x')
+            .order_by(AIDecisionLog.timestamp.desc())),
+    ]
+
+
+def seed(engine, students, per_student):
+    rng = random.Random(42)
+    now = datetime.datetime(2026, 1, 1)
+
+    def ts():
+        return now - datetime.timedelta(minutes=rng.randrange(500000))
+
+    rows = {table: [] for table in (
+        'users', 'students', 'module_stats', 'visuals', 'chat_conversations', 'messages',
+        'live_sessions', 'transcript_items', 'quiz_attempts', 'quiz_questions',
+        'teacher_messages', 'study_resources', 'intervention_flags', 'ai_decision_logs',
+    )}
+    transcript_id = question_id = 0
+    for s in range(students):
+        sid = f's{s}'
+        rows['users'].append({'id': sid, 'email': f'{sid}@school.example', 'password': 'x', 'name': sid, 'role': 'STUDENT'})
+        rows['students'].append({'id': sid})
+        for n in range(per_student):
+            key = f'{sid}-{n}'
+            rows['module_stats'].append({'id': key, 'name': key, 'status': 'IN_PROGRESS', 'student_id': sid})
+            rows['visuals'].append({'id': key, 'type': 'mindmap', 'title': key, 'data': {},
+                                    'created_at': ts(), 'updated_at': ts(), 'student_id': sid})
+            rows['chat_conversations'].append({'id': key, 'title': key, 'created_at': ts(), 'updated_at': ts(),
+                                               'student_id': sid})
+            rows['live_sessions'].append({'id': key, 'start_time': ts(), 'end_time': ts(), 'student_id': sid})
+            rows['quiz_attempts'].append({'id': key, 'date': ts(), 'module_id': key, 'score': 3, 'max_score': 5,
+                                          'student_id': sid})
+            rows['teacher_messages'].append({'id': key, 'student_id': sid, 'teacher_name': 't', 'content': 'c',
+                                             'timestamp': ts(), 'read': rng.random() < 0.8})
+            rows['study_resources'].append({'id': key, 'title': key, 'uri': key, 'date_saved': ts(), 'student_id': sid})
+            rows['intervention_flags'].append({'id': key, 'student_id': sid, 'student_name': sid, 'reason': 'r',
+                                               'severity': 'LOW', 'timestamp': ts()})
+            rows['ai_decision_logs'].append({'id': key, 'student_id': sid, 'student_input': 'i', 'ai_output': 'o',
+                                             'reasoning': 'r', 'timestamp': ts()})
+            question_id += 1
+            rows['quiz_questions'].append({'id': question_id, 'question': 'q', 'options': '[]', 'correct_answer': 0,
+                                           'topic': 't', 'module_id': key})
+            for m in range(3):
+                rows['messages'].append({'id': f'{key}-{m}', 'role': 'user', 'content': 'c', 'timestamp': ts(),
+                                         'conversation_id': key})
+                transcript_id += 1
+                rows['transcript_items'].append({'id': transcript_id, 'role': 'user', 'text': 't', 'timestamp': ts(),
+                                                 'live_session_id': key})
+
+    tables = db.metadata.tables
+    with engine.begin() as conn:
+        for table, values in rows.items():
+            conn.execute(tables[table].insert(), values)
+        # Give the planner real statistics, as a long-lived database would have.
+        conn.exec_driver_sql('ANALYZE')
+
+
+def explain(conn, stmt):
+    compiled = stmt.compile(dialect=conn.dialect)
+    params = tuple(None for _ in compiled.positiontup or ())
+    return [row[-1] for row in conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {compiled}', params)]
+
+
+def is_full_scan(detail):
+    # SQLite reports index use as "SEARCH ... USING INDEX" or "SCAN ... USING
+    # COVERING INDEX"; a bare "SCAN <table>" reads every row.
+    return detail.startswith('SCAN ') and 'USING' not in detail
+
+
+@click.command('check-query-plans')
+@click.option('--students', default=2000, show_default=True, help='Number of seeded students.')
+@click.option('--per-student', default=10, show_default=True, help='Rows seeded per student in each child table.')
+def check_query_plans_command(students, per_student):
+    """Fail if any route query does a full table scan on a seeded database."""
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = sa.create_engine('sqlite:///' + os.path.join(tmp, 'plans.db'))
+        db.metadata.create_all(engine)
+        seed(engine, students, per_student)
+
+        failures = []
+        with engine.connect() as conn:
+            for name, stmt in route_queries():
+                plan = explain(conn, stmt)
+                scans = [detail for detail in plan if is_full_scan(detail)]
+                status = 'ok'
+                if scans and name in FULL_SCAN_ALLOWED:
+                    status = f'allowed ({FULL_SCAN_ALLOWED[name]})'
+                elif scans:
+                    status = 'FULL SCAN'
+                    failures.append(name)
+                click.echo(f'{name:<32} {status}')
+                for detail in plan:
+                    click.echo(f'    {detail}')
+        engine.dispose()
+
+    if failures:
+        raise click.ClickException(f'{len(failures)} queries fall back to a full table scan: {", ".join(failures)}')
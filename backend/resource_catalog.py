@@ -0,0 +1,188 @@
+import contextlib
+import datetime
+import hashlib
+import re
+import threading
+import time
+import uuid
+
+from sqlalchemy.exc import IntegrityError
+
+from .extensions import db
+from .models.catalog_resource import CatalogResource, ResourceSearch
+
+TOKEN = re.compile(r'\w+', re.UNICODE)
+# Words that do not change what a search finds: the prompt already asks for
+# notes, PDFs and question papers.
+FILLER = frozenset('''
+a an and for in of on the to about find download downloads notes pdf pdfs study material materials resource resources
+'''.split())
+MAX_KEY_CHARS = 255
+
+
+def normalize_query(query):
+    """The cache key for a resource search: its distinct words, lower-cased and sorted, minus filler words.
+
+    "VTU 18CS51 notes" and "notes for 18cs51 (vtu)" share a key. Keys too
+    long for the column are hashed.
+    """
+    words = set(TOKEN.findall(query.lower()))
+    key = ' '.join(sorted(words - FILLER or words))
+    if len(key) > MAX_KEY_CHARS:
+        key = hashlib.sha256(key.encode()).hexdigest()
+    return key
+
+
+def serialize_resource(resource):
+    return {
+        'id': resource.id,
+        'title': resource.title,
+        'uri': resource.uri,
+        'source': resource.source,
+        'type': resource.type,
+    }
+
+
+class ResourceCatalog:
+    """Serves /ai/search-resources from earlier grounded searches.
+
+    A search is looked up by its normalized query, first in this worker's
+    TTL cache, then in the resource_searches table, which every worker
+    shares and which is reused for RESOURCE_CATALOG_TTL seconds. Only a miss
+    runs a grounded generation. Its grounding URIs are upserted into
+    catalog_resources, one row per URI however many searches cite it.
+    Concurrent misses for the same query in a worker wait for the first.
+    """
+
+    def __init__(self, app=None):
+        self._entries = {}
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.cache_hits = 0
+        self.catalog_hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = app.config['RESOURCE_SEARCH_CACHE_TTL']
+        self.max_entries = app.config['RESOURCE_SEARCH_CACHE_MAX_ENTRIES']
+        self.catalog_ttl = app.config['RESOURCE_CATALOG_TTL']
+
+    def search(self, query, fetch):
+        """{summary, resources} for query; calls fetch(query) -> (summary, resources) only on a miss."""
+        key = normalize_query(query)
+        result = self._cached(key)
+        if result is not None:
+            return result
+        with self._flight(key):
+            # Another request for this key may have finished while we waited.
+            result = self._cached(key)
+            if result is not None:
+                return result
+            result = self._from_catalog(key)
+            if result is None:
+                summary, resources = fetch(query)
+                result = self._record(key, query, summary, resources)
+                with self._lock:
+                    self.misses += 1
+            self._remember(key, result)
+        return result
+
+    @contextlib.contextmanager
+    def _flight(self, key):
+        with self._lock:
+            lock, waiters = self._flights.get(key, (None, 0))
+            lock = lock or threading.Lock()
+            self._flights[key] = (lock, waiters + 1)
+        try:
+            with lock:
+                yield
+        finally:
+            with self._lock:
+                lock, waiters = self._flights[key]
+                if waiters == 1:
+                    del self._flights[key]
+                else:
+                    self._flights[key] = (lock, waiters - 1)
+
+    def _cached(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.cache_hits += 1
+                return entry[1]
+        return None
+
+    def _remember(self, key, result):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._evict(now)
+            self._entries[key] = (now + self.ttl, result)
+
+    def _evict(self, now):
+        expired = [key for key, (expires, _) in self._entries.items() if expires <= now]
+        for key in expired:
+            del self._entries[key]
+        if len(self._entries) >= self.max_entries:
+            del self._entries[next(iter(self._entries))]
+
+    def _from_catalog(self, key):
+        fresh_after = datetime.datetime.now() - datetime.timedelta(seconds=self.catalog_ttl)
+        search = ResourceSearch.query.filter(ResourceSearch.query_key == key,
+                                             ResourceSearch.created_at > fresh_after).first()
+        if search is None:
+            return None
+        ids = search.resource_ids or []
+        resources = {r.id: r for r in CatalogResource.query.filter(CatalogResource.id.in_(ids)).all()} if ids else {}
+        result = {'summary': search.summary,
+                  'resources': [serialize_resource(resources[i]) for i in ids if i in resources]}
+        ResourceSearch.query.filter_by(id=search.id).update({ResourceSearch.hits: ResourceSearch.hits + 1})
+        db.session.commit()
+        with self._lock:
+            self.catalog_hits += 1
+        return result
+
+    def _record(self, key, query, summary, resources):
+        """Persists a search and upserts its resources; returns the result to serve."""
+        resources = list({r['uri']: r for r in resources}.values())
+        for attempt in range(2):
+            now = datetime.datetime.now()
+            uris = [r['uri'] for r in resources]
+            existing = {row.uri: row for row in CatalogResource.query.filter(CatalogResource.uri.in_(uris)).all()} \
+                if uris else {}
+            rows = []
+            for resource in resources:
+                row = existing.get(resource['uri'])
+                if row is None:
+                    row = CatalogResource(id=str(uuid.uuid4()), uri=resource['uri'], first_seen_at=now, times_seen=0)
+                    db.session.add(row)
+                row.title = resource['title'][:255]
+                row.source = (resource.get('source') or '')[:255] or None
+                row.type = resource.get('type')
+                row.last_seen_at = now
+                row.times_seen += 1
+                rows.append(row)
+
+            search = ResourceSearch.query.filter_by(query_key=key).first()
+            if search is None:
+                search = ResourceSearch(id=str(uuid.uuid4()), query_key=key, hits=0)
+                db.session.add(search)
+            search.query_text = query
+            search.summary = summary
+            search.resource_ids = [row.id for row in rows]
+            search.created_at = now
+            try:
+                db.session.commit()
+                return {'summary': summary, 'resources': [serialize_resource(row) for row in rows]}
+            except IntegrityError:
+                # Another worker added one of these URIs or this query first;
+                # the retry sees its rows.
+                db.session.rollback()
+                if attempt:
+                    raise
+
+
+resource_catalog = ResourceCatalog()
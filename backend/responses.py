@@ -0,0 +1,101 @@
+import gzip
+import hashlib
+
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # fall back to the stdlib json provider
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/')
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson, with Flask's defaults as the fallback.
+
+    Types orjson doesn't handle natively (and datetimes, so they keep Flask's
+    HTTP-date format) go through the same `default` hook as the stdlib provider.
+    """
+
+    def dumps_bytes(self, obj, indent=False):
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option)
+
+    def dumps(self, obj, **kwargs):
+        return self.dumps_bytes(obj, indent=bool(kwargs.get('indent'))).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        return self._app.response_class(self.dumps_bytes(obj, indent=indent) + b'\n', mimetype=self.mimetype)
+
+
+class ResponsePipeline:
+    """Adds ETags with 304 handling to GET responses and compresses bodies.
+
+    Runs as an after_request hook for every API response. Responses that
+    already carry an ETag or Content-Encoding (e.g. the static assets) and
+    streamed responses are left untouched.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if orjson is not None:
+            app.json = OrjsonProvider(app)
+        self.min_size = app.config['COMPRESS_MIN_SIZE']
+        self.gzip_level = app.config['COMPRESS_GZIP_LEVEL']
+        self.brotli_quality = app.config['COMPRESS_BROTLI_QUALITY']
+        app.after_request(self.process_response)
+
+    def choose_encoding(self):
+        if brotli is not None and request.accept_encodings.quality('br'):
+            return 'br'
+        if request.accept_encodings.quality('gzip'):
+            return 'gzip'
+        return None
+
+    def compress(self, body, encoding):
+        if encoding == 'br':
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level)
+
+    def process_response(self, response):
+        if response.direct_passthrough or response.is_streamed or response.status_code != 200 \
+                or 'ETag' in response.headers or 'Content-Encoding' in response.headers:
+            return response
+
+        body = response.get_data()
+        encoding = None
+        if len(body) >= self.min_size and response.mimetype.startswith(COMPRESSIBLE_TYPES):
+            encoding = self.choose_encoding()
+            response.vary.add('Accept-Encoding')
+
+        if request.method in ('GET', 'HEAD'):
+            etag = hashlib.sha1(body).hexdigest()[:20]
+            # A strong ETag has to differ between content codings.
+            response.set_etag(f'{etag}-{encoding}' if encoding else etag)
+            response.make_conditional(request)
+            if response.status_code == 304:
+                return response
+
+        if encoding:
+            response.set_data(self.compress(body, encoding))
+            response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,230 @@
+import collections
+import contextlib
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+
+from .ai_log import current_student_id
+from .mapreduce import split_text
+
+TOKEN = re.compile(r'\w+', re.UNICODE)
+STOPWORDS = frozenset('''
+a an and are as at be but by for from has have in is it its of on or that the this to was were which with
+'''.split())
+
+# BM25 parameters; the usual defaults.
+K1 = 1.2
+B = 0.75
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS documents (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    chars INTEGER NOT NULL,
+    chunk_count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    id INTEGER PRIMARY KEY,
+    document_id TEXT NOT NULL REFERENCES documents(id),
+    ordinal INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    length INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_chunks_document_id ON chunks (document_id, ordinal);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    chunk_id INTEGER NOT NULL,
+    tf INTEGER NOT NULL,
+    PRIMARY KEY (term, chunk_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_postings_chunk_id ON postings (chunk_id);
+'''
+
+
+class DocumentNotFound(Exception):
+    pass
+
+
+def tokenize(text):
+    return [token for token in TOKEN.findall(text.lower()) if len(token) > 1 and token not in STOPWORDS]
+
+
+class StudyIndex:
+    """One student's documents and their BM25 inverted index, in a SQLite file.
+
+    Postings are (term, chunk, term frequency) rows clustered by term, so a
+    query reads only the postings of its own terms. Ingesting a document
+    adds its postings in one transaction; nothing is rebuilt. Reads go
+    through SQLite's memory-mapped I/O.
+    """
+
+    def __init__(self, path, mmap_bytes):
+        self.path = path
+        self.mmap_bytes = mmap_bytes
+        with self._connect() as conn:
+            # WAL lets other workers read while one ingests; it is stored in the file.
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """A connection that commits (or rolls back) and closes on exit."""
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f'PRAGMA mmap_size={int(self.mmap_bytes)}')
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def add_document(self, title, text, chunk_chars):
+        document_id = str(uuid.uuid4())
+        chunks = split_text(text, chunk_chars)
+        with self._connect() as conn:
+            conn.execute('INSERT INTO documents (id, title, created_at, chars, chunk_count) VALUES (?, ?, ?, ?, ?)',
+                         (document_id, title, time.time(), len(text), len(chunks)))
+            for ordinal, chunk in enumerate(chunks):
+                terms = tokenize(chunk)
+                chunk_id = conn.execute(
+                    'INSERT INTO chunks (document_id, ordinal, text, length) VALUES (?, ?, ?, ?)',
+                    (document_id, ordinal, chunk, len(terms))
+                ).lastrowid
+                conn.executemany('INSERT INTO postings (term, chunk_id, tf) VALUES (?, ?, ?)',
+                                 [(term, chunk_id, tf) for term, tf in collections.Counter(terms).items()])
+        return self.document(document_id)
+
+    def delete_document(self, document_id):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM postings WHERE chunk_id IN (SELECT id FROM chunks WHERE document_id = ?)',
+                         (document_id,))
+            conn.execute('DELETE FROM chunks WHERE document_id = ?', (document_id,))
+            return conn.execute('DELETE FROM documents WHERE id = ?', (document_id,)).rowcount > 0
+
+    def document(self, document_id):
+        with self._connect() as conn:
+            row = conn.execute('SELECT * FROM documents WHERE id = ?', (document_id,)).fetchone()
+        return dict(row) if row else None
+
+    def documents(self):
+        with self._connect() as conn:
+            return [dict(row) for row in conn.execute('SELECT * FROM documents ORDER BY created_at DESC')]
+
+    def search(self, query, k, document_id=None):
+        """The k chunks that best match query by BM25, as dicts with a score, best first.
+
+        Term statistics cover all of the student's documents; `document_id`
+        limits which chunks can be returned.
+        """
+        terms = sorted(set(tokenize(query)))
+        if not terms:
+            return []
+        marks = ','.join('?' * len(terms))
+        with self._connect() as conn:
+            total, average_length = conn.execute('SELECT COUNT(*), AVG(length) FROM chunks').fetchone()
+            if not total:
+                return []
+            document_frequency = dict(conn.execute(
+                f'SELECT term, COUNT(*) FROM postings WHERE term IN ({marks}) GROUP BY term', terms))
+            sql = (f'SELECT p.term, p.chunk_id, p.tf, c.length FROM postings p JOIN chunks c ON c.id = p.chunk_id '
+                   f'WHERE p.term IN ({marks})')
+            params = list(terms)
+            if document_id is not None:
+                sql += ' AND c.document_id = ?'
+                params.append(document_id)
+
+            scores = collections.defaultdict(float)
+            for term, chunk_id, tf, length in conn.execute(sql, params):
+                df = document_frequency[term]
+                idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+                norm = K1 * (1 - B + B * length / (average_length or 1))
+                scores[chunk_id] += idf * tf * (K1 + 1) / (tf + norm)
+
+            best = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+            if not best:
+                return []
+            rows = {row['id']: row for row in conn.execute(
+                f"SELECT id, document_id, ordinal, text FROM chunks WHERE id IN ({','.join('?' * len(best))})",
+                [chunk_id for chunk_id, _ in best])}
+        return [dict(rows[chunk_id], score=score) for chunk_id, score in best]
+
+    def leading_chunks(self, document_id, k):
+        with self._connect() as conn:
+            return [dict(row) for row in conn.execute(
+                'SELECT id, document_id, ordinal, text FROM chunks WHERE document_id = ? ORDER BY ordinal LIMIT ?',
+                (document_id, k))]
+
+
+class StudyStore:
+    """Per-student document store for grounding generations in the student's own notes.
+
+    Students ingest notes once (POST /documents/); generation routes that
+    are given a documentId then send the model only the RETRIEVAL_TOP_K
+    chunks most relevant to the request instead of the whole text. Each
+    student's index is a SQLite file under RETRIEVAL_DIR, so every worker
+    on the host shares it and no external search service is needed.
+    """
+
+    def __init__(self, app=None):
+        self._indexes = {}
+        self._lock = threading.Lock()
+        self.ingested = 0
+        self.queries = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.directory = app.config['RETRIEVAL_DIR']
+        self.chunk_chars = app.config['RETRIEVAL_CHUNK_CHARS']
+        self.top_k = app.config['RETRIEVAL_TOP_K']
+        self.mmap_bytes = app.config['RETRIEVAL_MMAP_BYTES']
+        self.max_document_chars = app.config['RETRIEVAL_MAX_DOCUMENT_CHARS']
+
+    def index(self, student_id):
+        with self._lock:
+            index = self._indexes.get(student_id)
+            if index is None:
+                os.makedirs(self.directory, exist_ok=True)
+                name = re.sub(r'[^A-Za-z0-9_-]', '_', student_id)
+                index = self._indexes[student_id] = StudyIndex(
+                    os.path.join(self.directory, f'{name}.sqlite3'), self.mmap_bytes)
+            return index
+
+    def ingest(self, student_id, title, text):
+        document = self.index(student_id).add_document(title, text, self.chunk_chars)
+        with self._lock:
+            self.ingested += 1
+        return document
+
+    def ground(self, document_id, focus):
+        """Prompt content for a generation about `focus`, drawn from one of the caller's documents.
+
+        The top-k chunks for `focus` (or the document's opening chunks when
+        there is no focus or nothing matches) in document order, followed
+        by the focus itself. Raises DocumentNotFound if the caller has no
+        such document.
+        """
+        student_id = current_student_id()
+        if not student_id:
+            raise DocumentNotFound(document_id)
+        index = self.index(student_id)
+        document = index.document(document_id)
+        if document is None:
+            raise DocumentNotFound(document_id)
+
+        chunks = index.search(focus or '', self.top_k, document_id) or index.leading_chunks(document_id, self.top_k)
+        with self._lock:
+            self.queries += 1
+        notes = '\n\n'.join(chunk['text'] for chunk in sorted(chunks, key=lambda chunk: chunk['ordinal']))
+        header = f"Excerpts from the student's notes \"{document['title']}\":"
+        if focus:
+            return f"{header}\n\n{notes}\n\nFocus on: {focus}"
+        return f"{header}\n\n{notes}"
+
+
+study_store = StudyStore()
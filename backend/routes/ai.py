@@ -1,16 +1,23 @@
 from flask import Blueprint, request, jsonify
 from ..extensions import db
-import google.generativeai as genai
-from google.cloud import texttospeech
-import os
-import uuid
+import base64
 from urllib.parse import urlparse
 import json
+import time
 from backend.routes.mindmap import MINDMAP_PROMPT_TEMPLATE
+from ..ai_log import ai_log, current_student_id
+from ..metrics import metrics
+from .. import gemini
+from ..upstream import UpstreamUnavailable, upstream
+from ..admission import admission, AdmissionRejected, INTERACTIVE, BULK
+from ..jobs import job_queue
+from ..prefetch import prefetcher
+from ..retrieval import study_store, DocumentNotFound
+from ..resource_catalog import resource_catalog
+from ..answer_reuse import answer_reuse
 
 bp = Blueprint('ai', __name__)
 
-genai.configure(api_key=os.environ.get("GEMINI_API_KEY"))
 
 def get_system_instruction(language):
     return f"""
@@ -44,6 +51,7 @@ The JSON object must have the following fields:
 - "pedagogical_reasoning": "Direct explanation provided."
 - "detected_sentiment": "NEUTRAL"
 - "suggested_action": "NONE"
+- "topic": The subject of the student's question as a short noun phrase of at most six words, in the student's language (e.g. "Photosynthesis", "Newton's laws of motion").
 """
 
 def transform_history(history):
@@ -66,23 +74,32 @@ def socratic_chat():
     if not current_message:
         return jsonify({"error": "Missing current message"}), 400
 
+    first_turn = not history and not attachment
+    if first_turn:
+        # A near-duplicate of an answered opening question skips admission and the model.
+        match = answer_reuse.lookup(current_message, language)
+        if match is not None:
+            ai_log.record_reused('socratic-chat', current_message, match.text,
+                                 reasoning=match.answer.get('pedagogical_reasoning', ''))
+            prefetcher.after_chat(match.answer.get('topic'), current_student_id())
+            return jsonify(match.answer)
+
+    return generate_socratic_reply(history, current_message, language, attachment, first_turn)
+
+@admission.admit(INTERACTIVE)
+def generate_socratic_reply(history, current_message, language, attachment, first_turn):
     try:
-        model = genai.GenerativeModel(
-            model_name='gemini-2.5-flash',
-            system_instruction=get_system_instruction(language)
-        )
-        
-        transformed_history = transform_history(history)
-        chat = model.start_chat(history=transformed_history)
-        
         parts = [current_message]
         if attachment:
             image_blob = {"mime_type": attachment['mimeType'], "data": attachment['data']}
             parts.append(image_blob)
-            
-        response = chat.send_message(parts)
 
-        print(f"Gemini API response: {response.text}")
+        # Same request a ChatSession.send_message would make: prior turns + this one.
+        contents = transform_history(history) + [{"role": "user", "parts": parts}]
+        response, latency = gemini.generate(
+            'socratic-chat', contents,
+            system_instruction=get_system_instruction(language)
+        )
 
         # Strip the markdown wrapper if it exists
         text_to_parse = response.text
@@ -101,9 +118,20 @@ def socratic_chat():
                 "detected_sentiment": "NEUTRAL",
                 "suggested_action": "NONE"
             }
+        else:
+            # Only well-formed answers are offered to other students.
+            if first_turn and isinstance(response_json, dict) and response_json.get('tutor_response'):
+                answer_reuse.remember(current_message, language, response_json, response.text)
+
+        ai_log.record('socratic-chat', current_message, response, latency,
+                      reasoning=response_json.get('pedagogical_reasoning', ''))
+        if not attachment:
+            prefetcher.after_chat(response_json.get('topic'), current_student_id())
         
         return jsonify(response_json)
 
+    except UpstreamUnavailable:
+        raise
     except Exception as e:
         print(f"An error occurred: {e}")
         return jsonify({"error": "An unexpected error occurred with the AI service."} ), 500
@@ -113,6 +141,7 @@ def generate_chat_title():
     return jsonify({"title": "New Conversation"})
 
 @bp.route('/text-to-speech', methods=['POST'])
+@admission.admit(INTERACTIVE)
 def text_to_speech():
     data = request.get_json()
     text = data.get('text')
@@ -121,6 +150,10 @@ def text_to_speech():
         return jsonify({"error": "Missing text"}), 400
 
     try:
+        # Imported on first use; the TTS client pulls in grpc.
+        from google.cloud import texttospeech
+
+        started = time.perf_counter()
         client = texttospeech.TextToSpeechClient()
 
         synthesis_input = texttospeech.SynthesisInput(text=text)
@@ -134,59 +167,131 @@ def text_to_speech():
             audio_encoding=texttospeech.AudioEncoding.MP3
         )
 
-        response = client.synthesize_speech(
-            input=synthesis_input, voice=voice, audio_config=audio_config
+        response = upstream.call(
+            'google-tts', 'text-to-speech',
+            lambda timeout: client.synthesize_speech(
+                input=synthesis_input, voice=voice, audio_config=audio_config, timeout=timeout
+            )
         )
+        metrics.observe_upstream('google-tts', 'text-to-speech', time.perf_counter() - started)
 
-        return jsonify({"audio_content": response.audio_content})
+        # The client decodes this with atob(); bytes are not JSON serializable.
+        return jsonify({"audio_content": base64.b64encode(response.audio_content).decode('ascii')})
 
+    except UpstreamUnavailable:
+        raise
     except Exception as e:
         print(f"An error occurred during text-to-speech conversion: {e}")
         return jsonify({"error": "An unexpected error occurred with the AI service."} ), 500
 
+@admission.admit(BULK)
+def search_resources_online(query):
+    """Runs a google_search-grounded generation; returns (summary, resources) from its grounding chunks."""
+    response, latency = gemini.generate(
+        'search-resources',
+        f"Find study materials, lecture notes, PDF downloads, and previous year question papers for the following topic: \"{query}\". Prioritize results from universities (like VTU), educational portals, and PDF repositories. Summarize the available resources and key concepts covered.",
+        tools=[{"google_search": {}}]
+    )
+    ai_log.record('search-resources', query, response, latency)
+
+    summary = response.text or "No summary available."
+
+    # Extract Grounding Chunks (URLs)
+    chunks = response.candidates[0].grounding_metadata.grounding_chunks or []
+    resources = []
+
+    for chunk in chunks:
+        if chunk.web and chunk.web.uri and chunk.web.title:
+            uri = chunk.web.uri
+            resource_type = 'PDF' if uri.lower().endswith('.pdf') else 'WEB'
+
+            resources.append({
+                "title": chunk.web.title,
+                "uri": uri,
+                "source": urlparse(uri).hostname,
+                "type": resource_type
+            })
+
+    return summary, resources
+
 @bp.route('/search-resources', methods=['POST'])
 def search_study_resources():
+    """Study resources for a query, from the shared catalog when it has been searched before.
+
+    Only a miss takes an admission slot and runs a grounded search; see
+    backend.resource_catalog.
+    """
     data = request.get_json()
-    query = data.get('query')
+    query = (data.get('query') or '').strip()
 
     if not query:
         return jsonify({"error": "Missing query"}), 400
 
     try:
-        model = genai.GenerativeModel('gemini-2.5-flash', tools=[{"google_search": {}}])
-        
-        response = model.generate_content(f"Find study materials, lecture notes, PDF downloads, and previous year question papers for the following topic: \"{query}\". Prioritize results from universities (like VTU), educational portals, and PDF repositories. Summarize the available resources and key concepts covered.")
-
-        print(f"Gemini API response: {response.text}")
-
-        summary = response.text or "No summary available."
-        
-        # Extract Grounding Chunks (URLs)
-        chunks = response.candidates[0].grounding_metadata.grounding_chunks or []
-        resources = []
-
-        for chunk in chunks:
-            if chunk.web and chunk.web.uri and chunk.web.title:
-                uri = chunk.web.uri
-                resource_type = 'PDF' if uri.lower().endswith('.pdf') else 'WEB'
-                
-                resources.append({
-                    "id": str(uuid.uuid4()),
-                    "title": chunk.web.title,
-                    "uri": uri,
-                    "source": urlparse(uri).hostname,
-                    "type": resource_type
-                })
-
-        # Deduplicate resources based on URI
-        unique_resources = {res['uri']: res for res in resources}.values()
-
-        return jsonify({"summary": summary, "resources": list(unique_resources)})
+        return jsonify(resource_catalog.search(query, search_resources_online))
 
+    except (UpstreamUnavailable, AdmissionRejected):
+        raise
     except Exception as e:
+        db.session.rollback()
         print(f"An error occurred during resource search: {e}")
         return jsonify({"error": "An unexpected error occurred with the AI service."} ), 500
 
+
+def build_quiz(topic, difficulty='Medium', moduleId=None):
+    """Generates quiz questions; raises json.JSONDecodeError if the model output is not JSON."""
+    prompt = f"""
+You are an expert quiz creator. Generate 5 multiple-choice questions for a quiz on the topic of "{topic}" with a difficulty level of "{difficulty}".
+
+    You MUST respond in a single valid JSON object. The root of the object should be a list of question objects.
+    Each question object must have the following schema:
+    {{
+        "id": "A unique integer for the question (e.g., 1, 2, 3...)",
+        "question": "The question text.",
+        "options": ["Option A", "Option B", "Option C", "Option D"],
+        "correctAnswer": "The index of the correct answer in the options array (0-3).",
+        "topic": "{topic}",
+        "moduleId": "{moduleId}"
+    }}
+
+    Example of a valid response:
+    ```json
+    [
+        {{
+            "id": 1,
+            "question": "What is the capital of France?",
+            "options": ["Berlin", "Madrid", "Paris", "Rome"],
+            "correctAnswer": 2,
+            "topic": "Geography",
+            "moduleId": "geo101"
+        }}
+    ]
+    ```
+    """
+
+    response, latency = gemini.generate('generate-quiz', prompt)
+    ai_log.record('generate-quiz', topic, response, latency)
+
+    text_to_parse = response.text
+    if text_to_parse.startswith("```json"):
+        text_to_parse = text_to_parse[7:]
+    if text_to_parse.endswith("```"):
+        text_to_parse = text_to_parse[:-3]
+
+    response_json = json.loads(text_to_parse)
+
+    return response_json
+
+
+@job_queue.handler('quiz', requires_any=('topic',))
+def quiz_job(payload):
+    return build_quiz(payload['topic'], payload.get('difficulty', 'Medium'), payload.get('moduleId'))
+
+
+# Prefetched quizzes use the default difficulty and no module.
+prefetcher.register('quiz', build_quiz)
+
+
 @bp.route('/generate-quiz', methods=['POST'])
 def generate_quiz_questions():
     data = request.get_json()
@@ -197,55 +302,31 @@ def generate_quiz_questions():
     if not topic:
         return jsonify({"error": "Missing topic"}), 400
 
-    try:
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        
-        prompt = f"""
-You are an expert quiz creator. Generate 5 multiple-choice questions for a quiz on the topic of "{topic}" with a difficulty level of "{difficulty}".
+    if difficulty == 'Medium':
+        # A prefetched quiz is served without taking an admission slot.
+        prefetched = prefetcher.take('quiz', topic)
+        if prefetched is not None:
+            for question in prefetched:
+                question['moduleId'] = moduleId
+            return jsonify(prefetched)
 
-        You MUST respond in a single valid JSON object. The root of the object should be a list of question objects.
-        Each question object must have the following schema:
-        {{
-            "id": "A unique integer for the question (e.g., 1, 2, 3...)",
-            "question": "The question text.",
-            "options": ["Option A", "Option B", "Option C", "Option D"],
-            "correctAnswer": "The index of the correct answer in the options array (0-3).",
-            "topic": "{topic}",
-            "moduleId": "{moduleId}"
-        }}
+    return quiz_response(topic, difficulty, moduleId)
 
-        Example of a valid response:
-        ```json
-        [
-            {{
-                "id": 1,
-                "question": "What is the capital of France?",
-                "options": ["Berlin", "Madrid", "Paris", "Rome"],
-                "correctAnswer": 2,
-                "topic": "Geography",
-                "moduleId": "geo101"
-            }}
-        ]
-        ```
-        """
-        
-        response = model.generate_content(prompt)
-        
-        text_to_parse = response.text
-        if text_to_parse.startswith("```json"):
-            text_to_parse = text_to_parse[7:]
-        if text_to_parse.endswith("```"):
-            text_to_parse = text_to_parse[:-3]
-            
-        response_json = json.loads(text_to_parse)
+@admission.admit(BULK)
+def quiz_response(topic, difficulty, moduleId):
+    try:
+        response_json = build_quiz(topic, difficulty, moduleId)
 
         return jsonify(response_json)
 
+    except UpstreamUnavailable:
+        raise
     except Exception as e:
         print(f"An error occurred during quiz generation: {e}")
         return jsonify({"error": "An unexpected error occurred with the AI service."} ), 500
 
 @bp.route('/transcribe-audio', methods=['POST'])
+@admission.admit(INTERACTIVE)
 def transcribe_audio():
     data = request.get_json()
     audio_data = data.get('audioBase64')
@@ -256,16 +337,19 @@ def transcribe_audio():
 
     try:
         audio_blob = {"mime_type": mime_type, "data": audio_data}
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        response = model.generate_content(["Transcribe this audio.", audio_blob])
+        response, latency = gemini.generate('transcribe-audio', ["Transcribe this audio.", audio_blob])
+        ai_log.record('transcribe-audio', f"[audio {mime_type}]", response, latency)
         
         return jsonify({"text": response.text})
 
+    except UpstreamUnavailable:
+        raise
     except Exception as e:
         print(f"An error occurred during transcription: {e}")
         return jsonify({"error": "An unexpected error occurred with the AI service."} ), 500
 
 @bp.route('/analyze-code', methods=['POST'])
+@admission.admit(BULK)
 def analyze_code():
     data = request.get_json()
     image_data = data.get('imageBase64')
@@ -290,8 +374,8 @@ def analyze_code():
         }}
         """
         
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        response = model.generate_content([prompt, image_blob])
+        response, latency = gemini.generate('analyze-code', [prompt, image_blob])
+        ai_log.record('analyze-code', f"[code image, {language}]", response, latency)
         
         # Strip markdown and parse
         text_to_parse = response.text
@@ -303,11 +387,59 @@ def analyze_code():
         response_json = json.loads(text_to_parse)
         return jsonify(response_json)
 
+    except UpstreamUnavailable:
+        raise
     except Exception as e:
         print(f"An error occurred during code analysis: {e}")
         return jsonify({"error": "An unexpected error occurred with the AI service."} ), 500
 
+
+def build_exam_trends(topic):
+    """Predicts likely exam questions for a topic; raises json.JSONDecodeError if the model output is not JSON."""
+    prompt = f"""
+    Based on the topic "{topic}", predict 3-5 high-probability exam questions.
+    For each question, provide the probability ('HIGH', 'MEDIUM', 'LOW'), a list of years it has appeared in exams, the marks it is likely to carry, and a tip for answering it.
+
+    You MUST respond in a single valid JSON object with the following schema:
+    {{
+        "questions": [
+            {{
+                "id": "a unique id",
+                "question": "The predicted question.",
+                "probability": "HIGH" | "MEDIUM" | "LOW",
+                "yearsAppeared": ["year1", "year2"],
+                "marks": "5",
+                "tips": "A tip for answering the question."
+            }}
+        ]
+    }}
+    """
+
+    response, latency = gemini.generate('analyze-exam-trends', prompt)
+    ai_log.record('analyze-exam-trends', topic, response, latency)
+
+    text_to_parse = response.text
+    if text_to_parse.startswith("```json"):
+        text_to_parse = text_to_parse[7:]
+    if text_to_parse.endswith("```"):
+        text_to_parse = text_to_parse[:-3]
+
+    response_json = json.loads(text_to_parse)
+
+    # Add unique IDs to the questions
+    for i, q in enumerate(response_json['questions']):
+        q['id'] = f'pred_{{i+1}}'
+
+    return response_json['questions']
+
+
+@job_queue.handler('exam-trends', requires_any=('topic',))
+def exam_trends_job(payload):
+    return build_exam_trends(payload['topic'])
+
+
 @bp.route('/analyze-exam-trends', methods=['POST'])
+@admission.admit(BULK)
 def analyze_exam_trends():
     data = request.get_json()
     topic = data.get('topic')
@@ -316,48 +448,18 @@ def analyze_exam_trends():
         return jsonify({"error": "Missing topic"}), 400
 
     try:
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        
-        prompt = f"""
-        Based on the topic "{topic}", predict 3-5 high-probability exam questions.
-        For each question, provide the probability ('HIGH', 'MEDIUM', 'LOW'), a list of years it has appeared in exams, the marks it is likely to carry, and a tip for answering it.
+        questions = build_exam_trends(topic)
 
-        You MUST respond in a single valid JSON object with the following schema:
-        {{
-            "questions": [
-                {{
-                    "id": "a unique id",
-                    "question": "The predicted question.",
-                    "probability": "HIGH" | "MEDIUM" | "LOW",
-                    "yearsAppeared": ["year1", "year2"],
-                    "marks": "5",
-                    "tips": "A tip for answering the question."
-                }}
-            ]
-        }}
-        """
-        
-        response = model.generate_content(prompt)
-        
-        text_to_parse = response.text
-        if text_to_parse.startswith("```json"):
-            text_to_parse = text_to_parse[7:]
-        if text_to_parse.endswith("```"):
-            text_to_parse = text_to_parse[:-3]
-            
-        response_json = json.loads(text_to_parse)
-        
-        # Add unique IDs to the questions
-        for i, q in enumerate(response_json['questions']):
-            q['id'] = f'pred_{{i+1}}'
-
-        return jsonify(response_json['questions'])
+        return jsonify(questions)
 
+    except UpstreamUnavailable:
+        raise
     except Exception as e:
         print(f"An error occurred during exam trend analysis: {e}")
         return jsonify({"error": "An unexpected error occurred with the AI service."} ), 500
 
 @bp.route('/expand-topic', methods=['POST'])
+@admission.admit(BULK)
 def expand_topic():
     data = request.get_json()
     topic = data.get('topic')
@@ -366,13 +468,10 @@ def expand_topic():
         return jsonify({"error": "Missing topic"}), 400
 
     try:
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        
         prompt = MINDMAP_PROMPT_TEMPLATE.replace("<<INSERT USER CONTENT HERE>>", f"A detailed breakdown of the topic: {topic}")
         
-        response = model.generate_content(prompt)
-
-        print(f"Gemini API response: {response.text}")
+        response, latency = gemini.generate('expand-topic', prompt, user_input=topic)
+        ai_log.record('expand-topic', topic, response, latency)
 
         # Strip the markdown wrapper if it exists
         text_to_parse = response.text
@@ -389,6 +488,8 @@ def expand_topic():
         
         return jsonify(mindmap_json)
 
+    except UpstreamUnavailable:
+        raise
     except Exception as e:
         print(f"An error occurred during mindmap expansion: {e}")
         return jsonify({"error": "Failed to generate expanded mindmap"}), 500
@@ -414,25 +515,31 @@ You MUST respond with a single valid JSON object. The JSON object must have the
 - "pedagogical_reasoning": "Visual explanation generated."
 - "detected_sentiment": "NEUTRAL"
 - "suggested_action": "NONE"
+- "topic": The subject of the student's question as a short noun phrase of at most six words, in the student's language (e.g. "Photosynthesis", "Newton's laws of motion").
 """
 
 @bp.route('/visualize-text', methods=['POST'])
+@admission.admit(BULK)
 def visualize_text():
     data = request.get_json()
     text = data.get('text')
+    document_id = data.get('documentId')
 
-    if not text:
+    if not text and not document_id:
         return jsonify({"error": "Missing text"}), 400
 
+    if document_id:
+        try:
+            text = study_store.ground(document_id, text)
+        except DocumentNotFound:
+            return jsonify({"error": "Document not found"}), 404
+
     try:
-        model = genai.GenerativeModel(
-            model_name='gemini-2.5-flash',
+        response, latency = gemini.generate(
+            'visualize-text', text,
             system_instruction=get_visualize_instruction()
         )
-        
-        response = model.generate_content(text)
-
-        print(f"Gemini API response: {response.text}")
+        ai_log.record('visualize-text', text, response, latency)
 
         # Strip the markdown wrapper if it exists
         text_to_parse = response.text
@@ -449,6 +556,8 @@ def visualize_text():
         
         return jsonify(response_json)
 
+    except UpstreamUnavailable:
+        raise
     except Exception as e:
         print(f"An error occurred during text visualization: {e}")
         return jsonify({"error": "Failed to generate visual explanation"}), 500
\ No newline at end of file
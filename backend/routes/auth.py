@@ -1,12 +1,17 @@
 from flask import Blueprint, request, jsonify
-from ..extensions import db, bcrypt
+from ..extensions import db, password_hasher
+from ..passwords import PasswordHasherBusy
 from ..models.user import User
 from ..models.student import Student
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import create_access_token, jwt_required, get_current_user
 import uuid
 
 bp = Blueprint('auth', __name__)
 
+@bp.errorhandler(PasswordHasherBusy)
+def handle_hasher_busy(e):
+    return jsonify({'message': 'Too many login attempts in progress, please retry'}), 503, {'Retry-After': '1'}
+
 @bp.route('/register', methods=['POST'])
 def register():
     data = request.get_json()
@@ -20,7 +25,7 @@ def register():
     if User.query.filter_by(email=email).first():
         return jsonify({'message': 'Email already registered'}), 400
 
-    hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
+    hashed_password = password_hasher.generate_password_hash(password)
     
     student_id = f's{uuid.uuid4()}'
     new_student = Student(
@@ -47,26 +52,20 @@ def login():
 
     user = User.query.filter_by(email=email).first()
 
-    if not user or not bcrypt.check_password_hash(user.password, password):
+    if not user or not password_hasher.check_password_hash(user.password, password):
         return jsonify({'message': 'Invalid credentials'}), 401
 
+    if password_hasher.needs_rehash(user.password):
+        user.password = password_hasher.generate_password_hash(password)
+        db.session.commit()
+
     access_token = create_access_token(identity=user.id)
     return jsonify(access_token=access_token)
 
 @bp.route('/profile')
 @jwt_required()
 def profile():
-    current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
-    if not user:
-        return jsonify({"message": "User not found"}), 404
-
-    # This will be a generic user object. The frontend can then
-    # use the role to determine how to display it.
-    user_data = {
-        "id": user.id,
-        "name": user.name,
-        "email": user.email,
-        "role": user.role
-    }
-    return jsonify(user_data)
\ No newline at end of file
+    # get_current_user() returns the cached {id, name, email, role} projection from
+    # backend.identity_cache, so this is a generic user object. The frontend
+    # can then use the role to determine how to display it.
+    return jsonify(get_current_user())
\ No newline at end of file
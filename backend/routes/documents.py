@@ -0,0 +1,58 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from ..retrieval import study_store
+
+bp = Blueprint('documents', __name__)
+
+
+def serialize_document(document):
+    return {
+        'id': document['id'],
+        'title': document['title'],
+        'chars': document['chars'],
+        'chunks': document['chunk_count'],
+        'createdAt': document['created_at'] * 1000,
+    }
+
+
+@bp.route('/', methods=['POST'])
+@jwt_required()
+def ingest_document():
+    """Stores a student's notes and indexes them for grounded generations.
+
+    Pass the returned id as documentId to the mindmap, infographic or
+    visualize-text routes to build from the relevant parts of the notes.
+    """
+    current_user_id = get_jwt_identity()
+    data = request.get_json() or {}
+    text = (data.get('text') or '').strip()
+    title = (data.get('title') or '').strip() or text[:60]
+
+    if not text:
+        return jsonify({"error": "Missing text"}), 400
+    if len(text) > study_store.max_document_chars:
+        return jsonify({"error": f"Documents are limited to {study_store.max_document_chars} characters"}), 413
+
+    try:
+        document = study_store.ingest(current_user_id, title, text)
+    except Exception as e:
+        print(f"An error occurred while indexing a document: {e}")
+        return jsonify({"error": "Failed to store document"}), 500
+
+    return jsonify(serialize_document(document)), 201
+
+
+@bp.route('/', methods=['GET'])
+@jwt_required()
+def get_documents():
+    current_user_id = get_jwt_identity()
+    return jsonify([serialize_document(d) for d in study_store.index(current_user_id).documents()])
+
+
+@bp.route('/<document_id>', methods=['DELETE'])
+@jwt_required()
+def delete_document(document_id):
+    current_user_id = get_jwt_identity()
+    if not study_store.index(current_user_id).delete_document(document_id):
+        return jsonify({"error": "Document not found"}), 404
+    return '', 204
@@ -0,0 +1,135 @@
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context, url_for
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from ..extensions import db
+from ..models.generation_job import GenerationJob
+from ..jobs import job_queue, TERMINAL
+from ..admission import admission, BULK
+from .library import to_js_timestamp
+import json
+import threading
+import time
+
+bp = Blueprint('jobs', __name__)
+
+_streams_lock = threading.Lock()
+_open_streams = 0
+
+
+def caller_identity():
+    # EventSource cannot set headers, so the event stream may carry its
+    # token in ?jwt= instead.
+    try:
+        verify_jwt_in_request(optional=True, locations=['headers', 'query_string'])
+        return get_jwt_identity()
+    except Exception:
+        return None
+
+
+def caller_key():
+    """Same key as db_routing.requester_key(): the JWT identity, else the client IP."""
+    return caller_identity() or request.remote_addr
+
+
+def serialize_job(job):
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'attempts': job.attempts,
+        'result': job.result,
+        'error': job.error if job.status == 'failed' else None,
+        'createdAt': to_js_timestamp(job.created_at),
+        'updatedAt': to_js_timestamp(job.updated_at),
+        'finishedAt': to_js_timestamp(job.finished_at) if job.finished_at else None,
+    }
+
+
+def get_owned_job(job_id):
+    job = db.session.get(GenerationJob, job_id)
+    # Someone else's job is reported as missing rather than forbidden.
+    if job is None or job.owner != caller_key():
+        return None
+    return job
+
+
+@bp.route('/', methods=['POST'])
+@admission.admit(BULK)
+def submit_job():
+    data = request.get_json(silent=True) or {}
+    kind = data.get('kind')
+    payload = data.get('input', {})
+
+    handler = job_queue.handlers.get(kind)
+    if handler is None:
+        return jsonify({"error": f"Unknown job kind: {kind}"}), 400
+    input_error = handler.input_error(payload)
+    if input_error:
+        return jsonify({"error": input_error}), 400
+
+    student_id = caller_identity()
+    job, created = job_queue.submit(kind, payload, student_id or request.remote_addr, student_id=student_id,
+                                    idempotency_key=request.headers.get('Idempotency-Key'))
+
+    response = jsonify(serialize_job(job))
+    response.headers['Location'] = url_for('jobs.get_job', job_id=job.id)
+    if created:
+        response.status_code = 202
+    return response
+
+
+@bp.route('/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = get_owned_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(serialize_job(job))
+
+
+@bp.route('/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    job = get_owned_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    poll_interval = current_app.config['JOB_SSE_POLL_SECONDS']
+    max_seconds = current_app.config['JOB_SSE_MAX_SECONDS']
+    max_streams = current_app.config['JOB_SSE_MAX_STREAMS']
+    retry_ms = current_app.config['JOB_SSE_RETRY_MS']
+
+    def events():
+        global _open_streams
+        # Counted once the body is being sent: a generator that never starts
+        # never reaches the finally that gives the place back.
+        with _streams_lock:
+            streaming = _open_streams < max_streams
+            if streaming:
+                _open_streams += 1
+        try:
+            # The browser reconnects after this many ms if the stream drops or
+            # we close it before the job finishes.
+            yield f'retry: {retry_ms}\n\n'
+            # Over the cap, send the current status once and close: the
+            # reconnect makes this a poll and frees the thread meanwhile.
+            deadline = time.monotonic() + (max_seconds if streaming else 0)
+            last_state = None
+            while True:
+                # End the transaction so the next read sees the worker's commits.
+                db.session.rollback()
+                current = db.session.get(GenerationJob, job_id)
+                if current is None:
+                    yield 'event: gone\ndata: {}\n\n'
+                    return
+                state = (current.status, current.attempts)
+                if state != last_state:
+                    last_state = state
+                    yield f'event: status\ndata: {json.dumps(serialize_job(current))}\n\n'
+                if current.status in TERMINAL or time.monotonic() >= deadline:
+                    return
+                time.sleep(poll_interval)
+        finally:
+            if streaming:
+                with _streams_lock:
+                    _open_streams -= 1
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
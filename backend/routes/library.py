@@ -2,10 +2,50 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..extensions import db
 from ..models.visual import Visual
+from ..db_routing import use_replica
+from ..admission import admission, BULK
+from ..upstream import UpstreamUnavailable
+from ..mapreduce import label_key
+from .mindmap import build_node_children
 import datetime
+import json
 
 bp = Blueprint('library', __name__)
 
+# Upper bound on the number of visuals a client may push in one sync call.
+MAX_SYNC_BATCH = 200
+# Rows committed by a concurrent request can carry an updated_at slightly older
+# than the cursor we hand out, so each delta re-reads this much history.
+# Clients upsert by id, so the occasional repeated row is harmless.
+SYNC_OVERLAP = datetime.timedelta(seconds=5)
+
+def to_js_timestamp(value):
+    return value.timestamp() * 1000
+
+def from_js_timestamp(value):
+    return datetime.datetime.fromtimestamp(value / 1000.0)
+
+def is_js_timestamp(value):
+    """True if ``value`` is a millisecond timestamp from_js_timestamp accepts."""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return False
+    try:
+        from_js_timestamp(value)
+    except (OverflowError, OSError, ValueError):
+        return False
+    return True
+
+def serialize_visual(v):
+    return {
+        'id': v.id,
+        'type': v.type,
+        'title': v.title,
+        'data': v.data,
+        'createdAt': to_js_timestamp(v.created_at), # Convert to JS timestamp
+        'updatedAt': to_js_timestamp(v.updated_at),
+        'student_id': v.student_id
+    }
+
 @bp.route('/save', methods=['POST'])
 @jwt_required()
 def save_visual():
@@ -20,30 +60,197 @@ def save_visual():
         type=data.get('type'),
         title=data.get('title'),
         data=data.get('data'),
-        created_at=datetime.datetime.fromtimestamp(data.get('createdAt') / 1000.0),
+        created_at=from_js_timestamp(data.get('createdAt')),
         student_id=current_user_id
     )
 
     db.session.add(new_visual)
     db.session.commit()
 
+    return jsonify(serialize_visual(new_visual)), 201
+
 @bp.route('/visuals', methods=['GET'])
 @jwt_required()
+@use_replica
 def get_visuals():
     current_user_id = get_jwt_identity()
-    
+
     visuals = Visual.query.filter_by(student_id=current_user_id).order_by(Visual.created_at.desc()).all()
-    
-    visuals_list = []
-    for v in visuals:
-        visuals_list.append({
-            'id': v.id,
-            'type': v.type,
-            'title': v.title,
-            'data': v.data,
-            'createdAt': v.created_at.timestamp() * 1000, # Convert to JS timestamp
-            'student_id': v.student_id
-        })
-        
-    return jsonify(visuals_list)
 
+    return jsonify([serialize_visual(v) for v in visuals])
+
+@bp.route('/sync', methods=['POST'])
+@jwt_required()
+def sync_visuals():
+    """Two-way delta sync of the visual library.
+
+    The client sends the cursor from its previous sync (or null for a first
+    sync) and the visuals it created or edited locally since then. The batch
+    is upserted in a single transaction and only rows changed after the
+    cursor are sent back, together with the cursor for the next call.
+    """
+    current_user_id = get_jwt_identity()
+    data = request.get_json() or {}
+    cursor = data.get('cursor')
+    changes = data.get('changes') or []
+
+    if cursor is not None and not is_js_timestamp(cursor):
+        return jsonify({"error": "cursor must be a timestamp in milliseconds"}), 400
+    if not isinstance(changes, list):
+        return jsonify({"error": "changes must be a list"}), 400
+    if len(changes) > MAX_SYNC_BATCH:
+        return jsonify({"error": f"At most {MAX_SYNC_BATCH} changes per sync"}), 413
+    for change in changes:
+        if not isinstance(change, dict) or not change.get('id') or not change.get('type') \
+                or not change.get('title') or change.get('data') is None:
+            return jsonify({"error": "Each change needs id, type, title and data"}), 400
+        if change.get('createdAt') and not is_js_timestamp(change['createdAt']):
+            return jsonify({"error": "createdAt must be a timestamp in milliseconds"}), 400
+
+    now = datetime.datetime.now()
+
+    try:
+        ids = [change['id'] for change in changes]
+        existing = {v.id: v for v in Visual.query.filter(Visual.id.in_(ids)).all()} if ids else {}
+        rejected = []
+
+        for change in changes:
+            visual = existing.get(change['id'])
+            if visual is None:
+                visual = Visual(
+                    id=change['id'],
+                    created_at=from_js_timestamp(change['createdAt']) if change.get('createdAt') else now,
+                    student_id=current_user_id
+                )
+                db.session.add(visual)
+                existing[visual.id] = visual
+            elif visual.student_id != current_user_id:
+                rejected.append(change['id'])
+                continue
+
+            visual.type = change['type']
+            visual.title = change['title']
+            visual.data = change['data']
+            visual.updated_at = now
+
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"An error occurred during library sync: {e}")
+        return jsonify({"error": "Failed to sync library"}), 500
+
+    query = Visual.query.filter_by(student_id=current_user_id)
+    if cursor is not None:
+        query = query.filter(Visual.updated_at > from_js_timestamp(cursor) - SYNC_OVERLAP)
+    # The client already holds what it just pushed, so don't echo it back.
+    if ids:
+        query = query.filter(Visual.id.notin_(ids))
+    visuals = query.order_by(Visual.updated_at).all()
+
+    return jsonify({
+        'cursor': to_js_timestamp(now),
+        'visuals': [serialize_visual(v) for v in visuals],
+        'rejected': rejected
+    })
+
+
+def node_path(nodes, node_id):
+    """The nodes from the root down to node_id, or None if it is not in the mindmap."""
+    by_id = {node.get('id'): node for node in nodes}
+    path = []
+    current = by_id.get(node_id)
+    while current is not None and current not in path:
+        path.append(current)
+        current = by_id.get(current.get('parentId'))
+    return path[::-1] or None
+
+
+def new_child_nodes(nodes, path, labels):
+    """Nodes for `labels` under path[-1], skipping labels it already has.
+
+    Ids follow the generator's scheme (node-3 under the root, node-3.4
+    below that) and skip any id already in use.
+    """
+    parent = path[-1]
+    ids = {node.get('id') for node in nodes}
+    taken = {label_key(node.get('label')) for node in nodes if node.get('parentId') == parent['id']}
+    theme = next((node['theme'] for node in reversed(path) if node.get('theme')), None)
+    prefix = 'node-' if len(path) == 1 else f"{parent['id']}."
+
+    added, position = [], 1
+    for label in labels:
+        if label_key(label) in taken:
+            continue
+        taken.add(label_key(label))
+        while f'{prefix}{position}' in ids:
+            position += 1
+        node = {'id': f'{prefix}{position}', 'label': label, 'parentId': parent['id']}
+        if theme:
+            node['theme'] = theme
+        ids.add(node['id'])
+        added.append(node)
+    return added
+
+
+@bp.route('/visuals/<visual_id>/expand', methods=['POST'])
+@jwt_required()
+@admission.admit(BULK)
+def expand_visual_node(visual_id):
+    """Generates children for one node of a saved mindmap and stores them.
+
+    Only the new nodes are returned, for the client to add to the tree it
+    already shows; the stored visual's updatedAt moves so other devices
+    pick the change up through /sync.
+    """
+    current_user_id = get_jwt_identity()
+    data = request.get_json() or {}
+    node_id = data.get('nodeId')
+
+    if not node_id:
+        return jsonify({"error": "Missing nodeId"}), 400
+
+    visual = db.session.get(Visual, visual_id)
+    if visual is None or visual.student_id != current_user_id:
+        return jsonify({"error": "Visual not found"}), 404
+    if visual.type != 'mindmap':
+        return jsonify({"error": "Only mindmaps can be expanded"}), 400
+    path = node_path(visual.data.get('nodes', []), node_id)
+    if path is None:
+        return jsonify({"error": "Node not found"}), 404
+
+    existing = [node.get('label') for node in visual.data.get('nodes', []) if node.get('parentId') == node_id]
+    try:
+        try:
+            labels = build_node_children([node.get('label', '') for node in path], existing)
+        except json.JSONDecodeError:
+            print("Error: Failed to decode JSON from Gemini API response.")
+            return jsonify({"error": "The AI model returned an invalid response."}), 500
+    except UpstreamUnavailable:
+        raise
+    except Exception as e:
+        print(f"An error occurred during mindmap node expansion: {e}")
+        return jsonify({"error": "Failed to expand node"}), 500
+
+    # Re-read under a row lock: another expansion of this visual may have
+    # committed while the model was answering.
+    db.session.rollback()
+    visual = Visual.query.filter_by(id=visual_id).with_for_update().one()
+    nodes = visual.data.get('nodes', [])
+    path = node_path(nodes, node_id)
+    if path is None:
+        db.session.rollback()
+        return jsonify({"error": "Node was removed while expanding"}), 409
+
+    added = new_child_nodes(nodes, path, labels)
+    if added:
+        # A new dict, so the JSON column is seen as changed.
+        visual.data = {**visual.data, 'nodes': nodes + added}
+        visual.updated_at = datetime.datetime.now()
+    db.session.commit()
+
+    return jsonify({
+        'visualId': visual.id,
+        'parentId': node_id,
+        'nodes': added,
+        'updatedAt': to_js_timestamp(visual.updated_at)
+    })
@@ -1,12 +1,16 @@
 from flask import Blueprint, request, jsonify
-import google.generativeai as genai
-import os
 import json
 import traceback
+from ..ai_log import ai_log
+from .. import gemini, mapreduce
+from ..upstream import UpstreamUnavailable
+from ..admission import admission, AdmissionRejected, BULK
+from ..jobs import job_queue
+from ..prefetch import prefetcher
+from ..retrieval import study_store, DocumentNotFound
 
 bp = Blueprint('mindmap', __name__)
 
-genai.configure(api_key=os.environ.get("GEMINI_API_KEY"))
 
 MINDMAP_PROMPT_TEMPLATE = """
 AI Mindmap Generator inspired by Google NotebookLM.
@@ -96,37 +100,107 @@ Generate the mindmap using the following content:
 <<INSERT USER CONTENT HERE>>
 """
 
+EXPAND_NODE_PROMPT_TEMPLATE = """
+You are extending an existing mindmap one level deeper.
+The node to expand is at this path from the root (root first):
+<<PATH>>
+
+It already has these children, which you must not repeat:
+<<EXISTING>>
+
+Give 3 to 6 new child nodes of "<<LABEL>>" that break it down further.
+Each label is a short keyword or phrase (1-4 words) and is specific to the path above.
+
+You MUST respond with a single valid JSON object of this form:
+{"children": [{"label": "First child"}, {"label": "Second child"}]}
+"""
+
+
+def build_node_children(path, existing_labels):
+    """Generates new child labels for the last node of `path` (a list of labels, root first)."""
+    prompt = (EXPAND_NODE_PROMPT_TEMPLATE
+              .replace("<<PATH>>", " > ".join(path))
+              .replace("<<EXISTING>>", "\n".join(f"- {label}" for label in existing_labels) or "(none)")
+              .replace("<<LABEL>>", path[-1]))
+
+    response, latency = gemini.generate('expand-node', prompt, user_input=path[-1])
+    ai_log.record('expand-node', " > ".join(path), response, latency)
+
+    text_to_parse = response.text
+    if text_to_parse.startswith("```json"):
+        text_to_parse = text_to_parse[7:]
+    if text_to_parse.endswith("```"):
+        text_to_parse = text_to_parse[:-3]
+
+    children = json.loads(text_to_parse).get('children', [])
+    return [str(child['label']).strip() for child in children
+            if isinstance(child, dict) and str(child.get('label', '')).strip()]
+
+
+def build_mindmap(user_content, image_base64=None):
+    """Generates a mindmap; raises json.JSONDecodeError if the model output is not JSON.
+
+    Text longer than MAPREDUCE_CHUNK_CHARS is mapped chunk by chunk in
+    parallel and the partial mindmaps merged (see backend.mapreduce).
+    """
+    if not image_base64 and mapreduce.needs_chunking(user_content):
+        return mapreduce.merge_mindmaps(mapreduce.map_chunks(build_mindmap, user_content))
+
+    prompt = MINDMAP_PROMPT_TEMPLATE.replace("<<INSERT USER CONTENT HERE>>", user_content)
+
+    if image_base64:
+        image_parts = [{"mime_type": "image/jpeg", "data": image_base64}]
+        response, latency = gemini.generate('generate-mindmap', [prompt, image_parts])
+    else:
+        response, latency = gemini.generate('generate-mindmap', prompt, user_input=user_content)
+    ai_log.record('generate-mindmap', user_content, response, latency)
+
+    # Strip the markdown wrapper if it exists
+    text_to_parse = response.text
+    if text_to_parse.startswith("```json"):
+        text_to_parse = text_to_parse[7:]
+    if text_to_parse.endswith("```"):
+        text_to_parse = text_to_parse[:-3]
+
+    return json.loads(text_to_parse)
+
+
+@job_queue.handler('mindmap', requires_any=('prompt', 'imageBase64'))
+def mindmap_job(payload):
+    return build_mindmap(payload.get('prompt', ''), payload.get('imageBase64'))
+
+
+prefetcher.register('mindmap', build_mindmap)
+
+
 @bp.route('/generate-mindmap', methods=['POST'])
 def generate_mindmap():
     data = request.get_json()
     user_content = data.get('prompt', '')
     image_base64 = data.get('imageBase64')
+    document_id = data.get('documentId')
 
-    if not user_content and not image_base64:
+    if not user_content and not image_base64 and not document_id:
         return jsonify({"error": "No content provided"}), 400
 
+    if document_id:
+        try:
+            user_content = study_store.ground(document_id, user_content)
+        except DocumentNotFound:
+            return jsonify({"error": "Document not found"}), 404
+    elif not image_base64:
+        # A prefetched mindmap is served without taking an admission slot.
+        prefetched = prefetcher.take('mindmap', user_content)
+        if prefetched is not None:
+            return jsonify(prefetched)
+
+    return mindmap_response(user_content, image_base64)
+
+@admission.admit(BULK)
+def mindmap_response(user_content, image_base64):
     try:
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        
-        prompt = MINDMAP_PROMPT_TEMPLATE.replace("<<INSERT USER CONTENT HERE>>", user_content)
-        
-        if image_base64:
-            image_parts = [{"mime_type": "image/jpeg", "data": image_base64}]
-            response = model.generate_content([prompt, image_parts])
-        else:
-            response = model.generate_content(prompt)
-
-        print(f"Gemini API response: {response.text}")
-
-        # Strip the markdown wrapper if it exists
-        text_to_parse = response.text
-        if text_to_parse.startswith("```json"):
-            text_to_parse = text_to_parse[7:]
-        if text_to_parse.endswith("```"):
-            text_to_parse = text_to_parse[:-3]
-
         try:
-            mindmap_json = json.loads(text_to_parse)
+            mindmap_json = build_mindmap(user_content, image_base64)
         except json.JSONDecodeError:
             print("Error: Failed to decode JSON from Gemini API response.")
             # Return a default response or an error message
@@ -134,8 +208,9 @@ def generate_mindmap():
         
         return jsonify(mindmap_json)
 
+    except (UpstreamUnavailable, AdmissionRejected):
+        raise
     except Exception as e:
         print("An error occurred during mindmap generation:")
         traceback.print_exc()
         return jsonify({"error": "Failed to generate mindmap"}), 500
-
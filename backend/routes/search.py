@@ -0,0 +1,61 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from ..db_routing import use_replica
+from ..fulltext import search, KINDS
+from .library import to_js_timestamp
+
+bp = Blueprint('search', __name__)
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 50
+
+
+def serialize_result(result):
+    return {
+        'kind': result['kind'],
+        'id': result['id'],
+        'conversationId': result['conversation_id'],
+        'title': result['title'],
+        'snippet': result['snippet'],
+        'updatedAt': to_js_timestamp(result['updated_at']) if result['updated_at'] else None,
+        'score': result['score'],
+    }
+
+
+@bp.route('/', methods=['GET'])
+@jwt_required()
+@use_replica
+def search_history():
+    """Ranked full-text search over the caller's messages, conversations and saved visuals.
+
+    Query parameters: q, page (from 1), limit (at most MAX_PAGE_SIZE) and
+    kinds, a comma-separated subset of message, conversation and visual.
+    Snippets are HTML with the matched terms in <mark> tags.
+    """
+    current_user_id = get_jwt_identity()
+    query = (request.args.get('q') or '').strip()
+    kinds = [kind for kind in (request.args.get('kinds') or ','.join(KINDS)).split(',') if kind]
+    try:
+        page = max(int(request.args.get('page', 1)), 1)
+        limit = min(max(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({"error": "page and limit must be integers"}), 400
+
+    if not query:
+        return jsonify({"error": "Missing q"}), 400
+    unknown = [kind for kind in kinds if kind not in KINDS]
+    if unknown:
+        return jsonify({"error": f"Unknown kinds: {', '.join(unknown)}"}), 400
+
+    try:
+        # One extra row tells us whether there is a next page without counting every match.
+        results = search(current_user_id, query, kinds, limit + 1, (page - 1) * limit)
+    except Exception as e:
+        print(f"An error occurred while searching: {e}")
+        return jsonify({"error": "Search failed"}), 500
+
+    return jsonify({
+        'results': [serialize_result(result) for result in results[:limit]],
+        'page': page,
+        'hasMore': len(results) > limit,
+    })
@@ -1,12 +1,14 @@
 from flask import Blueprint, jsonify
 from ..models.student import Student
 from ..extensions import db
+from ..db_routing import use_replica
 # from ..extensions import db, bcrypt # bcrypt is no longer needed here after removing add_student
 # import uuid # uuid is no longer needed here after removing add_student
 
 bp = Blueprint('students', __name__)
 
 @bp.route('/', methods=['GET'])
+@use_replica
 def get_students():
     students = Student.query.all()
     return jsonify([
@@ -21,6 +23,7 @@ def get_students():
     ])
 
 @bp.route('/<string:student_id>', methods=['GET'])
+@use_replica
 def get_student(student_id):
     student = Student.query.get(student_id)
     if not student:
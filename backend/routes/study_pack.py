@@ -0,0 +1,154 @@
+from flask import Blueprint, Response, current_app, request, jsonify, g
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from ..ai_log import current_student_id
+from ..jobs import job_queue
+from ..admission import admission, AdmissionRejected, BULK
+from ..db_routing import requester_key
+from ..upstream import upstream, UpstreamUnavailable, UpstreamTimeout
+import json
+import threading
+import time
+
+bp = Blueprint('study_pack', __name__)
+
+# Parts in the order they appear on the study page; each is a backend.jobs kind.
+PARTS = ('mindmap', 'infographic', 'quiz', 'exam-trends')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def executor():
+    # Separate from the upstream pool: each part blocks on its own upstream
+    # call, which could starve if both shared one pool.
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=current_app.config['STUDY_PACK_MAX_THREADS'],
+                                               thread_name_prefix='study-pack')
+    return _executor
+
+
+def part_payload(kind, topic, data):
+    if kind in ('mindmap', 'infographic'):
+        return {'prompt': topic}
+    if kind == 'quiz':
+        return {'topic': topic, 'difficulty': data.get('difficulty', 'Medium'), 'moduleId': data.get('moduleId')}
+    return {'topic': topic}
+
+
+class PartTimeout(Exception):
+    pass
+
+
+def run_part(app, kind, payload, student_id, timeout, give_up_at):
+    # A fresh app context per part, as a backend.jobs worker runs it. Each
+    # part holds its own upstream slot, and its `timeout` starts once it has
+    # one, so time spent queued is not charged to it. No model call outlives
+    # give_up_at, when collect_parts stops waiting.
+    with app.app_context(), admission.slot(BULK):
+        g.student_id = student_id
+        g.job_kind = kind
+        deadline = min(time.monotonic() + timeout, give_up_at)
+        try:
+            with upstream.deadline_within(deadline - time.monotonic()):
+                return job_queue.handlers[kind].run(payload)
+        except UpstreamUnavailable as e:
+            # The SDK's own timeout surfaces as a failed call rather than UpstreamTimeout.
+            if isinstance(e, UpstreamTimeout) or time.monotonic() >= deadline:
+                raise PartTimeout(kind) from e
+            raise
+
+
+def start_parts(topic, kinds, data, timeout, give_up_at):
+    """Submits every part at once and returns {future: kind}.
+
+    Takes one admission token per part up front, all or none, since each
+    part makes at least one model call of its own.
+    """
+    if admission.enabled:
+        admission.check_rate(requester_key(), BULK, cost=len(kinds))
+    app = current_app._get_current_object()
+    student_id = current_student_id()
+    futures = {}
+    for kind in kinds:
+        future = executor().submit(run_part, app, kind, part_payload(kind, topic, data), student_id,
+                                   timeout, give_up_at)
+        futures[future] = kind
+    return futures
+
+
+def collect_parts(futures, timeout, give_up_at):
+    """Yields (kind, part) as each finishes.
+
+    A part gets `timeout` seconds from when it starts, after which its model
+    calls are cut off. Parts still unfinished at give_up_at are reported as
+    timed out, and those that have not started are cancelled.
+    """
+    pending = set(futures)
+    try:
+        while pending:
+            remaining = give_up_at - time.monotonic()
+            done, pending = wait(pending, timeout=max(remaining, 0), return_when=FIRST_COMPLETED)
+            for future in done:
+                yield futures[future], part_result(futures[future], future, timeout)
+            if remaining <= 0:
+                break
+        for future in pending:
+            yield futures[future], {'status': 'timeout', 'error': f'{futures[future]} took longer than {timeout:g}s'}
+    finally:
+        # Also reached when a streaming client disconnects.
+        for future in futures:
+            future.cancel()
+
+
+def part_result(kind, future, timeout):
+    try:
+        return {'status': 'ok', 'data': future.result()}
+    except PartTimeout:
+        return {'status': 'timeout', 'error': f'{kind} took longer than {timeout:g}s'}
+    except AdmissionRejected as e:
+        return {'status': 'error', 'error': e.message}
+    except Exception as e:
+        print(f"An error occurred generating the {kind} study-pack part: {e}")
+        return {'status': 'error', 'error': f'Failed to generate {kind}'}
+
+
+@bp.route('/generate-study-pack', methods=['POST'])
+def generate_study_pack():
+    """Generates a topic's mindmap, infographic, quiz and exam trends concurrently.
+
+    Returns one JSON document once every part has finished or timed out,
+    or, with Accept: application/x-ndjson, one line per part as it
+    finishes. Failed and timed-out parts carry an error instead of data.
+    Each part is admitted as a bulk model call of its own.
+    """
+    data = request.get_json()
+    topic = (data.get('topic') or '').strip()
+    kinds = data.get('parts') or list(PARTS)
+
+    if not topic:
+        return jsonify({"error": "Missing topic"}), 400
+    if not isinstance(kinds, list):
+        return jsonify({"error": "parts must be a list"}), 400
+    kinds = list(dict.fromkeys(kinds))
+    unknown = [kind for kind in kinds if kind not in PARTS]
+    if unknown:
+        return jsonify({"error": f"Unknown study-pack parts: {', '.join(unknown)}"}), 400
+
+    timeout = current_app.config['STUDY_PACK_PART_TIMEOUT']
+    # Long enough for a part that waited the full admission queue timeout.
+    give_up_at = time.monotonic() + timeout + admission.queue_timeout
+    futures = start_parts(topic, kinds, data, timeout, give_up_at)
+
+    if request.accept_mimetypes.best == 'application/x-ndjson':
+        def lines():
+            for kind, part in collect_parts(futures, timeout, give_up_at):
+                yield json.dumps({'part': kind, **part}) + '\n'
+        return Response(lines(), mimetype='application/x-ndjson', headers={'X-Accel-Buffering': 'no'})
+
+    parts = dict(collect_parts(futures, timeout, give_up_at))
+    if not any(part['status'] == 'ok' for part in parts.values()):
+        return jsonify({"error": "Failed to generate study pack"}), 500
+    return jsonify({'topic': topic, 'parts': {kind: parts[kind] for kind in kinds}})
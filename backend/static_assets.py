@@ -0,0 +1,180 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+
+import click
+from flask import Response, abort, request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; without it only gzip variants are produced
+    brotli = None
+
+# Vite lists every file it emitted under a content hash in this manifest
+# (build.manifest in vite.config.ts); those can be cached forever because a
+# new build produces new file names.
+BUILD_MANIFEST = '.vite/manifest.json'
+# Without a manifest: Vite's `assets/<name>-<hash>.<ext>`, where the hash is 8+
+# base64url characters. Requiring a digit keeps words such as the `-icon` in
+# `apple-touch-icon.png` from passing for one; a hash without a digit just
+# gets the default TTL.
+HASHED_ASSET_RE = re.compile(r'^assets/(?:.*/)?[^/]+-(?=[A-Za-z0-9_-]*[0-9])[A-Za-z0-9_-]{8,}\.[A-Za-z0-9]+$')
+
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml', 'application/xml')
+# Compressing tiny files costs more in headers than it saves.
+MIN_COMPRESS_SIZE = 1024
+
+# (Content-Encoding, file suffix) in order of preference.
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def is_compressible(mimetype):
+    return mimetype.startswith(COMPRESSIBLE_TYPES)
+
+
+def hashed_files(root):
+    """Paths (relative to root) of the hashed files in Vite's build manifest, or None without one."""
+    try:
+        with open(os.path.join(root, BUILD_MANIFEST)) as f:
+            chunks = json.load(f)
+    except (OSError, ValueError):
+        return None
+    files = set()
+    for chunk in chunks.values():
+        if chunk.get('file'):
+            files.add(chunk['file'])
+        files.update(chunk.get('css', []))
+        files.update(chunk.get('assets', []))
+    return files
+
+
+class Asset:
+    def __init__(self, path, mimetype, cache_control):
+        self.mimetype = mimetype
+        self.cache_control = cache_control
+        with open(path, 'rb') as f:
+            self.body = f.read()
+        self.etag = hashlib.sha1(self.body).hexdigest()[:20]
+        self.variants = {}
+
+        if not is_compressible(mimetype) or len(self.body) < MIN_COMPRESS_SIZE:
+            return
+        for encoding, suffix in ENCODINGS:
+            if os.path.isfile(path + suffix):
+                with open(path + suffix, 'rb') as f:
+                    self.variants[encoding] = f.read()
+        # Fall back to compressing once here so a build without the
+        # precompress step still ships compressed responses.
+        if 'gzip' not in self.variants:
+            self.variants['gzip'] = gzip.compress(self.body, compresslevel=9, mtime=0)
+
+
+class StaticAssets:
+    """Serves the built frontend in `dist/` from an in-memory manifest.
+
+    The manifest is built once when the app starts, so requests never touch
+    the filesystem. Precompressed `.br`/`.gz` siblings are served to clients
+    that accept them, hashed bundles are marked immutable, and `index.html`
+    gets a short TTL and is revalidated through its ETag.
+    """
+
+    def __init__(self, app=None):
+        self.manifest = {}
+        self.index = None
+        self.hashed = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.root = app.config['STATIC_DIST_DIR']
+        self.immutable_cache = f"public, max-age={app.config['STATIC_IMMUTABLE_MAX_AGE']}, immutable"
+        self.index_cache = f"public, max-age={app.config['STATIC_INDEX_MAX_AGE']}"
+        self.default_cache = f"public, max-age={app.config['STATIC_DEFAULT_MAX_AGE']}"
+        self.build_manifest()
+
+        app.add_url_rule('/', 'serve', self.serve, defaults={'path': ''})
+        app.add_url_rule('/<path:path>', 'serve', self.serve)
+        app.cli.add_command(precompress_assets_command)
+
+    def build_manifest(self):
+        self.manifest = {}
+        self.hashed = hashed_files(self.root)
+        if os.path.isdir(self.root):
+            for dirpath, dirnames, filenames in os.walk(self.root):
+                # Build metadata such as .vite/ is not part of the site.
+                dirnames[:] = [name for name in dirnames if not name.startswith('.')]
+                for filename in filenames:
+                    if filename.endswith(('.br', '.gz')):
+                        continue
+                    path = os.path.join(dirpath, filename)
+                    rel = os.path.relpath(path, self.root).replace(os.sep, '/')
+                    self.manifest[rel] = Asset(path, self.guess_type(filename), self.cache_control_for(rel))
+        self.index = self.manifest.get('index.html')
+
+    def cache_control_for(self, rel):
+        if rel == 'index.html':
+            return self.index_cache
+        if self.hashed is not None:
+            hashed = rel in self.hashed
+        else:
+            hashed = HASHED_ASSET_RE.match(rel) is not None
+        if hashed:
+            return self.immutable_cache
+        return self.default_cache
+
+    @staticmethod
+    def guess_type(filename):
+        return mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    def serve(self, path):
+        # Unknown paths are client-side routes of the single page app.
+        asset = self.manifest.get(path) or self.index
+        if asset is None:
+            abort(404)
+
+        body, etag, encoding = asset.body, asset.etag, None
+        for candidate, _ in ENCODINGS:
+            if candidate in asset.variants and request.accept_encodings.quality(candidate):
+                encoding = candidate
+                body = asset.variants[candidate]
+                etag = f'{asset.etag}-{candidate}'
+                break
+
+        response = Response(body, mimetype=asset.mimetype)
+        response.headers['Cache-Control'] = asset.cache_control
+        if asset.variants:
+            response.vary.add('Accept-Encoding')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.set_etag(etag)
+        return response.make_conditional(request)
+
+
+@click.command('precompress-assets')
+@click.option('--dist', default=None, help='Directory to compress (defaults to STATIC_DIST_DIR).')
+def precompress_assets_command(dist):
+    """Write .gz (and .br when brotli is installed) next to built assets."""
+    from flask import current_app
+
+    root = dist or current_app.config['STATIC_DIST_DIR']
+    written = 0
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            if filename.endswith(('.br', '.gz')) or not is_compressible(StaticAssets.guess_type(filename)):
+                continue
+            path = os.path.join(dirpath, filename)
+            with open(path, 'rb') as f:
+                body = f.read()
+            if len(body) < MIN_COMPRESS_SIZE:
+                continue
+            with open(path + '.gz', 'wb') as f:
+                f.write(gzip.compress(body, compresslevel=9, mtime=0))
+            written += 1
+            if brotli is not None:
+                with open(path + '.br', 'wb') as f:
+                    f.write(brotli.compress(body, quality=11))
+                written += 1
+    click.echo(f'Wrote {written} precompressed files under {root}')
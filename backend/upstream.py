@@ -0,0 +1,288 @@
+import collections
+import contextlib
+import contextvars
+import math
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from flask import jsonify
+
+from .metrics import metrics
+
+
+class UpstreamUnavailable(Exception):
+    """Raised instead of calling a degraded upstream; rendered as 503."""
+
+    status = 503
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = max(int(math.ceil(retry_after)), 1)
+
+
+class UpstreamTimeout(UpstreamUnavailable):
+    """The endpoint's deadline passed before any attempt answered; rendered as 504."""
+
+    status = 504
+
+
+_transient_errors = None
+# Absolute time.monotonic() by which a caller needs its answer, when that is
+# sooner than the endpoint's deadline; see UpstreamCaller.deadline_within.
+_caller_deadline = contextvars.ContextVar('upstream_caller_deadline', default=None)
+
+
+def transient_errors():
+    # google.api_core is imported lazily: it pulls in grpc, and an error can
+    # only come from it once an SDK call has already imported it.
+    global _transient_errors
+    if _transient_errors is None:
+        errors = (UpstreamTimeout, TimeoutError, ConnectionError)
+        try:
+            from google.api_core import exceptions as api_exceptions
+        except ImportError:
+            api_exceptions = None
+        if api_exceptions is not None:
+            errors += (
+                api_exceptions.ServiceUnavailable, api_exceptions.InternalServerError,
+                api_exceptions.DeadlineExceeded, api_exceptions.TooManyRequests,
+            )
+        _transient_errors = errors
+    return _transient_errors
+
+
+def is_transient(error):
+    return isinstance(error, transient_errors())
+
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive transient failures.
+
+    While open every call fails fast. After `cooldown` seconds one probe is
+    let through (half-open); its success closes the breaker, its failure
+    re-opens it for another cooldown.
+    """
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self, model):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            remaining = self.opened_at + self.cooldown - time.monotonic()
+            if remaining > 0 or self.probing:
+                raise UpstreamUnavailable(f'{model} is unavailable, please retry', max(remaining, 1))
+            self.probing = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self.probing = False
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+
+class LatencyTracker:
+    """Recent successful call latencies per endpoint, for the hedge threshold."""
+
+    def __init__(self, window=200, min_samples=20):
+        self.min_samples = min_samples
+        self.samples = collections.defaultdict(lambda: collections.deque(maxlen=window))
+        self._lock = threading.Lock()
+
+    def observe(self, endpoint, seconds):
+        with self._lock:
+            self.samples[endpoint].append(seconds)
+
+    def percentile(self, endpoint, fraction):
+        with self._lock:
+            values = sorted(self.samples[endpoint])
+        if len(values) < self.min_samples:
+            return None
+        return values[min(int(fraction * len(values)), len(values) - 1)]
+
+
+class UpstreamCaller:
+    """Deadlines, retries, hedging and circuit breaking for model calls.
+
+    Every call gets the endpoint's deadline (UPSTREAM_DEADLINES, falling back
+    to UPSTREAM_DEFAULT_DEADLINE); the caller's thread never waits past it.
+    Transient errors on idempotent calls are retried with full-jitter
+    exponential backoff while the deadline allows. With UPSTREAM_HEDGE_ENABLED,
+    an idempotent attempt still running after the endpoint's recent
+    UPSTREAM_HEDGE_PERCENTILE latency gets a second, identical request and the
+    first answer wins. A per-model circuit breaker fails fast while the
+    upstream is failing.
+    """
+
+    def __init__(self, app=None):
+        self.breakers = {}
+        self.latencies = LatencyTracker()
+        self._executor = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.default_deadline = app.config['UPSTREAM_DEFAULT_DEADLINE']
+        self.deadlines = app.config['UPSTREAM_DEADLINES']
+        self.max_retries = app.config['UPSTREAM_MAX_RETRIES']
+        self.backoff_base = app.config['UPSTREAM_BACKOFF_BASE']
+        self.backoff_cap = app.config['UPSTREAM_BACKOFF_CAP']
+        self.hedge_enabled = app.config['UPSTREAM_HEDGE_ENABLED']
+        self.hedge_percentile = app.config['UPSTREAM_HEDGE_PERCENTILE']
+        self.hedge_min_delay = app.config['UPSTREAM_HEDGE_MIN_DELAY']
+        self.breaker_threshold = app.config['UPSTREAM_BREAKER_FAILURES']
+        self.breaker_cooldown = app.config['UPSTREAM_BREAKER_COOLDOWN']
+        self.max_threads = app.config['UPSTREAM_MAX_THREADS']
+        app.register_error_handler(UpstreamUnavailable, self.handle_unavailable)
+
+    @staticmethod
+    def handle_unavailable(e):
+        return jsonify({'error': str(e)}), e.status, {'Retry-After': str(e.retry_after)}
+
+    @property
+    def executor(self):
+        # Created lazily so the threads live in the serving process, not a pre-fork parent.
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_threads,
+                                                        thread_name_prefix='upstream')
+        return self._executor
+
+    def breaker(self, model):
+        with self._lock:
+            if model not in self.breakers:
+                self.breakers[model] = CircuitBreaker(self.breaker_threshold, self.breaker_cooldown)
+            return self.breakers[model]
+
+    def open_breakers(self):
+        return sum(1 for breaker in list(self.breakers.values()) if breaker.is_open)
+
+    def call(self, model, endpoint, fn, idempotent=True):
+        """Runs fn(timeout) under the endpoint's policy and returns its result.
+
+        `timeout` is the time left before the deadline, for the SDK's own
+        request timeout.
+        """
+        deadline = time.monotonic() + self.deadlines.get(endpoint, self.default_deadline)
+        if _caller_deadline.get() is not None:
+            deadline = min(deadline, _caller_deadline.get())
+        breaker = self.breaker(model)
+        attempt = 0
+        if deadline <= time.monotonic():
+            # A caller's deadline already passed; the upstream is not at fault.
+            metrics.upstream_event(model, endpoint, 'deadline')
+            raise UpstreamTimeout(f'{model} did not answer {endpoint} before its deadline')
+        while True:
+            try:
+                breaker.before_call(model)
+            except UpstreamUnavailable:
+                metrics.upstream_event(model, endpoint, 'short_circuit')
+                raise
+            started = time.monotonic()
+            try:
+                result = self._attempt(model, endpoint, fn, deadline, hedge=idempotent and self.hedge_enabled)
+            except Exception as e:
+                if is_transient(e):
+                    breaker.record_failure()
+                else:
+                    # The upstream answered; the request itself was bad.
+                    breaker.record_success()
+                if not is_transient(e) or isinstance(e, UpstreamUnavailable):
+                    raise
+                attempt += 1
+                delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+                if not idempotent or attempt > self.max_retries or time.monotonic() + delay >= deadline:
+                    # Surface as a retryable 503 rather than the route's generic 500.
+                    raise UpstreamUnavailable(f'{model} failed on {endpoint}: {e}', delay) from e
+                metrics.upstream_event(model, endpoint, 'retry')
+                time.sleep(delay)
+                continue
+            breaker.record_success()
+            self.latencies.observe(endpoint, time.monotonic() - started)
+            return result
+
+    @staticmethod
+    @contextlib.contextmanager
+    def deadline_within(seconds):
+        """Caps the deadline of every call made in the block, and in contexts copied from it.
+
+        Calls that would start after the cap fail with UpstreamTimeout
+        without reaching the model.
+        """
+        deadline = time.monotonic() + seconds
+        if _caller_deadline.get() is not None:
+            deadline = min(deadline, _caller_deadline.get())
+        token = _caller_deadline.set(deadline)
+        try:
+            yield
+        finally:
+            _caller_deadline.reset(token)
+
+    def _attempt(self, model, endpoint, fn, deadline, hedge):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise UpstreamTimeout(f'{model} did not answer {endpoint} before its deadline')
+        pending = {self._submit(fn, remaining)}
+        hedge_after = self.hedge_delay(endpoint) if hedge else None
+        hedged = False
+        error = None
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            timeout = min(hedge_after, remaining) if hedge_after is not None and not hedged else remaining
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if hedged:
+                        metrics.upstream_event(model, endpoint, 'hedge_won' if future is not first else 'hedge_lost')
+                    for other in pending:
+                        other.cancel()
+                    return future.result()
+                error = future.exception()
+            if not done and hedge_after is not None and not hedged and deadline > time.monotonic():
+                first = next(iter(pending))
+                hedged = True
+                metrics.upstream_event(model, endpoint, 'hedge')
+                pending.add(self._submit(fn, deadline - time.monotonic()))
+        if error is not None and not pending:
+            raise error
+        for future in pending:
+            future.cancel()
+        metrics.upstream_event(model, endpoint, 'deadline')
+        raise UpstreamTimeout(f'{model} did not answer {endpoint} before its deadline')
+
+    def _submit(self, fn, timeout):
+        # Each attempt runs in a copy of the caller's context so the app and
+        # request contexts stay available; a hedge needs its own copy.
+        return self.executor.submit(contextvars.copy_context().run, fn, timeout)
+
+    def hedge_delay(self, endpoint):
+        threshold = self.latencies.percentile(endpoint, self.hedge_percentile)
+        if threshold is None:
+            return None
+        return max(threshold, self.hedge_min_delay)
+
+
+upstream = UpstreamCaller()
@@ -0,0 +1,257 @@
+"""In-process stand-in for Gemini and Google TTS used by the load test.
+
+install() swaps google.generativeai.GenerativeModel and
+google.cloud.texttospeech.TextToSpeechClient for fakes, so the routes,
+backend.gemini and backend.metrics run unchanged while no network call is
+made. The fake picks a canned response for the route being served (or
+the backend.jobs kind being run) and can be told to add latency, stream,
+return malformed JSON or raise the errors the real SDK raises.
+"""
+import json
+import random
+import threading
+import time
+import types
+
+from flask import g, has_app_context, has_request_context, request
+
+try:
+    from google.api_core import exceptions as api_exceptions
+except ImportError:
+    api_exceptions = None
+
+
+def mindmap(topic='Photosynthesis', branches=6, leaves=4):
+    nodes = [{"id": "root", "label": topic}]
+    for b in range(1, branches + 1):
+        nodes.append({"id": f"node-{b}", "label": f"{topic} branch {b}", "parentId": "root", "theme": "blue"})
+        for l in range(1, leaves + 1):
+            nodes.append({"id": f"node-{b}.{l}", "label": f"Key concept {b}.{l}", "parentId": f"node-{b}"})
+    return {"title": topic, "nodes": nodes}
+
+
+def infographic(sections=5, items=4):
+    return {
+        "title": "The Water Cycle",
+        "highlight_insights": ["Continuous Movement", "Four Main Stages"],
+        "sections": [
+            {
+                "heading": f"Section {s}",
+                "content_type": "steps",
+                "visual_hint": "arrow-flow",
+                "items": [f"Step {i}: water changes state and moves through the cycle." for i in range(items)],
+            } for s in range(sections)
+        ],
+    }
+
+
+def questions(count=5):
+    return [
+        {
+            "id": i,
+            "question": f"Sample question {i}?",
+            "options": ["Option A", "Option B", "Option C", "Option D"],
+            "correctAnswer": i % 4,
+            "topic": "Physics",
+            "moduleId": "phy101",
+        } for i in range(1, count + 1)
+    ]
+
+
+# Route rule -> body the real model would return for it.
+RESPONSES = {
+    '/ai/socratic-chat': {
+        "steps": ["## Step 1\nStart from **Newton's second law**: $F = ma$.", "## Step 2\nSubstitute the values."],
+        "tutor_response": "So the force is 20 N. Try the same with friction next.",
+        "pedagogical_reasoning": "Direct explanation provided.",
+        "detected_sentiment": "NEUTRAL",
+        "suggested_action": "NONE",
+        "topic": "Newton's second law",
+    },
+    '/ai/generate-quiz': questions(),
+    '/ai/analyze-exam-trends': {"questions": questions()},
+    '/ai/analyze-code': {"fixedCode": "def add(a, b):\n    return a + b\n", "explanation": "Returned the sum."},
+    '/ai/expand-topic': mindmap('Subtopic', branches=4, leaves=2),
+    '/ai/visualize-text': mindmap('Explanation', branches=3, leaves=3),
+    '/ai/transcribe-audio': "This is the transcribed lecture audio.",
+    '/ai/search-resources': "VTU notes and previous year papers cover the key concepts of this topic.",
+    '/mindmap/generate-mindmap': mindmap(),
+    '/infographic/generate-infographic': infographic(),
+    '/library/visuals/<visual_id>/expand': {"children": [{"label": f"Detail {i}"} for i in range(1, 5)]},
+}
+
+SEARCH_RESULTS = [
+    ("https://vtu.example.edu/notes/unit1.pdf", "Unit 1 notes"),
+    ("https://papers.example.org/2023/question-paper", "2023 question paper"),
+    ("https://vtu.example.edu/notes/unit1.pdf", "Unit 1 notes (mirror)"),
+]
+
+
+class FakeBehaviour:
+    """Knobs for the fake model, shared by every FakeModel instance.
+
+    Latency is log-normal around `latency_ms` (median) with spread
+    `latency_sigma`, which matches the long right tail of real model calls.
+    """
+
+    def __init__(self, latency_ms=800, latency_sigma=0.5, error_rate=0.0, malformed_rate=0.0,
+                 stall_rate=0.0, stall_seconds=120, stream_chunks=8, seed=None):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+        self.stream_chunks = stream_chunks
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw(self):
+        """Returns (delay_seconds, outcome) where outcome is 'ok', 'error' or 'malformed'.
+
+        A stalled call ('ok' after stall_seconds) stands in for a request
+        the provider never answers.
+        """
+        with self._lock:
+            if self.latency_ms <= 0:
+                delay = 0.0
+            elif self.latency_sigma <= 0:
+                delay = self.latency_ms / 1000.0
+            else:
+                delay = self._rng.lognormvariate(0, self.latency_sigma) * self.latency_ms / 1000.0
+            roll = self._rng.random()
+            if self._rng.random() < self.stall_rate:
+                delay = self.stall_seconds
+        if roll < self.error_rate:
+            return delay, 'error'
+        if roll < self.error_rate + self.malformed_rate:
+            return delay, 'malformed'
+        return delay, 'ok'
+
+    def error(self):
+        with self._lock:
+            transient = self._rng.random() < 0.7
+        if api_exceptions is None:
+            return RuntimeError('fake upstream failure')
+        # The two failures the real API produces under load.
+        if transient:
+            return api_exceptions.ServiceUnavailable('fake: model overloaded')
+        return api_exceptions.ResourceExhausted('fake: quota exceeded')
+
+
+behaviour = FakeBehaviour()
+
+
+# backend.jobs workers have no request; they run the same builders as these routes.
+JOB_PATHS = {
+    'mindmap': '/mindmap/generate-mindmap',
+    'infographic': '/infographic/generate-infographic',
+    'quiz': '/ai/generate-quiz',
+    'exam-trends': '/ai/analyze-exam-trends',
+}
+
+
+def current_path():
+    if has_request_context():
+        return request.url_rule.rule if request.url_rule else request.path
+    if has_app_context():
+        return JOB_PATHS.get(g.get('job_kind'))
+    return None
+
+
+def response_text(path):
+    body = RESPONSES.get(path, {"text": "ok"})
+    if isinstance(body, str):
+        return body
+    return '```json' + json.dumps(body) + '```'
+
+
+def count_tokens(contents):
+    return max(len(json.dumps(contents, default=str)) // 4, 1)
+
+
+class FakeResponse:
+    def __init__(self, text, input_tokens, path=None):
+        self.text = text
+        self.usage_metadata = types.SimpleNamespace(
+            prompt_token_count=input_tokens, candidates_token_count=max(len(text) // 4, 1))
+        chunks = []
+        if path == '/ai/search-resources':
+            chunks = [types.SimpleNamespace(web=types.SimpleNamespace(uri=uri, title=title))
+                      for uri, title in SEARCH_RESULTS]
+        self.candidates = [types.SimpleNamespace(
+            grounding_metadata=types.SimpleNamespace(grounding_chunks=chunks))]
+
+
+class FakeStream:
+    """Iterates like a stream=True response, spreading the delay over chunks."""
+
+    def __init__(self, text, input_tokens, delay, chunks):
+        self._text = text
+        self._input_tokens = input_tokens
+        self._delay = delay
+        self._chunks = max(chunks, 1)
+        self.usage_metadata = None
+
+    def __iter__(self):
+        size = -(-len(self._text) // self._chunks)
+        for start in range(0, len(self._text), size):
+            time.sleep(self._delay / self._chunks)
+            yield FakeResponse(self._text[start:start + size], self._input_tokens)
+        self.usage_metadata = FakeResponse(self._text, self._input_tokens).usage_metadata
+
+    @property
+    def text(self):
+        return self._text
+
+
+class FakeModel:
+    def __init__(self, model_name='gemini-2.5-flash', **kwargs):
+        self.model_name = model_name
+        self.kwargs = kwargs
+
+    def generate_content(self, contents, stream=False, request_options=None, **kwargs):
+        delay, outcome = behaviour.draw()
+        timeout = (request_options or {}).get('timeout')
+        path = current_path()
+        text = response_text(path)
+        if outcome == 'malformed':
+            # Truncated mid-object, as when the model hits its output limit.
+            text = text[:max(len(text) // 2, 1)]
+        input_tokens = count_tokens(contents)
+
+        if stream and outcome != 'error':
+            return FakeStream(text, input_tokens, delay, behaviour.stream_chunks)
+        if timeout is not None and delay > timeout:
+            # What the SDK does when its request timeout fires.
+            time.sleep(timeout)
+            raise TimeoutError('fake: request timed out')
+        time.sleep(delay)
+        if outcome == 'error':
+            raise behaviour.error()
+        return FakeResponse(text, input_tokens, path)
+
+
+class FakeTextToSpeechClient:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def synthesize_speech(self, input=None, voice=None, audio_config=None, **kwargs):
+        delay, outcome = behaviour.draw()
+        time.sleep(delay)
+        if outcome == 'error':
+            raise behaviour.error()
+        # Roughly the size of a short MP3 clip.
+        return types.SimpleNamespace(audio_content=b'\xff\xfb\x90\x64' * 4096)
+
+
+def install(**options):
+    """Patch the SDKs in place and configure the shared behaviour."""
+    import google.generativeai as genai
+    from google.cloud import texttospeech
+
+    global behaviour
+    behaviour = FakeBehaviour(**options)
+    genai.GenerativeModel = FakeModel
+    texttospeech.TextToSpeechClient = FakeTextToSpeechClient
+    return behaviour
@@ -0,0 +1,86 @@
+"""Cold-start budget for the backend.
+
+Starts fresh interpreters that import `backend` and call create_app(),
+as a web worker or a `flask db upgrade` does. It fails (exit status 1)
+when the best of --runs exceeds --budget-ms, or when any of the heavy
+SDKs that are meant to load on first use (Gemini, Cloud TTS, grpc) got
+imported at startup.
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --budget-ms 800 --top 15
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Imported on first use by backend.gemini and the text-to-speech route.
+LAZY_MODULES = ('google.generativeai', 'google.cloud.texttospeech', 'google.api_core', 'grpc')
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+from backend import create_app
+create_app()
+elapsed = time.perf_counter() - started
+print(json.dumps({'seconds': elapsed, 'modules': sorted(sys.modules)}))
+"""
+
+
+def run_once(importtime=False):
+    env = dict(os.environ, DATABASE_URL='sqlite://')
+    cmd = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', PROBE]
+    result = subprocess.run(cmd, capture_output=True, text=True, env=env,
+                            cwd=os.path.join(os.path.dirname(__file__), '..'), check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def slowest_imports(stderr, top):
+    """Top-level-ish imports by cumulative microseconds from -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        rows.append((int(cumulative), name.rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters to start; the best run counts.')
+    parser.add_argument('--budget-ms', type=float, default=1200, help='Allowed import + create_app() time.')
+    parser.add_argument('--top', type=int, default=10, help='Slowest imports to list.')
+    args = parser.parse_args(argv)
+
+    timings = []
+    for _ in range(args.runs):
+        probe, _ = run_once()
+        timings.append(probe['seconds'] * 1000)
+    best = min(timings)
+
+    probe, stderr = run_once(importtime=True)
+    loaded = [name for name in LAZY_MODULES if name in probe['modules']]
+
+    print(f"import backend + create_app(): best {best:.0f} ms, worst {max(timings):.0f} ms "
+          f"(budget {args.budget_ms:.0f} ms)")
+    print(f"\n{'cumulative ms':>14}  module")
+    for cumulative, name in slowest_imports(stderr, args.top):
+        print(f"{cumulative / 1000:>14.1f}  {name}")
+
+    failures = []
+    if best > args.budget_ms:
+        failures.append(f"startup took {best:.0f} ms, over the {args.budget_ms:.0f} ms budget")
+    for name in loaded:
+        failures.append(f"{name} was imported at startup; it should load on first use")
+    if failures:
+        print('\nFAILED:')
+        for line in failures:
+            print(f'  {line}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
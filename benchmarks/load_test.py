@@ -0,0 +1,340 @@
+"""Offline load test for every blueprint, against a fake Gemini backend.
+
+Seeds a synthetic school (the dataset `flask check-query-plans` uses) into a
+scratch database, swaps the Gemini and TTS SDKs for benchmarks.fake_gemini,
+then drives each route through the Flask test client from a thread pool and
+reports latency percentiles, throughput, errors and per-request allocation.
+
+    python -m benchmarks.load_test
+    python -m benchmarks.load_test --concurrency 16 --requests 400 --latency-ms 1200
+    python -m benchmarks.load_test --error-rate 0.05 --malformed-rate 0.05
+    UPSTREAM_DEFAULT_DEADLINE=3 python -m benchmarks.load_test --stall-rate 0.02
+    python -m benchmarks.load_test --database-url postgresql://localhost/bench_scratch
+
+Results are compared with the stored baseline (--baseline, by default
+benchmarks/load_test_baseline.json, recorded with the default options) and
+the process exits with status 1 when an endpoint regressed beyond
+--tolerance, or 2 when the baseline file is missing. Record a new baseline
+with --save-baseline. Only point --database-url at an empty
+scratch database: the schema is created and seeded in place.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'load_test_baseline.json')
+BENCH_PASSWORD = 'benchmark-password'
+# Seeded students s0..s49 get a real password hash; the rest cannot log in.
+LOGIN_POOL = 50
+# A tiny JPEG-ish payload; the fake never decodes it.
+IMAGE_B64 = '/9j/4AAQSkZJRgABAQAAAQABAAD/' * 8
+_ids = itertools.count()
+
+
+def unique(prefix):
+    return f'{prefix}-{os.getpid()}-{next(_ids)}'
+
+
+def scenarios(students):
+    """(name, method, path, body_fn) for every route; body_fn(n) builds request n."""
+    def student(n):
+        return f's{n % students}'
+
+    def visual(n):
+        return {'id': unique('bench-visual'), 'type': 'mindmap', 'title': f'Bench {n}',
+                'data': {'title': 'Bench', 'nodes': [{'id': 'root', 'label': 'Bench'}]},
+                'createdAt': time.time() * 1000}
+
+    return [
+        ('auth.login', 'POST', '/auth/login',
+         lambda n: {'email': f's{n % min(students, LOGIN_POOL)}@school.example', 'password': BENCH_PASSWORD}),
+        ('auth.register', 'POST', '/auth/register',
+         lambda n: {'name': 'Bench', 'email': unique('bench') + '@school.example', 'password': BENCH_PASSWORD}),
+        ('auth.profile', 'GET', '/auth/profile', None),
+        ('students.get_students', 'GET', '/students/', None),
+        ('students.get_student', 'GET', '/students/{student}', None),
+        ('library.get_visuals', 'GET', '/library/visuals', None),
+        ('library.save_visual', 'POST', '/library/save', visual),
+        ('library.sync_visuals', 'POST', '/library/sync',
+         lambda n: {'cursor': (time.time() - 60) * 1000, 'changes': [visual(n), visual(n)]}),
+        ('ai.socratic_chat', 'POST', '/ai/socratic-chat',
+         lambda n: {'currentMessage': 'Why does a ball fall?', 'language': 'en',
+                    'history': [{'role': 'user', 'content': 'Hi'}, {'role': 'model', 'content': 'Hello!'}]}),
+        ('ai.generate_chat_title', 'POST', '/ai/generate-title', lambda n: {'message': 'Gravity'}),
+        ('ai.text_to_speech', 'POST', '/ai/text-to-speech', lambda n: {'text': 'Gravity pulls objects down.'}),
+        ('ai.search_study_resources', 'POST', '/ai/search-resources', lambda n: {'query': f'thermodynamics {n % 10}'}),
+        ('ai.generate_quiz_questions', 'POST', '/ai/generate-quiz',
+         lambda n: {'topic': 'Kinematics', 'difficulty': 'Medium', 'moduleId': 'phy101'}),
+        ('ai.transcribe_audio', 'POST', '/ai/transcribe-audio',
+         lambda n: {'audioBase64': IMAGE_B64, 'mimeType': 'audio/webm'}),
+        ('ai.analyze_code', 'POST', '/ai/analyze-code', lambda n: {'imageBase64': IMAGE_B64, 'language': 'python'}),
+        ('ai.analyze_exam_trends', 'POST', '/ai/analyze-exam-trends', lambda n: {'topic': 'Thermodynamics'}),
+        ('ai.expand_topic', 'POST', '/ai/expand-topic', lambda n: {'topic': 'Entropy'}),
+        ('ai.visualize_text', 'POST', '/ai/visualize-text', lambda n: {'text': 'Entropy always increases.'}),
+        ('mindmap.generate_mindmap', 'POST', '/mindmap/generate-mindmap',
+         lambda n: {'prompt': 'Photosynthesis in plants'}),
+        ('infographic.generate_infographic', 'POST', '/infographic/generate-infographic',
+         lambda n: {'prompt': 'The water cycle'}),
+    ]
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+class LoadTest:
+    def __init__(self, app, tokens, students, concurrency, requests, warmup, memory_samples):
+        self.app = app
+        self.tokens = tokens
+        self.students = students
+        self.concurrency = concurrency
+        self.requests = requests
+        self.warmup = warmup
+        self.memory_samples = memory_samples
+        self._local = threading.local()
+
+    def client(self):
+        # One test client per worker thread, like one browser per user.
+        if not hasattr(self._local, 'client'):
+            self._local.client = self.app.test_client()
+        return self._local.client
+
+    def call(self, method, path, body_fn, n):
+        student = f's{n % self.students}'
+        headers = {'Authorization': f'Bearer {self.tokens[n % len(self.tokens)]}',
+                   'Accept-Encoding': 'br, gzip'}
+        started = time.perf_counter()
+        response = self.client().open(path.format(student=student), method=method, headers=headers,
+                                      json=body_fn(n) if body_fn else None)
+        elapsed = time.perf_counter() - started
+        response.close()
+        return elapsed, response.status_code
+
+    def run(self, name, method, path, body_fn):
+        for n in range(self.warmup):
+            self.call(method, path, body_fn, n)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            started = time.perf_counter()
+            results = list(pool.map(lambda n: self.call(method, path, body_fn, n), range(self.requests)))
+            wall = time.perf_counter() - started
+
+        latencies = sorted(elapsed for elapsed, _ in results)
+        statuses = {}
+        for _, status in results:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        errors = sum(count for status, count in statuses.items() if int(status) >= 500)
+        return {
+            'requests': len(results),
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+            'p95_ms': percentile(latencies, 0.95) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'max_ms': latencies[-1] * 1000 if latencies else 0.0,
+            'throughput_rps': len(results) / wall if wall else 0.0,
+            'error_rate': errors / len(results) if results else 0.0,
+            'statuses': statuses,
+            'alloc_peak_kib': self.allocation_peak(method, path, body_fn),
+        }
+
+    def allocation_peak(self, method, path, body_fn):
+        """Median peak Python allocation of one request, measured serially.
+
+        tracemalloc is process-wide, so this runs outside the concurrent pass
+        where other threads' allocations would be attributed to the request.
+        """
+        if not self.memory_samples:
+            return None
+        peaks = []
+        tracemalloc.start()
+        try:
+            for n in range(self.memory_samples):
+                tracemalloc.reset_peak()
+                baseline = tracemalloc.get_traced_memory()[0]
+                self.call(method, path, body_fn, n)
+                peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+        finally:
+            tracemalloc.stop()
+        return sorted(peaks)[len(peaks) // 2] / 1024
+
+
+def compare(results, baseline, tolerance):
+    """Returns a list of human-readable regressions against the baseline."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        # Ignore sub-5ms moves on fast routes; they are scheduler noise.
+        if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance) and current['p95_ms'] - previous['p95_ms'] > 5:
+            regressions.append(f"{name}: p95 {previous['p95_ms']:.1f} -> {current['p95_ms']:.1f} ms")
+        if current['throughput_rps'] < previous['throughput_rps'] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {previous['throughput_rps']:.1f} -> {current['throughput_rps']:.1f} req/s")
+        if current['error_rate'] > previous['error_rate'] + 0.05:
+            regressions.append(f"{name}: error rate {previous['error_rate']:.0%} -> {current['error_rate']:.0%}")
+    return regressions
+
+
+def print_report(results, baseline):
+    header = (f"{'endpoint':<34}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>9}"
+              f"{'5xx':>6}{'alloc KiB':>11}{'p95 vs base':>13}")
+    print(header)
+    print('-' * len(header))
+    for name, r in results.items():
+        alloc = f"{r['alloc_peak_kib']:.0f}" if r['alloc_peak_kib'] is not None else '-'
+        delta = '-'
+        previous = baseline.get(name)
+        if previous and previous['p95_ms']:
+            delta = f"{(r['p95_ms'] / previous['p95_ms'] - 1):+.0%}"
+        print(f"{name:<34}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}{r['throughput_rps']:>9.1f}"
+              f"{r['error_rate']:>6.0%}{alloc:>11}{delta:>13}")
+    # ru_maxrss is KiB on Linux and bytes on macOS.
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if platform.system() == 'Darwin':
+        max_rss //= 1024
+    print(f"\nmax RSS: {max_rss / 1024:.1f} MiB")
+
+
+def setup(args):
+    """Point the app at a scratch database, seed it and return (app, tokens)."""
+    os.environ['DATABASE_URL'] = args.database_url
+    os.environ.setdefault('PASSWORD_HASH_WORKERS', str(args.hash_workers))
+    if args.no_admission:
+        os.environ['ADMISSION_ENABLED'] = '0'
+    # Client threads send their next request as soon as one is shed, so with
+    # the default bulk queue the overflow threads would spend the whole run
+    # collecting instant 503s and the bulk rows would only time rejections.
+    os.environ.setdefault('ADMISSION_BULK_QUEUE', str(args.concurrency))
+
+    from benchmarks import fake_gemini
+    fake_gemini.install(latency_ms=args.latency_ms, latency_sigma=args.latency_sigma,
+                        error_rate=args.error_rate, malformed_rate=args.malformed_rate, stall_rate=args.stall_rate,
+                        stream_chunks=args.stream_chunks, seed=args.seed)
+
+    import sqlalchemy as sa
+    from flask_jwt_extended import create_access_token
+
+    from backend import create_app
+    from backend.extensions import db, password_hasher
+    from backend.models import User
+    from backend.query_plans import seed
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        seed(db.engine, args.students, args.per_student)
+        # Seeded users have placeholder passwords; give the login pool real hashes.
+        login_ids = [f's{n}' for n in range(min(args.students, LOGIN_POOL))]
+        db.session.execute(sa.update(User).where(User.id.in_(login_ids))
+                           .values(password=password_hasher.generate_password_hash(BENCH_PASSWORD)))
+        db.session.commit()
+        tokens = [create_access_token(identity=f's{n}') for n in range(min(args.students, 200))]
+    return app, tokens
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent client threads.')
+    parser.add_argument('--requests', type=int, default=200, help='Timed requests per endpoint.')
+    parser.add_argument('--warmup', type=int, default=5, help='Untimed requests per endpoint first.')
+    parser.add_argument('--memory-samples', type=int, default=10,
+                        help='Serial requests per endpoint measured with tracemalloc (0 to skip).')
+    parser.add_argument('--only', action='append', default=[],
+                        help='Only run endpoints whose name contains this (repeatable).')
+    parser.add_argument('--database-url', default=None, help='Scratch database; a temporary SQLite file if unset.')
+    parser.add_argument('--students', type=int, default=500, help='Seeded students.')
+    parser.add_argument('--per-student', type=int, default=10, help='Seeded rows per student per child table.')
+    parser.add_argument('--hash-workers', type=int, default=2, help='PASSWORD_HASH_WORKERS for the run.')
+    parser.add_argument('--no-admission', action='store_true',
+                        help='Disable admission control to measure the routes unthrottled.')
+    parser.add_argument('--latency-ms', type=float, default=800, help='Median fake model latency.')
+    parser.add_argument('--latency-sigma', type=float, default=0.5, help='Log-normal spread of model latency.')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of model calls that raise.')
+    parser.add_argument('--malformed-rate', type=float, default=0.0,
+                        help='Fraction of model calls that return truncated JSON.')
+    parser.add_argument('--stall-rate', type=float, default=0.0,
+                        help='Fraction of model calls that hang until the deadline cuts them off.')
+    parser.add_argument('--stream-chunks', type=int, default=8, help='Chunks per streamed fake response.')
+    parser.add_argument('--seed', type=int, default=1, help='Seed for the fake model.')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline JSON to compare against.')
+    parser.add_argument('--save-baseline', action='store_true', help='Write this run as the new baseline.')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed relative regression.')
+    parser.add_argument('--output', help='Also write the full results as JSON here.')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.database_url is None:
+            args.database_url = 'sqlite:///' + os.path.join(tmp, 'load_test.db')
+        app, tokens = setup(args)
+
+        test = LoadTest(app, tokens, args.students, args.concurrency, args.requests,
+                        args.warmup, args.memory_samples)
+        results = {}
+        for name, method, path, body_fn in scenarios(args.students):
+            if args.only and not any(part in name for part in args.only):
+                continue
+            print(f"running {name} ...", file=sys.stderr)
+            results[name] = test.run(name, method, path, body_fn)
+
+        from backend.ai_log import ai_log
+        ai_log.flush()
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            stored = json.load(f)
+        baseline = stored['results']
+        if stored.get('config') != config_summary(args):
+            print(f"note: baseline was recorded with {stored.get('config')}", file=sys.stderr)
+    elif not args.save_baseline:
+        print(f"error: no baseline at {args.baseline}; nothing to compare against. "
+              f"Record one with --save-baseline.", file=sys.stderr)
+        print_report(results, baseline)
+        return 2
+
+    print_report(results, baseline)
+
+    report = {'config': config_summary(args), 'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"baseline written to {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print('\nREGRESSIONS:')
+        for line in regressions:
+            print(f'  {line}')
+        return 1
+    return 0
+
+
+def config_summary(args):
+    """The knobs that make two runs comparable."""
+    return {key: getattr(args, key) for key in (
+        'concurrency', 'requests', 'students', 'per_student', 'hash_workers', 'no_admission',
+        'latency_ms', 'latency_sigma', 'error_rate', 'malformed_rate', 'stall_rate',
+    )}
+
+
+if __name__ == '__main__':
+    sys.exit(main())
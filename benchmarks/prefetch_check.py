@@ -0,0 +1,108 @@
+"""End-to-end check of the speculative prefetch hit path (backend.prefetch).
+
+Posts a chat turn against benchmarks.fake_gemini, waits for the background
+mindmap and quiz for the topic the tutor's reply names, then asks for both
+with that topic while every admission slot is held. A hit must be served
+from the prefetch cache without queueing for a slot or calling the model;
+the check fails (exit status 1) when either request misses, is rejected,
+or takes more than --max-hit-ms.
+
+    python -m benchmarks.prefetch_check
+    python -m benchmarks.prefetch_check --latency-ms 1500 --max-hit-ms 50
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+
+def setup(args):
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'prefetch_check.db')
+    os.environ['PREFETCH_ENABLED'] = '1'
+    os.environ['PREFETCH_GATE_HEADROOM'] = '0'
+    os.environ['ADMISSION_ENABLED'] = '1'
+    os.environ['ADMISSION_QUEUE_TIMEOUT'] = '0.5'
+    os.environ['ANSWER_REUSE_ENABLED'] = '0'
+    os.environ.setdefault('PASSWORD_HASH_WORKERS', '0')
+    os.environ.setdefault('JOB_WORKERS', '0')
+    os.environ.setdefault('GEMINI_API_KEY', 'fake')
+
+    from benchmarks import fake_gemini
+    fake_gemini.install(latency_ms=args.latency_ms, latency_sigma=0)
+
+    from flask_jwt_extended import create_access_token
+
+    from backend import create_app
+    from backend.extensions import db
+    from backend.query_plans import seed
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        seed(db.engine, 1, 1)
+        token = create_access_token(identity='s0')
+    return app, {'Authorization': f'Bearer {token}'}
+
+
+def timed(client, path, body, headers):
+    started = time.perf_counter()
+    response = client.post(path, json=body, headers=headers)
+    return response, (time.perf_counter() - started) * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--latency-ms', type=float, default=800, help='fake model latency')
+    parser.add_argument('--max-hit-ms', type=float, default=100, help='slowest acceptable hit')
+    parser.add_argument('--wait', type=float, default=30, help='seconds to wait for the prefetch')
+    args = parser.parse_args(argv)
+
+    app, headers = setup(args)
+    from backend.admission import admission, BULK
+    from backend.prefetch import prefetcher
+
+    client = app.test_client()
+    reply, chat_ms = timed(client, '/ai/socratic-chat',
+                           {'currentMessage': 'Why does a heavier cart need a bigger push to speed up?',
+                            'language': 'en'}, headers)
+    topic = reply.get_json().get('topic')
+    print(f'chat: {reply.status_code} in {chat_ms:.0f} ms, topic {topic!r}')
+    if reply.status_code != 200 or not topic:
+        print('FAIL: the tutor reply names no topic')
+        return 1
+
+    deadline = time.monotonic() + args.wait
+    while prefetcher.generated < 2 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    print(f'prefetched: {prefetcher.generated} generated, {prefetcher.skipped} skipped')
+
+    # Hits must not need a slot: with all of them held, a miss would be rejected.
+    for _ in range(admission.gate.slots):
+        admission.gate.acquire(BULK, 1)
+    failures = []
+    try:
+        requests = [
+            ('mindmap', '/mindmap/generate-mindmap', {'prompt': topic}),
+            ('quiz', '/ai/generate-quiz', {'topic': topic, 'difficulty': 'Medium', 'moduleId': 'phy101'}),
+        ]
+        for kind, path, body in requests:
+            hits = prefetcher.hits
+            response, elapsed = timed(client, path, body, headers)
+            hit = prefetcher.hits == hits + 1
+            print(f'{kind}: {response.status_code} in {elapsed:.1f} ms, {"hit" if hit else "miss"}')
+            if response.status_code != 200 or not hit or elapsed > args.max_hit_ms:
+                failures.append(kind)
+    finally:
+        for _ in range(admission.gate.slots):
+            admission.gate.release(0)
+
+    if failures:
+        print(f'FAIL: {", ".join(failures)} not served from the prefetch')
+        return 1
+    print('OK')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""Micro-benchmark for the API response pipeline (backend.responses).
+
+Compares stdlib json vs orjson serialization time and the bytes on the
+wire for uncompressed, gzip and brotli bodies, using payloads shaped like
+the real mindmap, infographic, student list and visual library responses.
+
+    python -m benchmarks.response_pipeline
+"""
+import gzip
+import json
+import timeit
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def mindmap_payload(branches=12, leaves=6):
+    nodes = [{"id": "root", "label": "Photosynthesis"}]
+    for b in range(1, branches + 1):
+        nodes.append({"id": f"node-{b}", "label": f"Branch {b} of the topic", "parentId": "root", "theme": "blue"})
+        for l in range(1, leaves + 1):
+            nodes.append({"id": f"node-{b}.{l}", "label": f"Key concept {b}.{l}", "parentId": f"node-{b}"})
+    return {"title": "Photosynthesis", "nodes": nodes}
+
+
+def infographic_payload(sections=6, items=5):
+    return {
+        "title": "The Water Cycle",
+        "highlight_insights": ["Continuous Movement", "Four Main Stages"],
+        "sections": [
+            {
+                "heading": f"Section {s}",
+                "content_type": "steps",
+                "visual_hint": "arrow-flow",
+                "items": [f"Step {i}: water changes state and moves through the cycle." for i in range(items)],
+            } for s in range(sections)
+        ],
+    }
+
+
+def students_payload(count=300):
+    return [
+        {
+            "id": f"s{n:08d}-0000-0000-0000-000000000000",
+            "name": f"Student {n}",
+            "email": f"student{n}@school.example",
+            "masteryScore": n % 100,
+            "topicsCompleted": n % 40,
+            "atRisk": n % 7 == 0,
+        } for n in range(count)
+    ]
+
+
+def library_payload(count=40):
+    return [
+        {
+            "id": f"v{n}",
+            "type": "mindmap",
+            "title": f"Saved mindmap {n}",
+            "data": mindmap_payload(6, 4),
+            "createdAt": 1765000000000.0 + n,
+            "updatedAt": 1765000000000.0 + n,
+            "student_id": "s00000001",
+        } for n in range(count)
+    ]
+
+
+PAYLOADS = {
+    "mindmap": mindmap_payload(),
+    "infographic": infographic_payload(),
+    "students": students_payload(),
+    "library": library_payload(),
+}
+
+
+def stdlib_dumps(obj):
+    # Mirrors Flask's default provider: sorted keys, compact separators.
+    return json.dumps(obj, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+def orjson_dumps(obj):
+    return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+
+
+def per_call_us(fn, obj, number=200):
+    return min(timeit.repeat(lambda: fn(obj), number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    header = f"{'payload':<12}{'json us':>10}{'orjson us':>11}{'raw B':>9}{'gzip B':>9}{'br B':>9}"
+    print(header)
+    print("-" * len(header))
+    for name, obj in PAYLOADS.items():
+        body = stdlib_dumps(obj)
+        json_us = per_call_us(stdlib_dumps, obj)
+        orjson_us = per_call_us(orjson_dumps, obj) if orjson else float("nan")
+        gzip_size = len(gzip.compress(body, compresslevel=6))
+        br_size = len(brotli.compress(body, quality=5)) if brotli else 0
+        print(f"{name:<12}{json_us:>10.1f}{orjson_us:>11.1f}{len(body):>9}{gzip_size:>9}{br_size:>9}")
+
+
+if __name__ == "__main__":
+    main()
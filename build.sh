@@ -8,6 +8,7 @@ set -o errexit
 # Build the frontend (if using single service deployment)
 # npm install
 # npm run build
+# flask precompress-assets
 
 # Install backend dependencies
 pip install -r requirements.txt
@@ -1,5 +1,5 @@
 import React, { useState, useRef, useEffect, useMemo } from 'react';
-import { Send, Bot, User, Loader2, Globe, Bell, Volume2, Square, StopCircle, Plus, MessageSquare, ChevronLeft, Menu, PanelLeftClose, PanelLeftOpen, Paperclip, Mic, X, Image as ImageIcon, FileText, Sparkles } from 'lucide-react';
+import { Send, Bot, User, Loader2, Globe, Bell, Volume2, Square, StopCircle, Plus, MessageSquare, ChevronLeft, Menu, PanelLeftClose, PanelLeftOpen, Paperclip, Mic, X, Image as ImageIcon, FileText, Sparkles, Network, BookOpen } from 'lucide-react';
 import { getSocraticResponse, getAudioOverview, generateChatTitle, transcribeAudio, visualizeText } from '@/services/geminiService';
 import { db } from '@/services/mockDatabase';
 import { Message, UserRole, Sentiment, SupportedLanguage, TeacherMessage, ChatConversation, Attachment } from '@/types';
@@ -119,7 +119,12 @@ const StepMessage: React.FC<{ message: Message }> = ({ message }) => {
   );
 };
 
-export const StudentChat: React.FC = () => {
+interface StudentChatProps {
+  // Opens a follow-up for a tutor reply's topic; the backend has prefetched both for it
+  onStudyTopic?: (tab: 'visualStudio' | 'quiz', topic: string) => void;
+}
+
+export const StudentChat: React.FC<StudentChatProps> = ({ onStudyTopic }) => {
   const currentStudent = db.getCurrentStudent();
   const [activeConvId, setActiveConvId] = useState<string | null>(null);
   const [conversations, setConversations] = useState<ChatConversation[]>([]);
@@ -599,6 +604,25 @@ export const StudentChat: React.FC = () => {
                          {playingMessageId === msg.id && <Loader2 className="w-3 h-3 animate-spin ml-1" />}
                       </button>
                    )}
+                   {/* Follow-ups for the reply's topic, sent verbatim so they hit the prefetch */}
+                   {msg.role === 'model' && msg.topic && onStudyTopic && (
+                      <div className="self-start mt-1 flex items-center space-x-2">
+                        <button
+                          onClick={() => onStudyTopic('visualStudio', msg.topic!)}
+                          className="text-xs flex items-center space-x-1.5 px-2 py-1 rounded-md transition-colors text-gray-400 hover:text-indigo-600 dark:hover:text-indigo-400"
+                        >
+                          <Network className="w-3 h-3" />
+                          <span>Mindmap: {msg.topic}</span>
+                        </button>
+                        <button
+                          onClick={() => onStudyTopic('quiz', msg.topic!)}
+                          className="text-xs flex items-center space-x-1.5 px-2 py-1 rounded-md transition-colors text-gray-400 hover:text-indigo-600 dark:hover:text-indigo-400"
+                        >
+                          <BookOpen className="w-3 h-3" />
+                          <span>Quiz: {msg.topic}</span>
+                        </button>
+                      </div>
+                   )}
                  </div>
               </div>
             </motion.div>
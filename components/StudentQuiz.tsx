@@ -7,9 +7,10 @@ import { QuizQuestion } from '../types';
 
 interface StudentQuizProps {
   onBack?: () => void;
+  initialTopic?: string; // Opens the generator with this topic, e.g. a chat reply's topic
 }
 
-export const StudentQuiz: React.FC<StudentQuizProps> = ({ onBack }) => {
+export const StudentQuiz: React.FC<StudentQuizProps> = ({ onBack, initialTopic }) => {
   const [selectedModuleId, setSelectedModuleId] = useState<string | null>(null);
   const [currentQIndex, setCurrentQIndex] = useState(0);
   const [selectedOption, setSelectedOption] = useState<number | null>(null);
@@ -19,8 +20,8 @@ export const StudentQuiz: React.FC<StudentQuizProps> = ({ onBack }) => {
 
   // Generator State
   const [isGenerating, setIsGenerating] = useState(false);
-  const [showGenerator, setShowGenerator] = useState(false);
-  const [genTopic, setGenTopic] = useState('');
+  const [showGenerator, setShowGenerator] = useState(!!initialTopic);
+  const [genTopic, setGenTopic] = useState(initialTopic ?? '');
   const [genDifficulty, setGenDifficulty] = useState<'Easy'|'Medium'|'Hard'>('Medium');
 
   const student = db.getCurrentStudent();
@@ -9,12 +9,16 @@ import { motion, AnimatePresence } from 'framer-motion';
 
 import { useAuth } from './AuthContext';
 
-export const VisualStudio: React.FC = () => {
+interface VisualStudioProps {
+  initialPrompt?: string; // Prefills the mindmap prompt, e.g. with a chat reply's topic
+}
+
+export const VisualStudio: React.FC<VisualStudioProps> = ({ initialPrompt }) => {
   const { user } = useAuth();
   const [mode, setMode] = useState<'mindmap' | 'infographic'>('mindmap');
   const [inputMode, setInputMode] = useState<'text' | 'file'>('text');
   
-  const [textInput, setTextInput] = useState('');
+  const [textInput, setTextInput] = useState(initialPrompt ?? '');
   const [uploadedFile, setUploadedFile] = useState<File | null>(null);
   const [filePreview, setFilePreview] = useState<string | null>(null);
   
@@ -0,0 +1,157 @@
+"""Add full-text search indexes over messages, conversations and visuals
+
+Revision ID: 2f6a8c1d9e47
+Revises: c7d41a9e6b25
+Create Date: 2026-10-19 18:12:09.604113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2f6a8c1d9e47'
+down_revision = 'c7d41a9e6b25'
+branch_labels = None
+depends_on = None
+
+# The same DDL as backend.fulltext at the time of this revision.
+SQLITE_DDL = [
+    '''CREATE TABLE IF NOT EXISTS search_documents (
+        id INTEGER PRIMARY KEY,
+        kind TEXT NOT NULL,
+        ref_id TEXT NOT NULL,
+        student_id TEXT NOT NULL,
+        conversation_id TEXT,
+        title TEXT NOT NULL DEFAULT '',
+        body TEXT NOT NULL DEFAULT '',
+        updated_at TEXT,
+        UNIQUE (kind, ref_id)
+    )''',
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        student_id, title, body,
+        content='search_documents', content_rowid='id', tokenize='porter unicode61'
+    )''',
+    '''CREATE TRIGGER IF NOT EXISTS search_documents_ai AFTER INSERT ON search_documents BEGIN
+        INSERT INTO search_index (rowid, student_id, title, body)
+        VALUES (new.id, new.student_id, new.title, new.body);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS search_documents_ad AFTER DELETE ON search_documents BEGIN
+        INSERT INTO search_index (search_index, rowid, student_id, title, body)
+        VALUES ('delete', old.id, old.student_id, old.title, old.body);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS search_documents_au AFTER UPDATE ON search_documents BEGIN
+        INSERT INTO search_index (search_index, rowid, student_id, title, body)
+        VALUES ('delete', old.id, old.student_id, old.title, old.body);
+        INSERT INTO search_index (rowid, student_id, title, body)
+        VALUES (new.id, new.student_id, new.title, new.body);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS messages_search_ai AFTER INSERT ON messages BEGIN
+        INSERT INTO search_documents (kind, ref_id, student_id, conversation_id, body, updated_at)
+        SELECT 'message', new.id, c.student_id, new.conversation_id, new.content, new.timestamp
+        FROM chat_conversations c WHERE c.id = new.conversation_id;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS messages_search_au AFTER UPDATE OF content, timestamp ON messages BEGIN
+        UPDATE search_documents SET body = new.content, updated_at = new.timestamp
+        WHERE kind = 'message' AND ref_id = old.id;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS messages_search_ad AFTER DELETE ON messages BEGIN
+        DELETE FROM search_documents WHERE kind = 'message' AND ref_id = old.id;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS chat_conversations_search_ai AFTER INSERT ON chat_conversations BEGIN
+        INSERT INTO search_documents (kind, ref_id, student_id, conversation_id, title, body, updated_at)
+        VALUES ('conversation', new.id, new.student_id, new.id, new.title, coalesce(new.summary, ''),
+                new.updated_at);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS chat_conversations_search_au
+        AFTER UPDATE OF title, summary, updated_at ON chat_conversations BEGIN
+        UPDATE search_documents SET title = new.title, body = coalesce(new.summary, ''), updated_at = new.updated_at
+        WHERE kind = 'conversation' AND ref_id = old.id;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS chat_conversations_search_ad AFTER DELETE ON chat_conversations BEGIN
+        DELETE FROM search_documents WHERE kind = 'conversation' AND ref_id = old.id;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS visuals_search_ai AFTER INSERT ON visuals BEGIN
+        INSERT INTO search_documents (kind, ref_id, student_id, title, body, updated_at)
+        VALUES ('visual', new.id, new.student_id, new.title, (
+            SELECT coalesce(group_concat(value, ' '), '')
+            FROM json_tree(CASE WHEN json_valid(new.data) THEN new.data ELSE '{}' END)
+            WHERE type = 'text' AND coalesce(key, '') NOT IN ('id', 'parentId', 'theme', 'content_type', 'visual_hint')
+        ), new.updated_at);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS visuals_search_au AFTER UPDATE OF title, data, updated_at ON visuals BEGIN
+        UPDATE search_documents SET title = new.title, updated_at = new.updated_at, body = (
+            SELECT coalesce(group_concat(value, ' '), '')
+            FROM json_tree(CASE WHEN json_valid(new.data) THEN new.data ELSE '{}' END)
+            WHERE type = 'text' AND coalesce(key, '') NOT IN ('id', 'parentId', 'theme', 'content_type', 'visual_hint')
+        )
+        WHERE kind = 'visual' AND ref_id = old.id;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS visuals_search_ad AFTER DELETE ON visuals BEGIN
+        DELETE FROM search_documents WHERE kind = 'visual' AND ref_id = old.id;
+    END''',
+]
+
+# Postgres: a generated tsvector column per source table, so every write
+# keeps it current, with a GIN index over it.
+POSTGRES_DDL = [
+    '''ALTER TABLE messages ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (to_tsvector('english', content)) STORED''',
+    '''ALTER TABLE chat_conversations ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (setweight(to_tsvector('english', title), 'A')
+                             || setweight(to_tsvector('english', coalesce(summary, '')), 'B')) STORED''',
+    '''ALTER TABLE visuals ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (setweight(to_tsvector('english', title), 'A')
+                             || setweight(json_to_tsvector('english', data, '["string"]'), 'B')) STORED''',
+    'CREATE INDEX IF NOT EXISTS ix_messages_search_vector ON messages USING gin (search_vector)',
+    'CREATE INDEX IF NOT EXISTS ix_chat_conversations_search_vector ON chat_conversations USING gin (search_vector)',
+    'CREATE INDEX IF NOT EXISTS ix_visuals_search_vector ON visuals USING gin (search_vector)',
+]
+
+# Indexes rows written before the triggers existed. On Postgres the
+# generated columns are computed for existing rows when they are added.
+SQLITE_BACKFILL = [
+    '''INSERT INTO search_documents (kind, ref_id, student_id, conversation_id, body, updated_at)
+        SELECT 'message', m.id, c.student_id, m.conversation_id, m.content, m.timestamp
+        FROM messages m JOIN chat_conversations c ON c.id = m.conversation_id''',
+    '''INSERT INTO search_documents (kind, ref_id, student_id, conversation_id, title, body, updated_at)
+        SELECT 'conversation', id, student_id, id, title, coalesce(summary, ''), updated_at
+        FROM chat_conversations''',
+    '''INSERT INTO search_documents (kind, ref_id, student_id, title, body, updated_at)
+        SELECT 'visual', v.id, v.student_id, v.title, (
+            SELECT coalesce(group_concat(value, ' '), '')
+            FROM json_tree(CASE WHEN json_valid(v.data) THEN v.data ELSE '{}' END)
+            WHERE type = 'text' AND coalesce(key, '') NOT IN ('id', 'parentId', 'theme', 'content_type', 'visual_hint')
+        ), v.updated_at
+        FROM visuals v''',
+]
+
+SQLITE_TRIGGERS = [
+    'messages_search_ai', 'messages_search_au', 'messages_search_ad',
+    'chat_conversations_search_ai', 'chat_conversations_search_au', 'chat_conversations_search_ad',
+    'visuals_search_ai', 'visuals_search_au', 'visuals_search_ad',
+    'search_documents_ai', 'search_documents_ad', 'search_documents_au',
+]
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        for statement in SQLITE_DDL + SQLITE_BACKFILL:
+            op.execute(statement)
+    elif bind.dialect.name == 'postgresql':
+        for statement in POSTGRES_DDL:
+            op.execute(statement)
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        for trigger in SQLITE_TRIGGERS:
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        op.execute('DROP TABLE IF EXISTS search_index')
+        op.execute('DROP TABLE IF EXISTS search_documents')
+    elif bind.dialect.name == 'postgresql':
+        for table in ('visuals', 'chat_conversations', 'messages'):
+            op.execute(f'DROP INDEX IF EXISTS ix_{table}_search_vector')
+            op.execute(f'ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector')
@@ -0,0 +1,36 @@
+"""Add updated_at change cursor to visuals
+
+Revision ID: 3a7c1e9b2d40
+Revises: 0d6919204b03
+Create Date: 2026-10-19 10:12:05.118342
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3a7c1e9b2d40'
+down_revision = '0d6919204b03'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('visuals', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+    # Existing rows have never been modified, so their creation time is the cursor.
+    op.execute('UPDATE visuals SET updated_at = created_at')
+
+    with op.batch_alter_table('visuals', schema=None) as batch_op:
+        batch_op.alter_column('updated_at',
+               existing_type=sa.DateTime(),
+               nullable=False)
+        batch_op.create_index('ix_visuals_student_id_updated_at', ['student_id', 'updated_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('visuals', schema=None) as batch_op:
+        batch_op.drop_index('ix_visuals_student_id_updated_at')
+        batch_op.drop_column('updated_at')
@@ -0,0 +1,39 @@
+"""Extend ai_decision_logs for the write-behind AI audit log
+
+Revision ID: 5b9d0e7a3f12
+Revises: 8e2f4b6d1c93
+Create Date: 2026-10-19 13:40:18.902114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b9d0e7a3f12'
+down_revision = '8e2f4b6d1c93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('ai_decision_logs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('endpoint', sa.String(length=80), nullable=True))
+        batch_op.add_column(sa.Column('latency_ms', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('input_tokens', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('output_tokens', sa.Integer(), nullable=True))
+        batch_op.alter_column('student_id',
+               existing_type=sa.String(length=80),
+               nullable=True)
+
+
+def downgrade():
+    op.execute('DELETE FROM ai_decision_logs WHERE student_id IS NULL')
+    with op.batch_alter_table('ai_decision_logs', schema=None) as batch_op:
+        batch_op.alter_column('student_id',
+               existing_type=sa.String(length=80),
+               nullable=False)
+        batch_op.drop_column('output_tokens')
+        batch_op.drop_column('input_tokens')
+        batch_op.drop_column('latency_ms')
+        batch_op.drop_column('endpoint')
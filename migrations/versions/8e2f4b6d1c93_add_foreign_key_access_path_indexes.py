@@ -0,0 +1,44 @@
+"""Add indexes for foreign-key access paths
+
+Revision ID: 8e2f4b6d1c93
+Revises: 3a7c1e9b2d40
+Create Date: 2026-10-19 11:02:41.527904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e2f4b6d1c93'
+down_revision = '3a7c1e9b2d40'
+branch_labels = None
+depends_on = None
+
+# (index name, table, columns). Each composite index leads with the foreign
+# key the routes filter on, followed by the column they sort or filter by next.
+INDEXES = [
+    ('ix_visuals_student_id_created_at', 'visuals', ['student_id', 'created_at']),
+    ('ix_messages_conversation_id_timestamp', 'messages', ['conversation_id', 'timestamp']),
+    ('ix_transcript_items_live_session_id_timestamp', 'transcript_items', ['live_session_id', 'timestamp']),
+    ('ix_quiz_attempts_student_id_date', 'quiz_attempts', ['student_id', 'date']),
+    ('ix_quiz_attempts_module_id', 'quiz_attempts', ['module_id']),
+    ('ix_quiz_questions_module_id', 'quiz_questions', ['module_id']),
+    ('ix_module_stats_student_id', 'module_stats', ['student_id']),
+    ('ix_teacher_messages_student_id_read', 'teacher_messages', ['student_id', 'read']),
+    ('ix_chat_conversations_student_id_updated_at', 'chat_conversations', ['student_id', 'updated_at']),
+    ('ix_live_sessions_student_id_start_time', 'live_sessions', ['student_id', 'start_time']),
+    ('ix_study_resources_student_id_date_saved', 'study_resources', ['student_id', 'date_saved']),
+    ('ix_intervention_flags_student_id_timestamp', 'intervention_flags', ['student_id', 'timestamp']),
+    ('ix_ai_decision_logs_student_id_timestamp', 'ai_decision_logs', ['student_id', 'timestamp']),
+]
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False)
+
+
+def downgrade():
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,47 @@
+"""Add the shared resource catalog and persisted resource searches
+
+Revision ID: 9b3e5d7f1a28
+Revises: 2f6a8c1d9e47
+Create Date: 2026-10-19 19:27:51.148336
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b3e5d7f1a28'
+down_revision = '2f6a8c1d9e47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('catalog_resources',
+    sa.Column('id', sa.String(length=80), nullable=False),
+    sa.Column('uri', sa.String(length=2048), nullable=False),
+    sa.Column('title', sa.String(length=255), nullable=False),
+    sa.Column('source', sa.String(length=255), nullable=True),
+    sa.Column('type', sa.String(length=20), nullable=True),
+    sa.Column('first_seen_at', sa.DateTime(), nullable=False),
+    sa.Column('last_seen_at', sa.DateTime(), nullable=False),
+    sa.Column('times_seen', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('uri')
+    )
+    op.create_table('resource_searches',
+    sa.Column('id', sa.String(length=80), nullable=False),
+    sa.Column('query_key', sa.String(length=255), nullable=False),
+    sa.Column('query_text', sa.Text(), nullable=False),
+    sa.Column('summary', sa.Text(), nullable=False),
+    sa.Column('resource_ids', sa.JSON(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('hits', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('query_key')
+    )
+
+
+def downgrade():
+    op.drop_table('resource_searches')
+    op.drop_table('catalog_resources')
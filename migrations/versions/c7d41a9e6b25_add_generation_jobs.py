@@ -0,0 +1,51 @@
+"""Add generation_jobs for the background generation queue
+
+Revision ID: c7d41a9e6b25
+Revises: 5b9d0e7a3f12
+Create Date: 2026-10-19 16:05:47.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d41a9e6b25'
+down_revision = '5b9d0e7a3f12'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('generation_jobs',
+    sa.Column('id', sa.String(length=80), nullable=False),
+    sa.Column('kind', sa.String(length=40), nullable=False),
+    sa.Column('owner', sa.String(length=120), nullable=False),
+    sa.Column('student_id', sa.String(length=80), nullable=True),
+    sa.Column('idempotency_key', sa.String(length=120), nullable=True),
+    sa.Column('payload', sa.JSON(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('result', sa.JSON(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('run_after', sa.DateTime(), nullable=False),
+    sa.Column('lease_expires_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.Column('expires_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['student_id'], ['students.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('owner', 'idempotency_key', name='uq_generation_jobs_owner_idempotency_key')
+    )
+    with op.batch_alter_table('generation_jobs', schema=None) as batch_op:
+        batch_op.create_index('ix_generation_jobs_status_run_after', ['status', 'run_after'], unique=False)
+        batch_op.create_index('ix_generation_jobs_expires_at', ['expires_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('generation_jobs', schema=None) as batch_op:
+        batch_op.drop_index('ix_generation_jobs_expires_at')
+        batch_op.drop_index('ix_generation_jobs_status_run_after')
+
+    op.drop_table('generation_jobs')
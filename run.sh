@@ -1,2 +1,2 @@
 #!/usr/bin/env bash
-exec gunicorn --workers 1 --worker-class gthread "backend:create_app()"
\ No newline at end of file
+exec gunicorn --workers 1 --worker-class gthread --threads ${GUNICORN_THREADS:-8} "backend:create_app()"
\ No newline at end of file
@@ -47,3 +47,120 @@ export const apiRegister = async (name, email, password) => {
 
   return response.json();
 };
+
+const LIVE_WS_URL = import.meta.env.VITE_LIVE_WS_URL || 'ws://localhost:8765';
+
+// Opens the live tutoring gateway for one session. Send transcript fragments
+// with `sendTranscript`; the server batches them into the database and pushes
+// events ("ready", "flushed", "error", "ended") to `onEvent`.
+export const openLiveSession = (sessionId, token, onEvent) => {
+  const socket = new WebSocket(`${LIVE_WS_URL}/live/${encodeURIComponent(sessionId)}?token=${encodeURIComponent(token)}`);
+  socket.onmessage = (event) => onEvent(JSON.parse(event.data));
+
+  return {
+    sendTranscript: (role, text) => socket.send(JSON.stringify({ type: 'transcript', role, text, timestamp: Date.now() })),
+    end: () => socket.send(JSON.stringify({ type: 'end' })),
+    socket,
+  };
+};
+
+// Queues a long-running generation ("mindmap", "infographic", "quiz" or
+// "exam-trends") on the backend job queue and returns the job. Reusing the
+// same idempotencyKey after a dropped connection returns the original job
+// instead of starting another.
+export const submitGenerationJob = async (kind, input, token, idempotencyKey = crypto.randomUUID()) => {
+  const response = await fetch(`${API_URL}/jobs/`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      'Idempotency-Key': idempotencyKey,
+      ...(token ? { 'Authorization': `Bearer ${token}` } : {}),
+    },
+    body: JSON.stringify({ kind, input }),
+  });
+
+  if (!response.ok) {
+    const errorData = await response.json();
+    throw new Error(errorData.error || 'Could not start generation');
+  }
+
+  return response.json();
+};
+
+// Follows a job's progress over server-sent events. `onUpdate` receives the
+// job on every status change; the stream closes once it has succeeded or
+// failed. Returns a function that stops watching.
+export const watchJob = (jobId, token, onUpdate) => {
+  const query = token ? `?jwt=${encodeURIComponent(token)}` : '';
+  const source = new EventSource(`${API_URL}/jobs/${encodeURIComponent(jobId)}/events${query}`);
+  source.addEventListener('status', (event) => {
+    const job = JSON.parse(event.data);
+    onUpdate(job);
+    if (job.status === 'succeeded' || job.status === 'failed') {
+      source.close();
+    }
+  });
+  source.addEventListener('gone', () => source.close());
+  return () => source.close();
+};
+
+// Adds AI-generated children under one node of a saved mindmap. Resolves to
+// { visualId, parentId, nodes, updatedAt }, where `nodes` holds only the new
+// nodes; append them to the mindmap already on screen.
+export const expandMindmapNode = async (visualId, nodeId, token) => {
+  const response = await fetch(`${API_URL}/library/visuals/${encodeURIComponent(visualId)}/expand`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      'Authorization': `Bearer ${token}`,
+    },
+    body: JSON.stringify({ nodeId }),
+  });
+
+  if (!response.ok) {
+    const errorData = await response.json();
+    throw new Error(errorData.error || 'Could not expand node');
+  }
+
+  return response.json();
+};
+
+// Stores notes in the student's document index. Pass the returned `id` as
+// `documentId` to the mindmap, infographic or visualize-text generators to
+// build from the relevant parts of the notes instead of pasting them again.
+export const ingestDocument = async (title, text, token) => {
+  const response = await fetch(`${API_URL}/documents/`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      'Authorization': `Bearer ${token}`,
+    },
+    body: JSON.stringify({ title, text }),
+  });
+
+  if (!response.ok) {
+    const errorData = await response.json();
+    throw new Error(errorData.error || 'Could not store document');
+  }
+
+  return response.json();
+};
+
+export const searchHistory = async (query, token, { page = 1, limit = 20, kinds = null } = {}) => {
+  const params = new URLSearchParams({ q: query, page: String(page), limit: String(limit) });
+  if (kinds) params.set('kinds', kinds.join(','));
+  const response = await fetch(`${API_URL}/search/?${params}`, {
+    headers: {
+      'Authorization': `Bearer ${token}`,
+    },
+  });
+
+  if (!response.ok) {
+    const errorData = await response.json();
+    throw new Error(errorData.error || 'Search failed');
+  }
+
+  // { results: [{ kind, id, conversationId, title, snippet, updatedAt, score }], page, hasMore };
+  // snippet is HTML with the matched terms in <mark> tags.
+  return response.json();
+};
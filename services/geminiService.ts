@@ -243,3 +243,39 @@ export const generateInfographic = async (input: string, imageBase64?: string):
 // ... existing code ...
 };
 
+
+export interface StudyPackPart<T> {
+  status: 'ok' | 'error' | 'timeout';
+  data?: T;
+  error?: string;
+}
+
+export interface StudyPack {
+  topic: string;
+  parts: {
+    mindmap?: StudyPackPart<MindmapData>;
+    infographic?: StudyPackPart<InfographicData>;
+    quiz?: StudyPackPart<QuizQuestion[]>;
+    'exam-trends'?: StudyPackPart<PredictedQuestion[]>;
+  };
+}
+
+// Generates the mindmap, infographic, quiz and exam trends for a topic in one
+// request; the backend runs them concurrently, so this takes as long as the
+// slowest part. A part that fails or times out comes back without data.
+export const generateStudyPack = async (topic: string, difficulty: 'Easy' | 'Medium' | 'Hard' = 'Medium', moduleId?: string): Promise<StudyPack | null> => {
+  try {
+    const response = await fetch(`${API_URL}/study-pack/generate-study-pack`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ topic, difficulty, moduleId }),
+    });
+    if (!response.ok) throw new Error('Network response was not ok');
+    return await response.json();
+  } catch (error) {
+    console.error("Study Pack Error", error);
+    return null;
+  }
+};
@@ -586,6 +586,31 @@ class DataService {
     }
   }
 
+  // Pushes locally changed visuals and pulls only what changed on the server
+  // since `cursor`. Pass the returned cursor to the next call.
+  async syncVisuals(cursor: number | null, changes: StoredVisual[]): Promise<{ cursor: number; visuals: StoredVisual[] }> {
+    const token = localStorage.getItem('token');
+    if (!token) {
+      console.error("No token found, cannot sync visuals.");
+      return { cursor: cursor ?? 0, visuals: [] };
+    }
+
+    const response = await fetch(`${API_URL}/library/sync`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        'Authorization': `Bearer ${token}`
+      },
+      body: JSON.stringify({ cursor, changes })
+    });
+
+    if (!response.ok) {
+      throw new Error('Failed to sync the visual library.');
+    }
+
+    return response.json();
+  }
+
   removeVisual(studentId: string, visualId: string) {
     const student = this.students.find(s => s.id === studentId);
     if (student) {
@@ -61,6 +61,7 @@ export interface Message {
   attachment?: Attachment;
   steps?: string[];
   isTyping?: boolean;
+  topic?: string; // From AIResponseSchema.topic on tutor replies
 }
 
 export interface ChatConversation {
@@ -86,6 +87,10 @@ export interface AIResponseSchema {
   pedagogical_reasoning: string; // XAI: Why did the AI say this?
   detected_sentiment: Sentiment;
   suggested_action: 'NONE' | 'REVIEW_TOPIC' | 'FLAG_TEACHER';
+  // Short subject of the question (e.g. "Photosynthesis"). The backend prefetches a
+  // mindmap and a Medium quiz for it; the chat's Mindmap and Quiz follow-ups open
+  // VisualStudio and StudentQuiz with it, so their request is served the prefetch.
+  topic?: string;
 }
 
 export interface StudyResource {
@@ -218,6 +223,7 @@ export interface StoredVisual {
   title: string;
   data: MindmapData | InfographicData;
   createdAt: number;
+  updatedAt?: number;
 }
 
 export interface ResearchResult {
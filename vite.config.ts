@@ -12,6 +12,8 @@ export default defineConfig(({ mode }) => {
         https: true
       },
       plugins: [react(), tsconfigPaths(), mkcert()],
+      // dist/.vite/manifest.json lists the hashed bundles the backend may cache forever.
+      build: { manifest: true },
       define: {
         'import.meta.env.VITE_API_KEY': JSON.stringify(env.GEMINI_API_KEY),
         'process.env.VITE_GEMINI_API_KEY': JSON.stringify(env.GEMINI_API_KEY)